@@ -1,19 +1,35 @@
 import argparse
 import json
 import math
-import requests
 import sys
 from google import genai
 from google.genai import types
 from google.genai import errors
 from server.env import get_env
 from security.security import DEFAULT_BYPASS_KEY
+import ai.utilities.api_client as api_client
+from ai.utilities.repair_store import RepairStore, repair_key, PATCH, APPLIED, REPAIR_STORE_FILE
+import server.controllers.natural_disasters as nd
 
 FULL_MODEL_LIST = [
     "gemini-2.5-flash",
     "gemini-2.5-flash-lite",
 ]
 
+DEFAULT_CHUNK_SIZE = 25
+DEFAULT_WORKERS = 4
+# Keep within the model's free tier request rate
+DEFAULT_REQUESTS_PER_MINUTE = 10
+
+# Fields the model sees, and the only fields it may change
+PROMPT_FIELDS = (
+    "_id", nd.NAME, nd.DISASTER_TYPE, nd.DATE, nd.LATITUDE, nd.LONGITUDE,
+    nd.SEVERITY, nd.DESCRIPTION,
+)
+PATCH_FIELDS = (nd.SEVERITY, nd.DESCRIPTION)
+# Bump whenever build_prompt changes so stored repairs are regenerated
+PROMPT_VERSION = "json-1"
+
 
 def is_missing_severity(record):
     value = record.get("severity")
@@ -71,7 +87,7 @@ def fetch_all_disasters(server):
     url = f"{server.rstrip('/')}/natural_disasters"
     headers = get_bypass_headers()
 
-    r = requests.get(url, headers=headers, timeout=30)
+    r = api_client.get(url, headers=headers)
     r.raise_for_status()
 
     data = r.json()
@@ -89,8 +105,12 @@ def chunk_records(records, chunk_size):
         yield records[i:i + chunk_size]
 
 
-def build_prompt(records, server):
-    records_json = json.dumps(records, indent=2, ensure_ascii=False)
+def build_prompt(records):
+    prompt_records = [
+        {field: record.get(field) for field in PROMPT_FIELDS}
+        for record in records
+    ]
+    records_json = json.dumps(prompt_records, indent=2, ensure_ascii=False)
 
     return f"""
 You are updating existing natural disaster records to fill in missing severity values and repair bad descriptions.
@@ -111,103 +131,87 @@ Description repair rules:
 - If the existing description is already meaningful, preserve it exactly.
 
 Critical output rules:
-- Output ONLY raw curl commands.
-- Do NOT output JSON arrays.
-- Do NOT output markdown code fences.
-- Do NOT output explanations.
-- Do NOT output headings.
-- Do NOT repeat the input records.
-- Start the very first output line with: curl -X PUT
-- Every record must produce exactly one curl command.
-- Preserve all existing fields exactly as they already are.
-- Only change the "severity" field if needed and the "description" field if it is a bad placeholder.
+- Output ONLY a JSON array, with no markdown code fences and no explanations.
+- Every record must produce exactly one object in the array.
+- Each object has exactly these keys: "_id", "severity", "description".
 - Keep the same _id already present in each record.
-- Use full JSON objects in the -d body.
-- Output valid JSON inside each -d body.
+- "severity" is a number or null.
+- "description" is a string.
 
 Records to update:
 {records_json}
-
-Every command must match this exact shape:
-curl -X PUT {server.rstrip('/')}/natural_disasters/RECORD_ID \\
--H "X-Auth-Bypass-Key: $AUTH_BYPASS_KEY" \\
--H "Content-Type: application/json" \\
--d '{{ ... full JSON object with updated fields ... }}'
 """.strip()
 
 
-def extract_curl_commands(text):
+def parse_patches(text):
+    """
+    Parse the model's JSON array of patches, tolerating code fences and a
+    {"patches": [...]} wrapper. Returns an empty list if it is not JSON.
+    """
     if not text:
-        return ""
-
-    text = text.replace("```bash", "")
-    text = text.replace("```json", "")
-    text = text.replace("```sh", "")
-    text = text.replace("```shell", "")
-    text = text.replace("```", "")
-
-    lines = text.splitlines()
-    commands = []
-    current = []
-    in_command = False
-
-    for line in lines:
-        raw_line = line.rstrip("\n")
-        stripped = raw_line.strip()
-
-        if stripped.startswith("curl -X PUT "):
-            if current:
-                commands.append("\n".join(current).strip())
-                current = []
-            current.append(stripped)
-            in_command = True
-            continue
+        return []
 
-        if not in_command:
-            continue
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
 
-        if (
-            stripped.startswith("-H ")
-            or stripped.startswith("-d ")
-            or stripped.startswith("\\")
-            or raw_line.startswith("  ")
-            or raw_line.startswith("    ")
-            or stripped.startswith("{")
-            or stripped.startswith("}")
-            or stripped.startswith('"')
-            or stripped.startswith("'")
-            or stripped.startswith("],")
-            or stripped.startswith("[")
-            or stripped.startswith("]")
-            or stripped.startswith("},")
-            or stripped.startswith("',")
-            or stripped == ""
-        ):
-            current.append(raw_line)
-            if stripped == "":
-                commands.append("\n".join(current).strip())
-                current = []
-                in_command = False
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return []
+
+    if isinstance(data, dict):
+        data = data.get("patches", [])
+    if not isinstance(data, list):
+        return []
+    return [patch for patch in data if isinstance(patch, dict)]
+
+
+def validate_patch(patch, records_by_id):
+    """
+    Check a patch against the NaturalDisasters schema and the record it
+    targets. Returns the fields that actually change, or None if the patch
+    is invalid or changes nothing.
+    """
+    record = records_by_id.get(patch.get("_id"))
+    if record is None:
+        return None
+
+    changes = {}
+    for field in PATCH_FIELDS:
+        if field not in patch:
             continue
+        value = patch[field]
+        expected = nd.disasters.attributes[field]
+        if isinstance(value, bool):
+            return None
+        if value is not None and not isinstance(value, expected):
+            return None
+        if field == nd.SEVERITY:
+            if value is None or not math.isfinite(value) or not is_missing_severity(record):
+                continue
+            value = float(value)
+        if field == nd.DESCRIPTION:
+            if not value or not value.strip() or not has_bad_description(record):
+                continue
+            if has_bad_description({nd.DESCRIPTION: value}):
+                continue
+            value = value.strip()
+        if record.get(field) != value:
+            changes[field] = value
 
-        if current:
-            commands.append("\n".join(current).strip())
-            current = []
-        in_command = False
-
-    if current:
-        commands.append("\n".join(current).strip())
-
-    cleaned = []
-    for cmd in commands:
-        cmd = cmd.strip()
-        if cmd.startswith("curl -X PUT "):
-            cleaned.append(cmd)
+    return changes or None
 
-    return "\n\n".join(cleaned)
 
+def generate_batch_patches(client, records, limiter=None):
+    """
+    Ask the model for patches to a batch of records, falling back through
+    strategies and models until one returns parseable JSON. Returns the raw
+    patches, or None if every attempt failed.
+    """
+    prompt = build_prompt(records)
 
-def generate_batch_curls(client, prompt):
     for use_search in [True, False]:
         mode = "WITH SEARCH" if use_search else "INTERNAL KNOWLEDGE (NO SEARCH)"
         print(f"\n--- Strategy: {mode} ---", file=sys.stderr)
@@ -215,28 +219,29 @@ def generate_batch_curls(client, prompt):
         for model_name in FULL_MODEL_LIST:
             print(f"Trying {model_name}...", file=sys.stderr, end=" ")
 
-            config_kwargs = {}
+            # Search grounding cannot be combined with a JSON response type
             if use_search:
-                config_kwargs["tools"] = [types.Tool(google_search=types.GoogleSearch())]
+                config = types.GenerateContentConfig(
+                    tools=[types.Tool(google_search=types.GoogleSearch())])
+            else:
+                config = types.GenerateContentConfig(response_mime_type="application/json")
+
+            if limiter is not None:
+                limiter.wait()
 
             try:
                 response = client.models.generate_content(
                     model=model_name,
                     contents=prompt,
-                    config=types.GenerateContentConfig(**config_kwargs) if config_kwargs else None
+                    config=config
                 )
 
-                text = (response.text or "").strip()
-                if not text:
-                    print("FAILED (empty response)", file=sys.stderr)
-                    continue
-
-                cleaned = extract_curl_commands(text)
-                if cleaned:
+                patches = parse_patches(response.text)
+                if patches:
                     print("SUCCESS!", file=sys.stderr)
-                    return cleaned
+                    return patches
 
-                print("FAILED (no curl commands found)", file=sys.stderr)
+                print("FAILED (no JSON patches found)", file=sys.stderr)
 
             except errors.APIError as e:
                 msg = str(e).split('.')[0]
@@ -246,6 +251,96 @@ def generate_batch_curls(client, prompt):
     return None
 
 
+def process_batch(client, records, limiter=None):
+    """Return the validated patches for one batch as {_id: fields}"""
+    records_by_id = {record["_id"]: record for record in records}
+    patches = generate_batch_patches(client, records, limiter)
+    if patches is None:
+        return None
+
+    valid = {}
+    for patch in patches:
+        changes = validate_patch(patch, records_by_id)
+        if changes:
+            valid[patch["_id"]] = changes
+    return valid
+
+
+def get_repair_key(record):
+    return repair_key(record, PROMPT_FIELDS, PROMPT_VERSION)
+
+
+def split_cached(records, store):
+    """
+    Split records into the unapplied patches already in the store, as
+    {_id: fields}, and the records the model still has to repair.
+    """
+    patches = {}
+    uncached = []
+    for record in records:
+        entry = store.get(get_repair_key(record))
+        if entry is None:
+            uncached.append(record)
+        elif entry[PATCH] and not entry[APPLIED]:
+            patches[record["_id"]] = entry[PATCH]
+    return patches, uncached
+
+
+def run_backfill(client, records, chunk_size=DEFAULT_CHUNK_SIZE,
+                 workers=DEFAULT_WORKERS, per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 store=None):
+    """
+    Generate validated patches for records, running up to workers batches
+    at once while keeping model requests within per_minute.
+
+    With a store, records whose repair is already stored skip the model,
+    and new results (including records the model left unchanged) are
+    stored for later runs.
+    Returns (patches, number of failed batches).
+    """
+    if store is not None:
+        patches, records = split_cached(records, store)
+        print(f"Reusing stored repairs; {len(records)} record(s) need the AI.", file=sys.stderr)
+    else:
+        patches = {}
+
+    limiter = api_client.RateLimiter(per_minute)
+    batches = list(chunk_records(records, chunk_size))
+    results = api_client.map_concurrent(
+        lambda batch: process_batch(client, batch, limiter), batches, workers=workers)
+
+    failed = 0
+    for batch, result in zip(batches, results):
+        if result is None:
+            failed += 1
+            continue
+        patches.update(result)
+        if store is not None:
+            for record in batch:
+                store.put(get_repair_key(record), result.get(record["_id"], {}))
+
+    if store is not None:
+        store.save()
+    return patches, failed
+
+
+def mark_applied(store, records, patches):
+    """Record that the patches for these records were applied"""
+    store.mark_applied(get_repair_key(record) for record in records
+                       if record["_id"] in patches)
+    store.save()
+
+
+def apply_patches(server, patches):
+    """Apply all patches with a single bulk update request"""
+    if not patches:
+        return 0
+    url = f"{server.rstrip('/')}/natural_disasters/bulk"
+    r = api_client.patch(url, json={"updates": patches}, headers=get_bypass_headers())
+    r.raise_for_status()
+    return r.json().get("updated", 0)
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--key", required=True)
@@ -257,9 +352,36 @@ def main():
     parser.add_argument(
         "--chunk-size",
         type=int,
-        default=25,
+        default=DEFAULT_CHUNK_SIZE,
         help="How many records to send to the AI in one batch"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="How many batches to send to the AI at once"
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        default=DEFAULT_REQUESTS_PER_MINUTE,
+        help="Maximum AI requests per minute across all workers"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the validated patches as JSON instead of applying them"
+    )
+    parser.add_argument(
+        "--store",
+        default=REPAIR_STORE_FILE,
+        help="File of stored repairs, so unchanged records skip the AI"
+    )
+    parser.add_argument(
+        "--no-store",
+        action="store_true",
+        help="Send every record to the AI, ignoring stored repairs"
+    )
 
     args = parser.parse_args()
 
@@ -268,8 +390,8 @@ def main():
         print("Error: API key is empty.", file=sys.stderr)
         sys.exit(1)
 
-    if args.chunk_size <= 0:
-        print("Error: --chunk-size must be greater than 0.", file=sys.stderr)
+    if args.chunk_size <= 0 or args.workers <= 0 or args.rpm <= 0:
+        print("Error: --chunk-size, --workers and --rpm must be greater than 0.", file=sys.stderr)
         sys.exit(1)
 
     if not get_env("AUTH_BYPASS_KEY", DEFAULT_BYPASS_KEY).strip():
@@ -292,25 +414,27 @@ def main():
 
     print(f"Found {len(missing)} disasters needing severity/description repair.", file=sys.stderr)
 
-    batch_count = 0
-    emitted_batches = 0
+    store = None if args.no_store else RepairStore(args.store)
 
-    for batch in chunk_records(missing, args.chunk_size):
-        batch_count += 1
-        print(f"\nProcessing batch {batch_count} with {len(batch)} record(s)...", file=sys.stderr)
+    patches, failed = run_backfill(client, missing, chunk_size=args.chunk_size,
+                                   workers=args.workers, per_minute=args.rpm,
+                                   store=store)
 
-        prompt = build_prompt(batch, args.server)
-        curl_block = generate_batch_curls(client, prompt)
-
-        if curl_block:
-            print(curl_block)
-            emitted_batches += 1
-        else:
-            print(f"Failed to generate curls for batch {batch_count}.", file=sys.stderr)
+    if args.dry_run:
+        print(json.dumps(patches, indent=2, ensure_ascii=False))
+    else:
+        try:
+            updated = apply_patches(args.server, patches)
+        except Exception as e:
+            print(f"Error applying patches: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Updated {updated} record(s).", file=sys.stderr)
+        if store is not None:
+            mark_applied(store, missing, patches)
 
     print(
-        f"\nDone. Processed {len(missing)} record(s) across {batch_count} batch(es). "
-        f"Emitted curl blocks for {emitted_batches} batch(es).",
+        f"\nDone. Generated {len(patches)} valid patch(es) for {len(missing)} record(s). "
+        f"{failed} batch(es) failed.",
         file=sys.stderr
     )
 
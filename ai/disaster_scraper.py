@@ -1,12 +1,17 @@
 import argparse
 import os
-import requests
 import sys
 from datetime import date
 from google import genai
 from google.genai import types
 from google.genai import errors
 
+try:
+    import ai.utilities.api_client as api_client
+except ImportError:
+    # Run as a script (python ai/disaster_scraper.py), so ai/ is on the path
+    from utilities import api_client
+
 # Comprehensive 2026 Model Priority List
 FULL_MODEL_LIST = [
     "gemini-2.5-flash",             # Stable Price/Performance (This is the only one that works so far)
@@ -35,7 +40,7 @@ def results_exist_for_date(server, target_date):
     """
     try:
         url = f"{server.rstrip('/')}/natural_disasters?date={target_date}"
-        r = requests.get(url, timeout=10)
+        r = api_client.get(url, timeout=10)
 
         if r.status_code != 200:
             return False
@@ -1,12 +1,20 @@
 import argparse
+import json
 import os
-import requests
 import sys
-from datetime import date
+from datetime import date, datetime, timedelta, timezone
 from google import genai
 from google.genai import types
 from google.genai import errors
 
+try:
+    import ai.utilities.api_client as api_client
+    import ai.utilities.dedupe as dedupe
+except ImportError:
+    # Run as a script (python ai/disaster_scraper_alternate.py), so ai/ is on the path
+    from utilities import api_client
+    from utilities import dedupe
+
 # Comprehensive 2026 Model Priority List
 FULL_MODEL_LIST = [
     "gemini-2.5-flash",             # Stable Price/Performance (This is the only one that works so far)
@@ -16,6 +24,15 @@ FULL_MODEL_LIST = [
 # Bookmark system for rate limiting
 RUN_BOOKMARK = "ai/last_successful_run.txt"
 
+# Range mode records each (date, country) it has scraped here instead
+RUN_LEDGER = "ai/scrape_ledger.json"
+DEFAULT_WORKERS = 4
+DEFAULT_REQUESTS_PER_MINUTE = 10
+# Prefix for ids given to scraped events before they are posted. It sorts
+# after any Mongo id, so existing records always win local dedupe.
+CANDIDATE_ID_PREFIX = "~candidate-"
+EVENT_FIELDS = ("name", "type", "date", "latitude", "longitude", "description", "severity")
+
 def already_ran_today(target_date):
     if not os.path.exists(RUN_BOOKMARK):
         return False
@@ -35,7 +52,7 @@ def results_exist_for_date(server, target_date):
     """
     try:
         url = f"{server.rstrip('/')}/natural_disasters?date={target_date}"
-        r = requests.get(url, timeout=10)
+        r = api_client.get(url, timeout=10)
 
         if r.status_code != 200:
             return False
@@ -134,6 +151,277 @@ curl -X POST {server}/natural_disasters/ \\
     print("\n[!] Error: All models and strategies failed.", file=sys.stderr)
     sys.exit(1)
 
+def load_ledger(filename=RUN_LEDGER):
+    try:
+        with open(filename, "r", encoding="utf-8") as f:
+            ledger = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return ledger if isinstance(ledger, dict) else {}
+
+
+def save_ledger(ledger, filename=RUN_LEDGER):
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "w", encoding="utf-8") as f:
+        json.dump(ledger, f, indent=2, sort_keys=True)
+    os.replace(tmp_filename, filename)
+
+
+def ledger_key(target_date, country):
+    return f"{target_date}|{country or 'worldwide'}"
+
+
+def date_range(start, end):
+    """Return the ISO dates from start to end inclusive"""
+    day = date.fromisoformat(start)
+    last = date.fromisoformat(end)
+    if last < day:
+        raise ValueError(f"End date {end} is before start date {start}")
+    dates = []
+    while day <= last:
+        dates.append(day.isoformat())
+        day += timedelta(days=1)
+    return dates
+
+
+def pending_tasks(dates, countries, ledger):
+    """Return the (date, country) pairs the ledger has not recorded"""
+    return [(d, c) for d in dates for c in countries if ledger_key(d, c) not in ledger]
+
+
+def build_range_prompt(target_date, country):
+    location_context = f"in {country}" if country else "worldwide"
+    return f"""
+Find significant natural disasters reported on {target_date} {location_context}.
+
+Include all major natural disaster types when reported, including but not limited to:
+earthquake, hurricane, landslide, tsunami, wildfire, flood, tornado, volcano,
+winter storm, drought, heat wave, avalanche, cyclone, typhoon, severe storm,
+mudslide, sinkhole, blizzard, hailstorm, and dust storm.
+
+Use lowercase type names.
+
+Set "severity" as follows:
+- earthquake: earthquake magnitude
+- hurricane, cyclone, typhoon: storm category number when available
+- tornado: EF rating number when available
+- wildfire, flood, landslide, tsunami, volcano, winter storm, drought, heat wave,
+  avalanche, severe storm, mudslide, sinkhole, blizzard, hailstorm, dust storm:
+  use a 1-5 severity scale based on reported damage, deaths, evacuations, area affected,
+  intensity, and disruption
+- if severity cannot be reasonably estimated, use null
+
+Output ONLY a JSON array with no markdown code fences and no explanation.
+Output [] if there were no significant natural disasters.
+Each element must be an object of this shape:
+{{
+"name": "[event name]",
+"type": "[lowercase disaster type]",
+"date": "{target_date}",
+"latitude": [decimal],
+"longitude": [decimal],
+"description": "[short description]",
+"severity": [number or null]
+}}
+""".strip()
+
+
+def parse_events(text):
+    """Parse the model's JSON array of events. Returns None if it is not JSON."""
+    if text is None:
+        return None
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, list) else None
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def clean_event(event, target_date):
+    """Return the event's fields if it is a well-formed event on target_date, else None"""
+    if not isinstance(event, dict):
+        return None
+    name = event.get("name")
+    event_type = event.get("type")
+    lat = event.get("latitude")
+    lon = event.get("longitude")
+    severity = event.get("severity")
+    if not isinstance(name, str) or not name.strip():
+        return None
+    if not isinstance(event_type, str) or not event_type.strip():
+        return None
+    if event.get("date") != target_date:
+        return None
+    if not is_number(lat) or not is_number(lon) or not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        return None
+    if severity is not None and not is_number(severity):
+        severity = None
+    description = event.get("description")
+    return {
+        "name": name.strip(),
+        "type": event_type.strip().lower(),
+        "date": target_date,
+        "latitude": float(lat),
+        "longitude": float(lon),
+        "description": description if isinstance(description, str) else "",
+        "severity": float(severity) if severity is not None else None,
+    }
+
+
+def scrape_day(client, target_date, country, limiter):
+    """
+    Ask the model for the events on one date in one country. Returns the
+    cleaned events, or None if every model failed.
+    """
+    prompt = build_range_prompt(target_date, country)
+    config = types.GenerateContentConfig(tools=[types.Tool(google_search=types.GoogleSearch())])
+
+    for model_name in FULL_MODEL_LIST:
+        limiter.wait()
+        try:
+            response = client.models.generate_content(
+                model=model_name,
+                contents=prompt,
+                config=config
+            )
+        except errors.APIError as e:
+            msg = str(e).split('.')[0]
+            print(f"{ledger_key(target_date, country)}: {model_name} FAILED ({msg})", file=sys.stderr)
+            continue
+
+        events = parse_events(response.text)
+        if events is None:
+            print(f"{ledger_key(target_date, country)}: {model_name} FAILED (no JSON)", file=sys.stderr)
+            continue
+        cleaned = [clean_event(event, target_date) for event in events]
+        return [event for event in cleaned if event is not None]
+
+    return None
+
+
+def get_bypass_headers():
+    auth_bypass_key = dedupe.AUTH_BYPASS_KEY.strip()
+    return {"X-Auth-Bypass-Key": auth_bypass_key} if auth_bypass_key else {}
+
+
+def fetch_existing(server, dates):
+    """
+    Fetch the visible events that could duplicate scraped events in one
+    request, widening the date range by the longest dedupe window.
+    """
+    window = max([rule["date_window_days"] for rule in dedupe.DISASTER_TYPES.values()]
+                 + [dedupe.DEFAULT_DEDUPE["date_window_days"]])
+    start = date.fromisoformat(min(dates)) - timedelta(days=window)
+    end = date.fromisoformat(max(dates)) + timedelta(days=window)
+    r = api_client.get(
+        f"{server.rstrip('/')}/natural_disasters",
+        params={"start_date": start.isoformat(), "end_date": end.isoformat()},
+        headers=get_bypass_headers()
+    )
+    r.raise_for_status()
+    return dedupe.normalize_records_payload(r.json(), "GET /natural_disasters")
+
+
+def dedupe_candidates(candidates, existing):
+    """
+    Drop candidates that are within the dedupe radius and date window of an
+    existing event or of an earlier candidate, using the same rules as
+    dedupe.py. Returns the candidates to post, in order.
+    """
+    width = len(str(len(candidates)))
+    tagged = []
+    for i, candidate in enumerate(candidates):
+        event = dict(candidate)
+        event["_id"] = f"{CANDIDATE_ID_PREFIX}{i:0{width}d}"
+        tagged.append(event)
+
+    plan = dedupe.cluster_events(list(existing) + tagged)
+    duplicates = {child for children in plan.values() for child in children}
+    return [candidate for candidate, event in zip(candidates, tagged)
+            if event["_id"] not in duplicates]
+
+
+def post_events(server, events):
+    """Create all events with one bulk request. Returns the created ids."""
+    if not events:
+        return []
+    r = api_client.post(
+        f"{server.rstrip('/')}/natural_disasters/bulk",
+        json={"records": events},
+        headers=get_bypass_headers()
+    )
+    r.raise_for_status()
+    return r.json().get("ids", [])
+
+
+def scrape_range(client, server, dates, countries, workers=DEFAULT_WORKERS,
+                 per_minute=DEFAULT_REQUESTS_PER_MINUTE, ledger_file=RUN_LEDGER,
+                 dry_run=False):
+    """
+    Scrape every (date, country) pair not yet in the ledger, up to workers
+    at a time, dedupe the events locally, post them in one request, and
+    record the pairs that succeeded. Returns the events posted.
+    """
+    ledger = load_ledger(ledger_file)
+    tasks = pending_tasks(dates, countries, ledger)
+    print(f"{len(tasks)} of {len(dates) * len(countries)} (date, country) pair(s) to scrape.",
+          file=sys.stderr)
+    if not tasks:
+        return []
+
+    limiter = api_client.RateLimiter(per_minute)
+    results = api_client.map_concurrent(
+        lambda task: scrape_day(client, task[0], task[1], limiter), tasks, workers=workers)
+
+    candidates = []
+    done = []
+    for task, events in zip(tasks, results):
+        if events is None:
+            print(f"{ledger_key(*task)}: all models failed; will retry next run.", file=sys.stderr)
+            continue
+        candidates.extend(events)
+        done.append((task, len(events)))
+
+    existing = fetch_existing(server, [d for d, _ in tasks])
+    events = dedupe_candidates(candidates, existing)
+    print(f"{len(candidates)} event(s) scraped, {len(events)} after dedupe.", file=sys.stderr)
+
+    if dry_run:
+        print(json.dumps(events, indent=2, ensure_ascii=False))
+        return events
+
+    post_events(server, events)
+
+    scraped_at = datetime.now(timezone.utc).isoformat()
+    for task, num_events in done:
+        ledger[ledger_key(*task)] = {"events": num_events, "scraped_at": scraped_at}
+    save_ledger(ledger, ledger_file)
+    return events
+
+
+def main_range(args):
+    api_key = args.key.strip(' "\'\n\r')
+    if not api_key:
+        print("Error: API key is empty.", file=sys.stderr)
+        sys.exit(1)
+
+    dates = date_range(args.start, args.end or args.start)
+    countries = [c.strip() for c in args.countries.split(",") if c.strip()] \
+        if args.countries else [args.country]
+
+    client = genai.Client(api_key=api_key)
+    scrape_range(client, args.server, dates, countries, workers=args.workers,
+                 per_minute=args.rpm, ledger_file=args.ledger, dry_run=args.dry_run)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--key", required=True)
@@ -148,8 +436,27 @@ if __name__ == "__main__":
         help="Server base URL for the natural disasters API"
     )
 
+    parser.add_argument("--start", default=None,
+                        help="Range mode: first date to scrape (YYYY-MM-DD)")
+    parser.add_argument("--end", default=None,
+                        help="Range mode: last date to scrape (YYYY-MM-DD), defaults to --start")
+    parser.add_argument("--countries", default=None,
+                        help="Range mode: comma-separated countries, defaults to --country")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Range mode: (date, country) pairs scraped at once")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help="Range mode: maximum AI requests per minute")
+    parser.add_argument("--ledger", default=RUN_LEDGER,
+                        help="Range mode: file recording the pairs already scraped")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Range mode: print the deduped events instead of posting them")
+
     args = parser.parse_args()
 
+    if args.start:
+        main_range(args)
+        sys.exit(0)
+
     # Check Bookmark First
     if already_ran_today(args.date):
         print(f"Script already ran successfully for {args.date}. Skipping.", file=sys.stderr)
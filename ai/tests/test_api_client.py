@@ -0,0 +1,79 @@
+import time
+from unittest.mock import patch
+import pytest
+import requests
+import ai.utilities.api_client as api_client
+
+URL = 'http://server/natural_disasters/'
+
+
+class TestTimeoutSession:
+    @patch.object(requests.Session, 'request')
+    def test_default_timeout(self, mock_request):
+        api_client.make_session().get(URL)
+        assert mock_request.call_args.kwargs['timeout'] == api_client.DEFAULT_TIMEOUT
+
+    @patch.object(requests.Session, 'request')
+    def test_explicit_timeout(self, mock_request):
+        api_client.make_session().post(URL, timeout=1)
+        assert mock_request.call_args.kwargs['timeout'] == 1
+
+
+class TestRetries:
+    def retry(self):
+        return api_client.make_session().get_adapter(URL).max_retries
+
+    @pytest.mark.parametrize('method', ['GET', 'PUT', 'DELETE'])
+    def test_idempotent_retried(self, method):
+        assert self.retry().is_retry(method, 503)
+
+    def test_post_not_retried(self):
+        retry = self.retry()
+        assert not retry.is_retry('POST', 503)
+        assert 'POST' not in retry.allowed_methods
+
+    def test_client_error_not_retried(self):
+        assert not self.retry().is_retry('GET', 404)
+
+
+class TestRateLimiter:
+    def test_bad_rate(self):
+        with pytest.raises(ValueError):
+            api_client.RateLimiter(0)
+
+    def test_spacing(self):
+        clock = [100.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        limiter = api_client.RateLimiter(per_minute=30)
+        with patch.object(api_client.time, 'monotonic', side_effect=lambda: clock[0]), \
+                patch.object(api_client.time, 'sleep', side_effect=sleep):
+            limiter.wait()
+            limiter.wait()
+            clock[0] += 0.5
+            limiter.wait()
+            clock[0] += 10
+            limiter.wait()
+        assert sleeps == [2.0, 1.5]
+
+
+class TestMapConcurrent:
+    def test_order(self):
+        def slow_square(i):
+            # Later items finish first
+            time.sleep((5 - i) * 0.01)
+            return i * i
+        assert api_client.map_concurrent(slow_square, range(5), workers=5) == [0, 1, 4, 9, 16]
+
+    def test_serial(self):
+        assert api_client.map_concurrent(str, [1, 2], workers=1) == ['1', '2']
+
+    def test_raises(self):
+        def fail(i):
+            raise ValueError(i)
+        with pytest.raises(ValueError):
+            api_client.map_concurrent(fail, range(3))
@@ -0,0 +1,44 @@
+import sys
+from unittest.mock import patch
+import ai.utilities.dedupe as dedupe
+
+ROOT_ID = '0' * 23 + '1'
+LATER_ID = '0' * 23 + '2'
+REPORT_ID = '0' * 23 + '3'
+
+
+def quake(_id):
+    return {'_id': _id, 'type': 'earthquake', 'date': '2026-01-01',
+            'latitude': 1.0, 'longitude': 1.0, 'show': True, 'parent_event': None}
+
+
+def run_main(events, searches):
+    """Run the per-event dedupe with canned searches, returning the links made"""
+    with patch.object(sys, 'argv', ['dedupe', '--server', 'http://server']), \
+            patch.object(dedupe, 'get_all_events', return_value=events), \
+            patch.object(dedupe, 'search_nearby',
+                         side_effect=lambda event, **kwargs: searches[event['_id']]), \
+            patch.object(dedupe, 'link') as mock_link:
+        dedupe.main()
+    return [call.args[:2] for call in mock_link.call_args_list]
+
+
+class TestMain:
+    def test_report_linked_once(self):
+        # Both prefetched searches still show the report as unlinked
+        events = [quake(ROOT_ID), quake(LATER_ID), quake(REPORT_ID)]
+        searches = {
+            ROOT_ID: [quake(REPORT_ID)],
+            LATER_ID: [quake(REPORT_ID)],
+            REPORT_ID: [],
+        }
+        assert run_main(events, searches) == [(ROOT_ID, REPORT_ID)]
+
+    def test_linked_root_skipped(self):
+        events = [quake(ROOT_ID), quake(LATER_ID), quake(REPORT_ID)]
+        searches = {
+            ROOT_ID: [quake(LATER_ID)],
+            LATER_ID: [quake(REPORT_ID)],
+            REPORT_ID: [],
+        }
+        assert run_main(events, searches) == [(ROOT_ID, LATER_ID)]
@@ -0,0 +1,160 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+import ai.disaster_backfill as backfill
+from ai.utilities.repair_store import RepairStore
+import server.controllers.natural_disasters as nd
+
+QUAKE_ID = '0' * 23 + '1'
+SLIDE_ID = '0' * 23 + '2'
+
+RECORDS = [
+    {'_id': QUAKE_ID, nd.NAME: 'quake', nd.DISASTER_TYPE: nd.EARTHQUAKE,
+     nd.DATE: '2026-01-01', nd.LATITUDE: 1.0, nd.LONGITUDE: 1.0,
+     nd.SEVERITY: None, nd.DESCRIPTION: 'A strong earthquake.'},
+    {'_id': SLIDE_ID, nd.NAME: 'slide', nd.DISASTER_TYPE: nd.LANDSLIDE,
+     nd.DATE: '2026-01-01', nd.LATITUDE: 2.0, nd.LONGITUDE: 2.0,
+     nd.SEVERITY: 2.0, nd.DESCRIPTION: 'Trigger: N/A'},
+]
+RECORDS_BY_ID = {record['_id']: record for record in RECORDS}
+
+
+class FakeClient:
+    """Stands in for genai.Client, returning canned responses in order."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+        self.models = self
+
+    def generate_content(self, model, contents, config=None):
+        self.prompts.append(contents)
+        return SimpleNamespace(text=self.responses.pop(0))
+
+
+def fake_patches(records):
+    return json.dumps([
+        {'_id': r['_id'], nd.SEVERITY: 5.5, nd.DESCRIPTION: f"About {r[nd.NAME]}."}
+        for r in records
+    ])
+
+
+class TestParsePatches:
+    def test_array(self):
+        assert backfill.parse_patches('[{"_id": "a"}]') == [{'_id': 'a'}]
+
+    def test_fenced_wrapper(self):
+        text = '```json\n{"patches": [{"_id": "a"}]}\n```'
+        assert backfill.parse_patches(text) == [{'_id': 'a'}]
+
+    def test_not_json(self):
+        assert backfill.parse_patches('curl -X PUT ...') == []
+
+
+class TestValidatePatch:
+    def test_only_repairs_bad_fields(self):
+        patch_ = {'_id': QUAKE_ID, nd.SEVERITY: 6, nd.DESCRIPTION: 'New.', nd.NAME: 'x'}
+        assert backfill.validate_patch(patch_, RECORDS_BY_ID) == {nd.SEVERITY: 6.0}
+
+    def test_description(self):
+        patch_ = {'_id': SLIDE_ID, nd.SEVERITY: 4, nd.DESCRIPTION: ' A landslide. '}
+        assert backfill.validate_patch(patch_, RECORDS_BY_ID) == {nd.DESCRIPTION: 'A landslide.'}
+
+    def test_bad_type(self):
+        assert backfill.validate_patch({'_id': QUAKE_ID, nd.SEVERITY: 'big'},
+                                       RECORDS_BY_ID) is None
+
+    def test_placeholder_description(self):
+        assert backfill.validate_patch({'_id': SLIDE_ID, nd.DESCRIPTION: 'N/A'},
+                                       RECORDS_BY_ID) is None
+
+    def test_unknown_id(self):
+        assert backfill.validate_patch({'_id': 'other', nd.SEVERITY: 1},
+                                       RECORDS_BY_ID) is None
+
+
+class TestRunBackfill:
+    def test_concurrent_batches(self):
+        # Either batch may ask first, so both answers cover every record
+        client = FakeClient([fake_patches(RECORDS)] * 2)
+        patches, failed = backfill.run_backfill(client, RECORDS, chunk_size=1,
+                                                workers=2, per_minute=6000)
+        assert failed == 0
+        assert patches == {
+            QUAKE_ID: {nd.SEVERITY: 5.5},
+            SLIDE_ID: {nd.DESCRIPTION: 'About slide.'},
+        }
+        assert len(client.prompts) == 2
+
+    def test_falls_back_until_json(self):
+        client = FakeClient(['not json', fake_patches(RECORDS)])
+        patches, failed = backfill.run_backfill(client, RECORDS, per_minute=6000)
+        assert failed == 0
+        assert set(patches) == {QUAKE_ID, SLIDE_ID}
+
+    def test_failed_batch(self):
+        attempts = 2 * len(backfill.FULL_MODEL_LIST)
+        client = FakeClient(['not json'] * attempts)
+        patches, failed = backfill.run_backfill(client, RECORDS, per_minute=6000)
+        assert patches == {}
+        assert failed == 1
+
+
+class TestApplyPatches:
+    @patch('ai.utilities.api_client.patch')
+    def test_single_request(self, mock_patch):
+        mock_patch.return_value.json.return_value = {'updated': 1}
+        patches = {QUAKE_ID: {nd.SEVERITY: 5.5}}
+        assert backfill.apply_patches('http://server/', patches) == 1
+        mock_patch.assert_called_once()
+        assert mock_patch.call_args[0][0] == 'http://server/natural_disasters/bulk'
+        assert mock_patch.call_args[1]['json'] == {'updates': patches}
+
+    @patch('ai.utilities.api_client.patch')
+    def test_nothing_to_apply(self, mock_patch):
+        assert backfill.apply_patches('http://server', {}) == 0
+        mock_patch.assert_not_called()
+
+
+class TestRepairStore:
+    def test_skips_stored_records(self, tmp_path):
+        store = RepairStore(str(tmp_path / 'store.json'))
+        client = FakeClient([fake_patches(RECORDS)])
+        first, _ = backfill.run_backfill(client, RECORDS, per_minute=6000, store=store)
+
+        # A fresh store reads the saved results, so the model is not called again
+        store = RepairStore(str(tmp_path / 'store.json'))
+        client = FakeClient([])
+        second, failed = backfill.run_backfill(client, RECORDS, per_minute=6000, store=store)
+        assert second == first
+        assert failed == 0
+        assert client.prompts == []
+
+    def test_applied_patches_not_reused(self, tmp_path):
+        store = RepairStore(str(tmp_path / 'store.json'))
+        client = FakeClient([fake_patches(RECORDS)])
+        patches, _ = backfill.run_backfill(client, RECORDS, per_minute=6000, store=store)
+        backfill.mark_applied(store, RECORDS, patches)
+
+        patches, _ = backfill.run_backfill(FakeClient([]), RECORDS, per_minute=6000,
+                                           store=RepairStore(str(tmp_path / 'store.json')))
+        assert patches == {}
+
+    def test_changed_record_is_resent(self, tmp_path):
+        store = RepairStore(str(tmp_path / 'store.json'))
+        backfill.run_backfill(FakeClient([fake_patches(RECORDS)]), RECORDS,
+                              per_minute=6000, store=store)
+
+        changed = [dict(RECORDS[0], **{nd.DESCRIPTION: 'Edited.'})]
+        client = FakeClient([fake_patches(changed)])
+        patches, _ = backfill.run_backfill(client, changed, per_minute=6000, store=store)
+        assert len(client.prompts) == 1
+        assert patches == {QUAKE_ID: {nd.SEVERITY: 5.5}}
+
+    def test_prompt_version_invalidates(self, tmp_path):
+        store = RepairStore(str(tmp_path / 'store.json'))
+        backfill.run_backfill(FakeClient([fake_patches(RECORDS)]), RECORDS,
+                              per_minute=6000, store=store)
+        with patch.object(backfill, 'PROMPT_VERSION', 'next'):
+            _, uncached = backfill.split_cached(RECORDS, store)
+        assert uncached == RECORDS
@@ -0,0 +1,127 @@
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+import ai.disaster_scraper_alternate as scraper
+
+EXISTING = [
+    {'_id': '0' * 24, 'name': 'Existing quake', 'type': 'earthquake', 'date': '2026-01-01',
+     'latitude': 35.0, 'longitude': 139.0, 'show': True, 'parent_event': None},
+]
+
+
+def quake(name, target_date, lat, lon):
+    return {'name': name, 'type': 'earthquake', 'date': target_date,
+            'latitude': lat, 'longitude': lon, 'description': 'quake', 'severity': 5}
+
+
+class FakeClient:
+    """Stands in for genai.Client, answering by the date and country in the prompt."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = 0
+        self.models = self
+
+    def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        for (target_date, country), text in self.answers.items():
+            if target_date in contents and f"in {country}" in contents:
+                return SimpleNamespace(text=text)
+        return SimpleNamespace(text='[]')
+
+
+class TestDateRange:
+    def test_inclusive(self):
+        assert scraper.date_range('2026-01-30', '2026-02-01') == \
+            ['2026-01-30', '2026-01-31', '2026-02-01']
+
+    def test_backwards(self):
+        with pytest.raises(ValueError):
+            scraper.date_range('2026-01-02', '2026-01-01')
+
+
+class TestCleanEvent:
+    def test_valid(self):
+        event = scraper.clean_event(quake(' Quake ', '2026-01-01', 1, 2), '2026-01-01')
+        assert event['name'] == 'Quake'
+        assert event['latitude'] == 1.0
+        assert event['severity'] == 5.0
+
+    def test_wrong_date(self):
+        assert scraper.clean_event(quake('Quake', '2026-01-02', 1, 2), '2026-01-01') is None
+
+    def test_bad_coordinates(self):
+        assert scraper.clean_event(quake('Quake', '2026-01-01', 91, 2), '2026-01-01') is None
+
+
+class TestDedupeCandidates:
+    def test_drops_existing_and_repeated(self):
+        candidates = [
+            quake('Same quake', '2026-01-01', 35.1, 139.1),
+            quake('New quake', '2026-01-01', -10.0, 20.0),
+            quake('New quake again', '2026-01-02', -10.05, 20.05),
+        ]
+        kept = scraper.dedupe_candidates(candidates, EXISTING)
+        assert [event['name'] for event in kept] == ['New quake']
+
+
+class TestScrapeRange:
+    @pytest.fixture
+    def server(self):
+        with patch('ai.utilities.api_client.get') as mock_get, \
+                patch('ai.utilities.api_client.post') as mock_post:
+            mock_get.return_value.json.return_value = {'records': EXISTING}
+            yield mock_get, mock_post
+
+    def test_fans_out_and_posts_once(self, server, tmp_path):
+        mock_get, mock_post = server
+        ledger_file = str(tmp_path / 'ledger.json')
+        client = FakeClient({
+            ('2026-01-01', 'Japan'): json.dumps([quake('Same quake', '2026-01-01', 35.1, 139.1)]),
+            ('2026-01-02', 'Chile'): json.dumps([quake('Chile quake', '2026-01-02', -33.0, -70.0)]),
+        })
+
+        posted = scraper.scrape_range(client, 'http://server', ['2026-01-01', '2026-01-02'],
+                                      ['Japan', 'Chile'], workers=4, per_minute=6000,
+                                      ledger_file=ledger_file)
+
+        assert client.calls == 4
+        assert [event['name'] for event in posted] == ['Chile quake']
+        mock_get.assert_called_once()
+        mock_post.assert_called_once()
+        assert mock_post.call_args[0][0] == 'http://server/natural_disasters/bulk'
+        ledger = scraper.load_ledger(ledger_file)
+        assert set(ledger) == {'2026-01-01|Japan', '2026-01-01|Chile',
+                               '2026-01-02|Japan', '2026-01-02|Chile'}
+
+    def test_skips_ledger_entries(self, server, tmp_path):
+        ledger_file = str(tmp_path / 'ledger.json')
+        scraper.save_ledger({'2026-01-01|Japan': {'events': 0}}, ledger_file)
+        client = FakeClient({})
+
+        scraper.scrape_range(client, 'http://server', ['2026-01-01', '2026-01-02'],
+                             ['Japan'], per_minute=6000, ledger_file=ledger_file)
+
+        assert client.calls == 1
+        assert '2026-01-02|Japan' in scraper.load_ledger(ledger_file)
+
+    def test_failed_pairs_not_recorded(self, server, tmp_path):
+        ledger_file = str(tmp_path / 'ledger.json')
+        client = FakeClient({('2026-01-01', 'Japan'): 'not json'})
+
+        scraper.scrape_range(client, 'http://server', ['2026-01-01'], ['Japan'],
+                             per_minute=6000, ledger_file=ledger_file)
+
+        assert scraper.load_ledger(ledger_file) == {}
+
+    def test_dry_run(self, server, tmp_path):
+        _, mock_post = server
+        ledger_file = str(tmp_path / 'ledger.json')
+        client = FakeClient({})
+
+        scraper.scrape_range(client, 'http://server', ['2026-01-01'], ['Japan'],
+                             per_minute=6000, ledger_file=ledger_file, dry_run=True)
+
+        mock_post.assert_not_called()
+        assert scraper.load_ledger(ledger_file) == {}
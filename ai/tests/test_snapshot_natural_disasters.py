@@ -0,0 +1,62 @@
+import pytest
+from bson.objectid import ObjectId
+from unittest.mock import patch
+import data.db_connect as dbc
+import data.snapshots as snap
+import ai.utilities.snapshot_natural_disasters as snapshot
+
+IDS = [f'{i:024x}' for i in range(3)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = snap.SnapshotStore(str(tmp_path))
+    store.write([{'_id': _id, 'value': 1} for _id in IDS])
+    store.write([{'_id': _id, 'value': 2} for _id in IDS[:2]])
+    return store
+
+
+@pytest.fixture
+def mock_db():
+    with patch('data.db_connect.create_many') as mock_create_many, \
+            patch('data.db_connect.delete') as mock_delete:
+        result = dbc.BulkInsertResult()
+        mock_create_many.side_effect = lambda collection, docs, **kwargs: result
+        yield mock_create_many, mock_delete
+
+
+class TestRestore:
+    def test_latest(self, store, mock_db):
+        mock_create_many, mock_delete = mock_db
+        snapshot.restore(store, workers=2, batch_size=10)
+        mock_delete.assert_not_called()
+        args, kwargs = mock_create_many.call_args
+        assert args[1] == [{'_id': ObjectId(_id), 'value': 2} for _id in IDS[:2]]
+        assert kwargs == {'ordered': False, 'batch_size': 10, 'workers': 2}
+
+    def test_generation_and_drop(self, store, mock_db):
+        mock_create_many, mock_delete = mock_db
+        snapshot.restore(store, generation=1, drop=True)
+        mock_delete.assert_called_once_with(snapshot.COLLECTION, {})
+        assert len(mock_create_many.call_args[0][1]) == 3
+
+    def test_corrupt_file(self, store, mock_db):
+        mock_create_many, _ = mock_db
+        with open(store.path(store.get(1)[snap.FILE]), 'ab') as f:
+            f.write(b'corrupt')
+        with pytest.raises(ValueError):
+            snapshot.restore(store)
+        mock_create_many.assert_not_called()
+
+    def test_empty_store(self, tmp_path, mock_db):
+        with pytest.raises(ValueError):
+            snapshot.restore(snap.SnapshotStore(str(tmp_path)))
+
+
+class TestPrintDiff:
+    def test_counts(self, store, capsys):
+        counts = snapshot.print_diff(store, 1, 2)
+        assert counts == {snap.ADDED: 0, snap.REMOVED: 1, snap.MODIFIED: 2}
+        out = capsys.readouterr().out
+        assert f'- {IDS[2]}' in out
+        assert 'value: 1 -> 2' in out
@@ -0,0 +1,124 @@
+"""
+Shared HTTP client for the ai/ scripts.
+
+All requests go through one pooled requests.Session, so connections to the
+API server are kept alive and reused instead of opened per call. Every
+request gets a default timeout, and idempotent requests are retried with
+exponential backoff on connection errors and 429/5xx responses.
+map_concurrent fans calls out over a bounded thread pool that shares the
+same connection pool.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5, 30)
+RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Connections kept alive per host; matches the largest fan-out
+POOL_SIZE = 16
+MAX_WORKERS = 8
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class TimeoutSession(requests.Session):
+    """Session that applies a default timeout to requests that do not set one"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def make_session(pool_size=POOL_SIZE, retries=RETRIES, backoff_factor=BACKOFF_FACTOR,
+                 timeout=DEFAULT_TIMEOUT):
+    """Build a keep-alive session with connection pooling and retries"""
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        # Only idempotent methods are retried, so a POST is never sent twice
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=retry)
+    session = TimeoutSession(timeout=timeout)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """Return the shared session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = make_session()
+    return _session
+
+
+def get(url, **kwargs):
+    return get_session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return get_session().post(url, **kwargs)
+
+
+def put(url, **kwargs):
+    return get_session().put(url, **kwargs)
+
+
+def patch(url, **kwargs):
+    return get_session().patch(url, **kwargs)
+
+
+class RateLimiter:
+    """
+    Spaces calls out so no more than per_minute of them start in any minute,
+    across all threads sharing the limiter.
+    """
+
+    def __init__(self, per_minute):
+        if per_minute <= 0:
+            raise ValueError(f"Bad rate: {per_minute}")
+        self.interval = 60 / per_minute
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def map_concurrent(func, items, workers=MAX_WORKERS):
+    """
+    Call func on each item using at most workers threads, returning the
+    results in the same order as items. Exceptions propagate to the caller.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as executor:
+        return list(executor.map(func, items))
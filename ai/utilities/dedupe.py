@@ -1,9 +1,15 @@
 import requests
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
+from math import radians, sin, cos, sqrt, atan2, floor, ceil
 import argparse
+import json
+import os
 import sys
 from server.env import get_env
 from security.security import DEFAULT_BYPASS_KEY
+import ai.utilities.api_client as api_client
+from data.snapshots import SnapshotStore
 
 try:
     from ai.utilities.disaster_config import DISASTER_TYPES, DEFAULT_DEDUPE
@@ -19,6 +25,9 @@ except ImportError:
 
 DRY_RUN = False
 
+KM_PER_DEGREE = 111.32
+EARTH_RADIUS_KM = 6371
+
 SERVER = None
 AUTH_BYPASS_KEY = get_env("AUTH_BYPASS_KEY", DEFAULT_BYPASS_KEY)
 HEADERS = {}
@@ -27,6 +36,22 @@ HEADERS = {}
 def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--server", required=True)
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Cluster all events locally and apply the links in one bulk request"
+    )
+    parser.add_argument(
+        "--snapshot",
+        default=None,
+        help="Snapshot JSON file or store directory to cluster instead of fetching "
+             "events (with --batch)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the links that would be made without applying them"
+    )
     return parser.parse_args()
 
 
@@ -57,6 +82,17 @@ def get_server_and_headers(server=None, headers=None):
     return resolved_server, resolved_headers
 
 
+def haversine(lat1, lon1, lat2, lon2):
+    """Return the great circle distance between two points in km"""
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+
+    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+
+    return EARTH_RADIUS_KM * c
+
+
 def get_rule(event_type):
     return DISASTER_TYPES.get(event_type, DEFAULT_DEDUPE)
 
@@ -85,7 +121,7 @@ def normalize_records_payload(data, context):
 
 def get_all_events(server=None, headers=None):
     resolved_server, resolved_headers = get_server_and_headers(server, headers)
-    r = requests.get(f"{resolved_server}/natural_disasters", headers=resolved_headers)
+    r = api_client.get(f"{resolved_server}/natural_disasters", headers=resolved_headers)
     r.raise_for_status()
     data = r.json()
     return normalize_records_payload(data, "GET /natural_disasters")
@@ -98,15 +134,17 @@ def get_date_window(date_str, date_window_days):
     return start, end
 
 
-def search_nearby(event, server=None, headers=None):
-    resolved_server, resolved_headers = get_server_and_headers(server, headers)
-
+def get_search_params(event):
+    """
+    Build the nearby-search parameters for an event from its type's radius
+    and date window rules.
+    """
     event_type = event.get("type")
     rule = get_rule(event_type)
 
     date_start, date_end = get_date_window(event["date"], rule["date_window_days"])
 
-    params = {
+    return {
         "lat": event["latitude"],
         "lon": event["longitude"],
         "radius_km": rule["radius_km"],
@@ -115,7 +153,13 @@ def search_nearby(event, server=None, headers=None):
         "type": event_type,
     }
 
-    r = requests.get(
+
+def search_nearby(event, server=None, headers=None):
+    resolved_server, resolved_headers = get_server_and_headers(server, headers)
+
+    params = get_search_params(event)
+
+    r = api_client.get(
         f"{resolved_server}/natural_disasters/search",
         params=params,
         headers=resolved_headers
@@ -132,6 +176,30 @@ def search_nearby(event, server=None, headers=None):
     return normalize_records_payload(data, "GET /natural_disasters/search")
 
 
+def find_candidates(event, search=None, server=None, headers=None):
+    """
+    Candidate-search interface used by consolidation.
+
+    When search is given it is called in-process with the keyword arguments
+    lat, lon, radius_km, date_start, date_end and disaster_type, and must
+    return a list of records. This is how the API server consolidates new
+    events against its own cache. Otherwise the server's
+    /natural_disasters/search endpoint is queried over HTTP, as the CLI does.
+    """
+    if search is None:
+        return search_nearby(event, server=server, headers=headers)
+
+    params = get_search_params(event)
+    return search(
+        lat=params["lat"],
+        lon=params["lon"],
+        radius_km=params["radius_km"],
+        date_start=params["date_start"],
+        date_end=params["date_end"],
+        disaster_type=params["type"],
+    )
+
+
 def link(event_id, report_id, server=None, headers=None):
     resolved_server, resolved_headers = get_server_and_headers(server, headers)
 
@@ -140,7 +208,7 @@ def link(event_id, report_id, server=None, headers=None):
         return
 
     url = f"{resolved_server}/natural_disasters/{event_id}/reports/{report_id}"
-    r = requests.post(url, headers=resolved_headers)
+    r = api_client.post(url, headers=resolved_headers)
     r.raise_for_status()
     print(f"Linked {report_id} → {event_id}")
 
@@ -188,14 +256,15 @@ def should_skip_candidate(candidate, root_id):
     return False
 
 
-def pick_parent_candidate(event, server=None, headers=None):
+def pick_parent_candidate(event, server=None, headers=None, search=None):
     """
     Find an existing visible top-level parent candidate for a newly added event.
+    See find_candidates for how search is used.
 
     Returns the chosen parent record dict, or None if no suitable parent exists.
     """
     try:
-        nearby = search_nearby(event, server=server, headers=headers)
+        nearby = find_candidates(event, search=search, server=server, headers=headers)
     except requests.RequestException:
         return None
 
@@ -235,11 +304,14 @@ def pick_parent_candidate(event, server=None, headers=None):
     return candidates[0]
 
 
-def consolidate_new_event(new_event, new_event_id=None, server=None, headers=None):
+def consolidate_new_event(new_event, new_event_id=None, server=None, headers=None,
+                          search=None):
     """
     Helper for backend/API usage.
 
     Given a new event dict and optionally its created id, find an existing parent.
+    Pass search to look for candidates in-process (see find_candidates)
+    instead of calling the server's search endpoint over HTTP.
     Returns a dict describing what should happen, without forcing the caller
     to run the whole batch dedupe script.
 
@@ -255,7 +327,8 @@ def consolidate_new_event(new_event, new_event_id=None, server=None, headers=Non
     parent = pick_parent_candidate(
         event_for_match,
         server=server,
-        headers=headers
+        headers=headers,
+        search=search
     )
 
     if not parent:
@@ -264,8 +337,207 @@ def consolidate_new_event(new_event, new_event_id=None, server=None, headers=Non
     return {"action": "link", "parent": parent}
 
 
+class UnionFind:
+    """Disjoint sets of ids whose representative is the smallest id"""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            # Path halving keeps the trees shallow
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a != root_b:
+            if root_b < root_a:
+                root_a, root_b = root_b, root_a
+            self.parent[root_b] = root_a
+
+
+def date_ordinal(date_str):
+    return parse_date(date_str).toordinal()
+
+
+def build_spatial_index(events, radius_km):
+    """
+    Bucket events into a lat/lon grid whose cells are radius_km tall. Each
+    cell holds (date ordinal, event) pairs sorted by date, so a cell can be
+    searched for a date window with bisect.
+
+    Returns (index, cell_deg, lon_cells).
+    """
+    cell_deg = max(radius_km / KM_PER_DEGREE, 1e-6)
+    lon_cells = max(1, ceil(360 / cell_deg))
+    index = {}
+    for ordinal, event in events:
+        cell = (
+            floor(event["latitude"] / cell_deg),
+            floor((event["longitude"] + 180) / cell_deg) % lon_cells,
+        )
+        index.setdefault(cell, []).append((ordinal, event))
+    for bucket in index.values():
+        bucket.sort(key=lambda entry: entry[0])
+    return index, cell_deg, lon_cells
+
+
+def neighbor_cells(lat, lon, radius_km, cell_deg, lon_cells):
+    """Return the grid cells that may hold points within radius_km of (lat, lon)"""
+    lat_cell = floor(lat / cell_deg)
+    lon_cell = floor((lon + 180) / cell_deg) % lon_cells
+
+    # Longitude degrees shrink towards the poles, so more cells are needed
+    lon_scale = cos(radians(min(abs(lat) + cell_deg, 90)))
+    if lon_scale <= 0:
+        lon_span = lon_cells
+    else:
+        lon_span = min(lon_cells, ceil(radius_km / (KM_PER_DEGREE * lon_scale) / cell_deg))
+
+    lon_offsets = range(lon_cells) if 2 * lon_span + 1 >= lon_cells \
+        else range(lon_cell - lon_span, lon_cell + lon_span + 1)
+    for dlat in (-1, 0, 1):
+        for lon_index in lon_offsets:
+            yield lat_cell + dlat, lon_index % lon_cells
+
+
+def is_clusterable(event):
+    """Return whether an event is a visible top-level event with a location and date"""
+    if not isinstance(event, dict) or "_id" not in event:
+        return False
+    if not event.get("show", True) or event.get("parent_event"):
+        return False
+    if event.get("latitude") is None or event.get("longitude") is None:
+        return False
+    try:
+        date_ordinal(event.get("date") or "")
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def cluster_events(events):
+    """
+    Group visible top-level events that are within their type's radius and
+    date window of each other, directly or through other events.
+
+    Events of each type are indexed by grid cell and date so that each event
+    is only compared with the few events near it, and groups are merged with
+    union-find. Returns a link plan mapping each group's smallest _id (the
+    parent) to the sorted _ids of the rest of the group.
+    """
+    by_type = {}
+    for event in events:
+        if is_clusterable(event):
+            by_type.setdefault(event.get("type"), []).append(
+                (date_ordinal(event["date"]), event))
+
+    groups = UnionFind()
+    for event_type, typed_events in by_type.items():
+        rule = get_rule(event_type)
+        radius_km = rule["radius_km"]
+        window = rule["date_window_days"]
+        index, cell_deg, lon_cells = build_spatial_index(typed_events, radius_km)
+
+        for ordinal, event in typed_events:
+            for cell in neighbor_cells(event["latitude"], event["longitude"],
+                                       radius_km, cell_deg, lon_cells):
+                bucket = index.get(cell)
+                if not bucket:
+                    continue
+                lo = bisect_left(bucket, ordinal - window, key=lambda entry: entry[0])
+                hi = bisect_right(bucket, ordinal + window, key=lambda entry: entry[0])
+                for _, other in bucket[lo:hi]:
+                    # Each pair only needs to be checked once
+                    if other["_id"] <= event["_id"]:
+                        continue
+                    distance = haversine(event["latitude"], event["longitude"],
+                                         other["latitude"], other["longitude"])
+                    if distance <= radius_km:
+                        groups.union(event["_id"], other["_id"])
+
+    plan = {}
+    for typed_events in by_type.values():
+        for _, event in typed_events:
+            root = groups.find(event["_id"])
+            if root != event["_id"]:
+                plan.setdefault(root, []).append(event["_id"])
+    for children in plan.values():
+        children.sort()
+    return plan
+
+
+def load_snapshot_events(path):
+    """
+    Read the events from a snapshot JSON file, or the newest generation of a
+    snapshot store directory.
+    """
+    if os.path.isdir(path):
+        return list(SnapshotStore(path).reconstruct().values())
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return data
+    return normalize_records_payload(data, path)
+
+
+def apply_link_plan(plan, server=None, headers=None):
+    """
+    Apply a link plan ({parent_id: [report_ids]}) with a single bulk request.
+    """
+    resolved_server, resolved_headers = get_server_and_headers(server, headers)
+
+    num_links = sum(len(children) for children in plan.values())
+    if DRY_RUN:
+        for parent_id, children in plan.items():
+            for child_id in children:
+                print(f"[DRY RUN] Would link {child_id} → {parent_id}")
+        return num_links
+
+    if not plan:
+        return 0
+
+    r = api_client.post(
+        f"{resolved_server}/natural_disasters/links",
+        json={"links": plan},
+        headers=resolved_headers,
+        timeout=60
+    )
+    r.raise_for_status()
+    print(f"Linked {num_links} report(s) to {len(plan)} parent event(s)")
+    return num_links
+
+
+def batch_main(args):
+    """
+    Cluster every event at once and apply the resulting links in one request.
+    """
+    server, headers = configure(args.server)
+
+    if args.snapshot:
+        events = load_snapshot_events(args.snapshot)
+    else:
+        events = get_all_events(server=server, headers=headers)
+
+    plan = cluster_events(events)
+    print(f"Found {len(plan)} group(s) to consolidate")
+    apply_link_plan(plan, server=server, headers=headers)
+
+
 def main():
     args = parse_args()
+
+    global DRY_RUN
+    DRY_RUN = DRY_RUN or args.dry_run
+
+    if args.batch:
+        batch_main(args)
+        return
+
     server, headers = configure(args.server)
 
     events = get_all_events(server=server, headers=headers)
@@ -284,21 +556,32 @@ def main():
 
     id_map = {e["_id"]: e for e in clean_events}
 
-    for event in clean_events:
-        if not event.get("show", True):
-            continue
+    # Searches for all top-level events are fetched concurrently up front,
+    # so they do not reflect links made earlier in this run. id_map does:
+    # events linked in this run are skipped both as roots and as candidates
+    def search_root(event):
+        try:
+            return search_nearby(event, server=server, headers=headers)
+        except requests.RequestException as e:
+            print(f"Failed nearby search for root {event['_id']}: {e}")
+            return None
+
+    roots = [e for e in clean_events if e.get("show", True) and not e.get("parent_event")]
+    searches = dict(zip(
+        (e["_id"] for e in roots),
+        api_client.map_concurrent(search_root, roots)
+    ))
 
-        if event.get("parent_event"):
+    for event in roots:
+        if id_map[event["_id"]].get("parent_event"):
             continue
 
         root_event = choose_root(event, id_map)
         root_id = root_event["_id"]
         rule = get_rule(root_event.get("type"))
 
-        try:
-            nearby = search_nearby(root_event, server=server, headers=headers)
-        except requests.RequestException as e:
-            print(f"Failed nearby search for root {root_id}: {e}")
+        nearby = searches.get(root_id)
+        if nearby is None:
             continue
 
         for candidate in nearby:
@@ -316,6 +599,9 @@ def main():
             if cid < root_id:
                 continue
 
+            if id_map.get(cid, candidate).get("parent_event"):
+                continue
+
             try:
                 link(root_id, cid, server=server, headers=headers)
 
@@ -0,0 +1,63 @@
+"""
+Local store of LLM repair results.
+
+Each entry is keyed on a hash of the fields the model sees plus the prompt
+version, so a record is only sent to the model again when it or the prompt
+changes. Entries remember the patch the model produced (which may be empty)
+and whether it has been applied, so unapplied patches from an earlier run
+can be applied without asking the model again.
+"""
+
+import hashlib
+import json
+import os
+
+REPAIR_STORE_FILE = "ai/repair_store.json"
+PATCH = "patch"
+APPLIED = "applied"
+
+
+def repair_key(record, fields, prompt_version):
+    """Return the store key for a record's relevant fields and a prompt version"""
+    relevant = {field: record.get(field) for field in fields}
+    encoded = json.dumps([prompt_version, relevant], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class RepairStore:
+    def __init__(self, filename=REPAIR_STORE_FILE):
+        self.filename = filename
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """Read the store, starting empty if it does not exist or is corrupt"""
+        try:
+            with open(self.filename, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            entries = {}
+        self.entries = entries if isinstance(entries, dict) else {}
+
+    def save(self):
+        """Write the store atomically so an interrupted run cannot corrupt it"""
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_filename, self.filename)
+
+    def get(self, key):
+        """Return the entry for key, or None if the record was never repaired"""
+        return self.entries.get(key)
+
+    def put(self, key, patch):
+        """Remember the patch produced for key as not yet applied"""
+        self.entries[key] = {PATCH: patch, APPLIED: False}
+
+    def mark_applied(self, keys):
+        for key in keys:
+            if key in self.entries:
+                self.entries[key][APPLIED] = True
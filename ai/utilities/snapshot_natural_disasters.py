@@ -1,33 +1,194 @@
 # ai/utilities/snapshot_natural_disasters.py
+"""
+Snapshot the natural_disasters collection into an incremental snapshot
+store (see data/snapshots.py). Only the records that changed since the last
+snapshot are written, and nothing is written if none did. Records are
+streamed from a Mongo cursor in batches, so memory use stays flat as the
+collection grows.
 
+You can run this script with:
+    python -m ai.utilities.snapshot_natural_disasters
+    python -m ai.utilities.snapshot_natural_disasters list
+    python -m ai.utilities.snapshot_natural_disasters export OUT.ndjson.xz
+    python -m ai.utilities.snapshot_natural_disasters import-legacy FILE...
+    python -m ai.utilities.snapshot_natural_disasters restore [--generation N] [--drop]
+    python -m ai.utilities.snapshot_natural_disasters diff A B
+"""
+
+import argparse
 import json
 import os
-from datetime import datetime
-from data.db_connect import CRUD
+import re
+from bson.objectid import ObjectId
+import data.db_connect as dbc
+import data.snapshots as snap
 
 COLLECTION = "natural_disasters"
 SNAPSHOT_DIR = "db_snapshots/natural_disasters"
+RESTORE_WORKERS = 4
 
+# Name of the full JSON dumps the previous version of this script wrote
+LEGACY_NAME = re.compile(r"(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})\.json$")
 
-def main():
-    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
 
-    crud = CRUD(COLLECTION)
-    records = crud.read()
+def take_snapshot(store, batch_size=dbc.DEFAULT_BATCH_SIZE,
+                  compression=snap.DEFAULT_COMPRESSION):
+    records = dbc.stream(COLLECTION, batch_size=batch_size)
+    entry = store.write(records, compression=compression)
+    if entry is None:
+        print("No changes since the last snapshot.")
+    else:
+        print(f"Saved generation {entry[snap.GENERATION]} ({entry[snap.KIND]}): "
+              f"{entry[snap.CHANGED]} changed, {entry[snap.REMOVED]} removed, "
+              f"{entry[snap.RECORDS]} records")
+    return entry
+
+
+def export(filename, batch_size=dbc.DEFAULT_BATCH_SIZE):
+    """
+    Stream the whole collection to a standalone compressed NDJSON file. The
+    compression is chosen from the suffix (.gz or .xz).
+    """
+    compression = next((name for name, (extension, _) in snap.CODECS.items()
+                        if filename.endswith(extension)), None)
+    if compression is None:
+        raise ValueError(f"Export file must end in one of "
+                         f"{[extension for extension, _ in snap.CODECS.values()]}")
+    count = 0
+
+    def counted(records):
+        nonlocal count
+        for record in records:
+            count += 1
+            yield record
+
+    checksum = snap.write_ndjson(filename, counted(dbc.stream(COLLECTION, batch_size=batch_size)),
+                                 compression)
+    print(f"Exported {count} records to {filename} (sha256 {checksum})")
+    return checksum
+
+
+def legacy_timestamp(filename):
+    match = LEGACY_NAME.search(os.path.basename(filename))
+    if not match:
+        raise ValueError(f"Not a legacy snapshot name: {filename}")
+    day, hour, minute, second = match.groups()
+    return f"{day}T{hour}:{minute}:{second}Z"
+
 
-    latest_path = os.path.join(SNAPSHOT_DIR, "latest.json")
+def import_legacy(store, filenames):
+    """
+    Add legacy {"records": [...]} dumps to the store as generations, oldest
+    first, so their history is kept without storing repeated copies.
+    """
+    for filename in sorted(filenames, key=legacy_timestamp):
+        with open(filename, "r", encoding="utf-8") as f:
+            records = json.load(f)["records"]
+        records.sort(key=lambda record: record["_id"])
+        entry = store.write(records, created=legacy_timestamp(filename))
+        if entry is None:
+            print(f"{filename}: unchanged")
+        else:
+            print(f"{filename}: generation {entry[snap.GENERATION]}")
 
-    timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S")
-    archive_path = os.path.join(SNAPSHOT_DIR, f"{timestamp}.json")
 
-    with open(latest_path, "w", encoding="utf-8") as f:
-        json.dump(records, f, indent=2, ensure_ascii=False)
+def restore(store, generation=None, drop=False, batch_size=dbc.DEFAULT_BATCH_SIZE,
+            workers=RESTORE_WORKERS):
+    """
+    Load a generation (default newest) back into MongoDB with unordered,
+    batched inserts sent concurrently. With drop the collection is emptied
+    first; otherwise records whose _id already exists are reported as failed.
+    """
+    if generation is None:
+        latest = store.latest()
+        if latest is None:
+            raise ValueError(f"No snapshots in {store.directory}")
+        generation = latest[snap.GENERATION]
+    for entry in store.generations():
+        if entry[snap.GENERATION] <= generation and not store.verify(entry[snap.GENERATION]):
+            raise ValueError(f"Checksum mismatch for {entry[snap.FILE]}")
+    docs = list(store.reconstruct(generation).values())
+    for doc in docs:
+        if ObjectId.is_valid(doc["_id"]):
+            doc["_id"] = ObjectId(doc["_id"])
 
-    with open(archive_path, "w", encoding="utf-8") as f:
-        json.dump(records, f, indent=2, ensure_ascii=False)
+    if drop:
+        print(f"Deleted {dbc.delete(COLLECTION, {})} records")
+    result = dbc.create_many(COLLECTION, docs, ordered=False,
+                             batch_size=batch_size, workers=workers)
+    print(f"Restored generation {generation}: {len(result.inserted_ids)} inserted, "
+          f"{len(result.failed)} failed")
+    return result
+
+
+def print_diff(store, old, new):
+    """Print the records added (+), removed (-) and modified (~) from old to new"""
+    marks = {snap.ADDED: "+", snap.REMOVED: "-", snap.MODIFIED: "~"}
+    counts = dict.fromkeys(marks, 0)
+    for change in store.diff(old, new):
+        counts[change[snap.CHANGE]] += 1
+        print(f"{marks[change[snap.CHANGE]]} {change[snap.ID]}")
+        if change[snap.CHANGE] == snap.MODIFIED:
+            for field, values in change[snap.FIELDS].items():
+                print(f"    {field}: {json.dumps(values[snap.OLD])} -> "
+                      f"{json.dumps(values[snap.NEW])}")
+    print(f"{counts[snap.ADDED]} added, {counts[snap.REMOVED]} removed, "
+          f"{counts[snap.MODIFIED]} modified")
+    return counts
+
+
+def list_generations(store):
+    for entry in store.generations():
+        print(f"{entry[snap.GENERATION]:>6}  {entry[snap.CREATED]}  {entry[snap.KIND]:<5}  "
+              f"{entry[snap.RECORDS]} records, {entry[snap.CHANGED]} changed, "
+              f"{entry[snap.REMOVED]} removed")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="Snapshot store directory")
+    parser.add_argument("--batch-size", type=int, default=dbc.DEFAULT_BATCH_SIZE,
+                        help="Records fetched from Mongo per round trip")
+    parser.add_argument("--compression", choices=sorted(snap.CODECS),
+                        default=snap.DEFAULT_COMPRESSION,
+                        help="Compression for new snapshot generations")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("take", help="Snapshot the collection (the default)")
+    commands.add_parser("list", help="List the snapshot generations")
+    export_parser = commands.add_parser(
+        "export", help="Stream the collection to a compressed NDJSON file")
+    export_parser.add_argument("file", help="Output file ending in .gz or .xz")
+    legacy = commands.add_parser("import-legacy", help="Add old full JSON dumps to the store")
+    legacy.add_argument("files", nargs="+")
+    restore_parser = commands.add_parser("restore", help="Load a generation into MongoDB")
+    restore_parser.add_argument("--generation", type=int, help="Generation to load (default newest)")
+    restore_parser.add_argument("--drop", action="store_true",
+                                help="Delete the collection's records first")
+    restore_parser.add_argument("--workers", type=int, default=RESTORE_WORKERS,
+                                help="Insert batches sent at once")
+    diff_parser = commands.add_parser("diff", help="Show what changed between two generations")
+    diff_parser.add_argument("old", type=int, help="Older generation")
+    diff_parser.add_argument("new", type=int, help="Newer generation")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    store = snap.SnapshotStore(args.dir)
 
-    print(f"Saved latest snapshot: {latest_path}")
-    print(f"Saved archive snapshot: {archive_path}")
+    if args.command == "list":
+        list_generations(store)
+    elif args.command == "export":
+        export(args.file, batch_size=args.batch_size)
+    elif args.command == "import-legacy":
+        import_legacy(store, args.files)
+    elif args.command == "diff":
+        print_diff(store, args.old, args.new)
+    elif args.command == "restore":
+        restore(store, generation=args.generation, drop=args.drop,
+                batch_size=args.batch_size, workers=args.workers)
+    else:
+        take_snapshot(store, batch_size=args.batch_size, compression=args.compression)
 
 
 if __name__ == "__main__":
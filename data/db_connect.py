@@ -2,6 +2,7 @@
 All interaction with MongoDB should be through this file!
 We may be required to use a new database at any point.
 """
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 import pymongo as pm
 import certifi
@@ -17,6 +18,9 @@ CONN_TIMEOUT = 'connectTimeoutMS'
 SOCK_TIMEOUT = 'socketTimeoutMS'
 CONNECT = 'connect'
 MAX_POOL_SIZE = 'maxPoolSize'
+# Maximum number of docs sent in one insert_many call by create_many
+DEFAULT_BATCH_SIZE = 1000
+
 PA_SETTINGS = {
     CONN_TIMEOUT: get_env('MONGO_CONN_TIMEOUT', 30000),
     SOCK_TIMEOUT: get_env('MONGO_SOCK_TIMEOUT', None),
@@ -101,12 +105,140 @@ def create(collection, doc, db=SE_DB):
     return client[db][collection].insert_one(doc)
 
 
+class BulkInsertResult:
+    """
+    Result of create_many.
+    - inserted_ids: ids of the inserted docs, in input order
+    - failed: (index, error message) for each doc that was not inserted
+    - batches: one dict per batch with its start index, size, inserted
+      count, and failed indexes
+    """
+    def __init__(self):
+        self.inserted_ids = []
+        self.failed = []
+        self.batches = []
+
+    @property
+    def failed_indexes(self) -> list:
+        return [index for index, _ in self.failed]
+
+
+class BulkInsertError(RuntimeError):
+    """Raised when some docs of a bulk insert could not be written."""
+    def __init__(self, result: BulkInsertResult, num_docs: int):
+        self.result = result
+        failed = result.failed_indexes
+        super().__init__(f'Failed to insert {len(failed)} of {num_docs} docs '
+                         f'(indexes {failed[:10]}{"..." if len(failed) > 10 else ""})')
+
+
+def _insert_batch(coll, batch: list, start: int, ordered: bool) -> dict:
+    """
+    Insert one batch and return its result. Indexes are relative to the
+    whole create_many call.
+    """
+    failed = {}
+    try:
+        coll.insert_many(batch, ordered=ordered)
+    except pm.errors.BulkWriteError as e:
+        for error in e.details.get('writeErrors', []):
+            failed[error['index']] = error.get('errmsg', str(e))
+        if ordered and failed:
+            # An ordered insert stops at the first error
+            for index in range(min(failed), len(batch)):
+                failed.setdefault(index, 'Not attempted after an earlier error')
+    except pm.errors.PyMongoError as e:
+        failed = {index: str(e) for index in range(len(batch))}
+    return {
+        'start': start,
+        'size': len(batch),
+        'inserted_ids': [doc.get(MONGO_ID) for index, doc in enumerate(batch)
+                         if index not in failed],
+        'failed': [(start + index, failed[index]) for index in sorted(failed)],
+    }
+
+
+@needs_db
+def create_many(collection, docs, db=SE_DB, ordered=False,
+                batch_size=DEFAULT_BATCH_SIZE, workers=1) -> BulkInsertResult:
+    """
+    Insert a list of docs into collection in batches of at most batch_size.
+
+    With ordered=False (the default) a bad doc does not stop the rest of the
+    docs from being written, and up to workers batches are sent
+    concurrently. With ordered=True batches are sent one at a time and
+    nothing after the first failure is written.
+
+    Return a BulkInsertResult describing what was written; failures are
+    reported there rather than raised.
+    """
+    if not isinstance(batch_size, int) or batch_size <= 0:
+        raise ValueError(f'Bad batch_size: {batch_size}')
+    coll = client[db][collection]
+    starts = range(0, len(docs), batch_size)
+
+    if ordered or workers <= 1:
+        batches = []
+        for start in starts:
+            batch = _insert_batch(coll, docs[start:start + batch_size], start, ordered)
+            batches.append(batch)
+            if ordered and batch['failed']:
+                break
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            batches = list(executor.map(
+                lambda start: _insert_batch(
+                    coll, docs[start:start + batch_size], start, ordered),
+                starts))
+
+    result = BulkInsertResult()
+    for batch in batches:
+        result.inserted_ids.extend(batch['inserted_ids'])
+        result.failed.extend(batch['failed'])
+        result.batches.append({
+            'start': batch['start'],
+            'size': batch['size'],
+            'inserted': len(batch['inserted_ids']),
+            'failed': [index for index, _ in batch['failed']],
+        })
+    # Docs in batches skipped after an ordered failure were not attempted
+    attempted = sum(batch['size'] for batch in batches)
+    result.failed.extend((index, 'Not attempted after an earlier error')
+                         for index in range(attempted, len(docs)))
+    return result
+
+
+@needs_db
+def upsert_many(collection, docs, keys, insert_only=(), db=SE_DB):
+    """
+    Insert or update each doc in a single bulk write, matching existing docs
+    on the key fields. Fields named in insert_only are only written when a
+    new doc is inserted, so existing values are preserved.
+    Return the BulkWriteResult, or None if there are no docs.
+    """
+    operations = []
+    for doc in docs:
+        filt = {key: doc.get(key) for key in keys}
+        update = {'$set': {k: v for k, v in doc.items() if k not in insert_only}}
+        on_insert = {k: v for k, v in doc.items() if k in insert_only}
+        if on_insert:
+            update['$setOnInsert'] = on_insert
+        operations.append(pm.UpdateOne(filt, update, upsert=True))
+    if not operations:
+        return None
+    return client[db][collection].bulk_write(operations, ordered=False)
+
+
 @needs_db
-def create_many(collection, docs, db=SE_DB):
+def bulk_update(collection, updates, db=SE_DB):
     """
-    Insert a list of docs into collection.
+    Apply (filter, update) pairs as update operators in a single unordered
+    bulk write. Return the BulkWriteResult, or None if there are no updates.
     """
-    return client[db][collection].insert_many(docs)
+    operations = [pm.UpdateOne(filt, update) for filt, update in updates]
+    if not operations:
+        return None
+    return client[db][collection].bulk_write(operations, ordered=False)
 
 
 @needs_db
@@ -135,6 +267,34 @@ def update(collection, filters, update_dict, db=SE_DB):
     return client[db][collection].update_many(filters, {'$set': update_dict})
 
 
+@needs_db
+def modify(collection, filt, update, db=SE_DB):
+    """
+    Apply update operators to the first doc matching the filter in a single
+    atomic operation. Return the updated doc, or None if none matched.
+    """
+    doc = client[db][collection].find_one_and_update(
+        filt, update, return_document=pm.ReturnDocument.AFTER)
+    if doc is not None:
+        convert_mongo_id(doc)
+    return doc
+
+
+def add_to_set(collection, filt, field, values, db=SE_DB):
+    """Add each value to an array field unless it is already present"""
+    return modify(collection, filt, {'$addToSet': {field: {'$each': list(values)}}}, db)
+
+
+def pull(collection, filt, field, values, db=SE_DB):
+    """Remove every occurrence of the values from an array field"""
+    return modify(collection, filt, {'$pull': {field: {'$in': list(values)}}}, db)
+
+
+def inc(collection, filt, field, amount=1, db=SE_DB):
+    """Increment a numeric field by amount"""
+    return modify(collection, filt, {'$inc': {field: amount}}, db)
+
+
 @needs_db
 def read(collection, db=SE_DB, no_id=True) -> list:
     """
@@ -151,6 +311,18 @@ def read(collection, db=SE_DB, no_id=True) -> list:
     return ret
 
 
+@needs_db
+def stream(collection, db=SE_DB, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yield every doc in the collection sorted by _id, fetching batch_size docs
+    per round trip so the whole collection is never held in memory.
+    """
+    cursor = client[db][collection].find().sort(MONGO_ID, pm.ASCENDING).batch_size(batch_size)
+    for doc in cursor:
+        convert_mongo_id(doc)
+        yield doc
+
+
 @needs_db
 def read_dict(collection, key, db=SE_DB, no_id=True) -> dict:
     recs = read(collection, db=db, no_id=no_id)
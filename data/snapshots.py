@@ -0,0 +1,544 @@
+"""
+Content-addressed, incremental snapshots of a collection.
+
+Every document is hashed from its canonical JSON. Each snapshot is a
+numbered generation that stores only the documents added or changed since
+the previous generation and the ids removed, as a gzip or lzma compressed
+NDJSON delta streamed from a sorted cursor.
+A snapshot with no changes writes nothing. Every CHECKPOINT_EVERY
+generations a full copy is stored instead, so reconstructing any
+generation replays at most CHECKPOINT_EVERY - 1 deltas.
+
+Layout of a store directory:
+    generations.json          list of generation entries, oldest first
+    hashes.json               _id -> document hash for the latest generation
+    gen-000001.full.ndjson.xz one document per line, sorted by _id
+    gen-000002.delta.ndjson.xz {"put": doc} or {"del": _id} per line, sorted by _id
+    index/gen-000002.ndjson   the whole generation, uncompressed, built on demand
+    index/gen-000002.idx      (_id, offset, length) per document, sorted by _id
+
+The index files let a reader mmap a generation and find one document by
+binary search, or stream them all, without decompressing or loading it.
+"""
+
+import gzip
+import hashlib
+import heapq
+import json
+import lzma
+import mmap
+import os
+import struct
+import tempfile
+from datetime import datetime, timezone
+from itertools import groupby
+
+MONGO_ID = '_id'
+SNAPSHOT_ROOT = 'db_snapshots'
+MANIFEST_FILE = 'generations.json'
+HASHES_FILE = 'hashes.json'
+FULL = 'full'
+DELTA = 'delta'
+PUT = 'put'
+DEL = 'del'
+CHECKPOINT_EVERY = 10
+HASH_BLOCK_SIZE = 1 << 20
+INDEX_DIR = 'index'
+# Index entry: _id padded to ID_WIDTH bytes, byte offset and length of its line
+ID_WIDTH = 24
+INDEX_ENTRY = struct.Struct(f'>{ID_WIDTH}sQI')
+
+# Compression name -> (file suffix, opener)
+CODECS = {
+    'gzip': ('.gz', gzip.open),
+    'lzma': ('.xz', lzma.open),
+}
+DEFAULT_COMPRESSION = 'lzma'
+
+# Keys of a generation entry
+GENERATION = 'generation'
+CREATED = 'created'
+KIND = 'kind'
+FILE = 'file'
+RECORDS = 'records'
+CHANGED = 'changed'
+REMOVED = 'removed'
+DIGEST = 'digest'
+CHECKSUM = 'sha256'
+
+# Keys of a diff record; REMOVED is shared with the generation entry keys
+ID = '_id'
+CHANGE = 'change'
+ADDED = 'added'
+MODIFIED = 'modified'
+FIELDS = 'fields'
+OLD = 'old'
+NEW = 'new'
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def canonical_json(doc: dict) -> str:
+    return json.dumps(doc, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def doc_hash(doc: dict) -> str:
+    """Return the SHA-256 of a document's canonical JSON"""
+    return hashlib.sha256(canonical_json(doc).encode('utf-8')).hexdigest()
+
+
+def state_digest(hashes: dict) -> str:
+    """Return a digest of a whole generation from its document hashes"""
+    digest = hashlib.sha256()
+    for _id in sorted(hashes):
+        digest.update(f'{_id}:{hashes[_id]}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def utc_timestamp(when: datetime = None) -> str:
+    when = when or datetime.now(timezone.utc)
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc)
+    return when.strftime(TIMESTAMP_FORMAT)
+
+
+def validate_as_of(as_of: str):
+    for fmt in (DATE_FORMAT, TIMESTAMP_FORMAT):
+        try:
+            datetime.strptime(as_of, fmt)
+            return
+        except (TypeError, ValueError):
+            pass
+    raise ValueError(f'Bad as_of, expected yyyy-mm-dd or {TIMESTAMP_FORMAT}: {as_of}')
+
+
+def write_json_atomic(filename: str, data):
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_filename, filename)
+
+
+def suffix(compression: str) -> str:
+    if compression not in CODECS:
+        raise ValueError(f'Bad compression: {compression}')
+    return CODECS[compression][0]
+
+
+def open_compressed(filename: str, mode: str = 'rb'):
+    """Open a gzip or lzma file, choosing the codec from its suffix"""
+    for extension, opener in CODECS.values():
+        if filename.endswith(extension):
+            return opener(filename, mode)
+    raise ValueError(f'Unknown compression for {filename}')
+
+
+class HashingWriter:
+    """Binary file wrapper that hashes everything written through it"""
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+
+def write_ndjson(filename: str, values, compression: str = DEFAULT_COMPRESSION) -> str:
+    """
+    Stream values to a compressed NDJSON file, one canonical JSON value per
+    line. Returns the SHA-256 of the compressed bytes, computed as they are
+    written.
+    """
+    suffix(compression)
+    with open(filename, 'wb') as raw:
+        hashing = HashingWriter(raw)
+        with CODECS[compression][1](hashing, 'wb') as f:
+            for value in values:
+                f.write((canonical_json(value) + '\n').encode('utf-8'))
+    return hashing.digest.hexdigest()
+
+
+def file_checksum(filename: str) -> str:
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_ndjson(filename: str):
+    """Yield the JSON value on each line of a compressed NDJSON file"""
+    with open_compressed(filename, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def index_key(_id: str) -> bytes:
+    key = _id.encode('utf-8')
+    if len(key) > ID_WIDTH:
+        raise ValueError(f'Id too long to index: {_id}')
+    return key.ljust(ID_WIDTH, b'\0')
+
+
+def map_file(f):
+    # mmap cannot map an empty file
+    if os.fstat(f.fileno()).st_size == 0:
+        return b''
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class GenerationReader:
+    """
+    Read-only view of one materialized generation. Both files are mapped
+    into memory, so only the pages of the documents read are loaded.
+    """
+
+    def __init__(self, data_filename: str, index_filename: str):
+        self.data_file = open(data_filename, 'rb')
+        self.index_file = open(index_filename, 'rb')
+        self.data = map_file(self.data_file)
+        self.index = map_file(self.index_file)
+
+    def __len__(self) -> int:
+        return len(self.index) // INDEX_ENTRY.size
+
+    def entry(self, i: int) -> tuple:
+        return INDEX_ENTRY.unpack_from(self.index, i * INDEX_ENTRY.size)
+
+    def load(self, offset: int, length: int) -> dict:
+        return json.loads(self.data[offset:offset + length])
+
+    def get(self, _id: str) -> dict:
+        """Return the document with _id, or raise KeyError"""
+        key = index_key(_id)
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.entry(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self):
+            found, offset, length = self.entry(low)
+            if found == key:
+                return self.load(offset, length)
+        raise KeyError(f'{_id} not found in snapshot')
+
+    def lines(self):
+        """Yield (_id, canonical JSON bytes) for every document in _id order"""
+        for i in range(len(self)):
+            key, offset, length = self.entry(i)
+            yield key.rstrip(b'\0').decode('utf-8'), self.data[offset:offset + length]
+
+    def __iter__(self):
+        """Yield every document in _id order"""
+        for i in range(len(self)):
+            _, offset, length = self.entry(i)
+            yield self.load(offset, length)
+
+    def close(self):
+        for mapped in (self.data, self.index):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self.data_file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def diff_fields(old: dict, new: dict) -> dict:
+    """Return {field: {old, new}} for every field that differs"""
+    return {field: {OLD: old.get(field), NEW: new.get(field)}
+            for field in sorted(old.keys() | new.keys())
+            if field not in old or field not in new or old[field] != new[field]}
+
+
+def merge_diff(old_lines, new_lines):
+    """
+    Yield the changes between two streams of (_id, canonical JSON) sorted by
+    _id, walking both once. Lines are only parsed when their bytes differ.
+    """
+    old_lines, new_lines = iter(old_lines), iter(new_lines)
+    old, new = next(old_lines, None), next(new_lines, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            yield {ID: old[0], CHANGE: REMOVED, FIELDS: diff_fields(json.loads(old[1]), {})}
+            old = next(old_lines, None)
+        elif old is None or new[0] < old[0]:
+            yield {ID: new[0], CHANGE: ADDED, FIELDS: diff_fields({}, json.loads(new[1]))}
+            new = next(new_lines, None)
+        else:
+            if old[1] != new[1]:
+                yield {ID: new[0], CHANGE: MODIFIED,
+                       FIELDS: diff_fields(json.loads(old[1]), json.loads(new[1]))}
+            old, new = next(old_lines, None), next(new_lines, None)
+
+
+def ordered(layer, order: int):
+    for _id, doc in layer:
+        yield _id, order, doc
+
+
+def replay(layers):
+    """
+    Yield the documents left after applying layers in order, each a stream
+    of (_id, document, or None if removed) sorted by _id. The layers are
+    merged in one pass, so memory use does not grow with their size.
+    """
+    merged = heapq.merge(*(ordered(layer, order) for order, layer in enumerate(layers)))
+    for _, versions in groupby(merged, key=lambda version: version[0]):
+        # The same _id sorts by layer, so the last version is the newest
+        *_, (_, _, doc) = versions
+        if doc is not None:
+            yield doc
+
+
+class SnapshotStore:
+    def __init__(self, directory: str):
+        if not isinstance(directory, str):
+            raise ValueError(f'Bad type for directory: {type(directory)}')
+        self.directory = directory
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def generations(self) -> list:
+        """Return the generation entries, oldest first"""
+        try:
+            with open(self.path(MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def latest(self):
+        """Return the newest generation entry, or None if there is none"""
+        generations = self.generations()
+        return generations[-1] if generations else None
+
+    def hashes(self) -> dict:
+        """Return the _id -> hash map of the newest generation"""
+        try:
+            with open(self.path(HASHES_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, generation: int) -> dict:
+        """Return the entry for a generation number"""
+        for entry in self.generations():
+            if entry[GENERATION] == generation:
+                return entry
+        raise KeyError(f'Snapshot generation not found: {generation}')
+
+    def find(self, as_of: str):
+        """
+        Return the newest generation created on or before as_of, an ISO date
+        or timestamp, or None if every generation is newer.
+        """
+        # Timestamps are fixed width, so a date compares as its start of day
+        # unless it is extended to cover the whole day
+        if len(as_of) == len('yyyy-mm-dd'):
+            as_of += 'T23:59:59Z'
+        validate_as_of(as_of)
+        found = None
+        for entry in self.generations():
+            if entry[CREATED] <= as_of:
+                found = entry
+        return found
+
+    def write(self, docs, created: str = None, compression: str = DEFAULT_COMPRESSION):
+        """
+        Record docs as a new generation if they differ from the newest one.
+        docs must be sorted by _id, as stream_collection yields them, and
+        are streamed straight to the compressed file so memory use does not
+        grow with the size of the documents.
+        Returns the new generation entry, or None if nothing changed.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        generations = self.generations()
+        previous = self.hashes()
+        if generations and state_digest(previous) != generations[-1][DIGEST]:
+            # hashes.json is stale, e.g. after an interrupted write
+            previous = {_id: doc_hash(doc) for _id, doc in self.reconstruct().items()}
+        number = generations[-1][GENERATION] + 1 if generations else 1
+        since_full = 0
+        for entry in reversed(generations):
+            if entry[KIND] == FULL:
+                break
+            since_full += 1
+        kind = FULL if not generations or since_full + 1 >= CHECKPOINT_EVERY else DELTA
+
+        filename = f'gen-{number:06d}.{kind}.ndjson{suffix(compression)}'
+        tmp_filename = self.path(filename + '.tmp')
+        previous_ids = sorted(previous)
+        hashes = {}
+        counts = {CHANGED: 0, REMOVED: 0}
+
+        def lines():
+            # Merge the sorted docs with the previous sorted ids, so removed
+            # ids are emitted in _id order between the changed docs
+            next_previous = 0
+            last_id = None
+            for doc in docs:
+                _id = str(doc[MONGO_ID])
+                if last_id is not None and _id <= last_id:
+                    raise ValueError(f'Documents are not sorted by {MONGO_ID}: {_id}')
+                last_id = _id
+                while next_previous < len(previous_ids) and previous_ids[next_previous] < _id:
+                    if kind == DELTA:
+                        yield {DEL: previous_ids[next_previous]}
+                    counts[REMOVED] += 1
+                    next_previous += 1
+                if next_previous < len(previous_ids) and previous_ids[next_previous] == _id:
+                    next_previous += 1
+                hashes[_id] = doc_hash(doc)
+                changed = previous.get(_id) != hashes[_id]
+                if changed:
+                    counts[CHANGED] += 1
+                if kind == FULL:
+                    yield doc
+                elif changed:
+                    yield {PUT: doc}
+            for _id in previous_ids[next_previous:]:
+                if kind == DELTA:
+                    yield {DEL: _id}
+                counts[REMOVED] += 1
+
+        try:
+            checksum = write_ndjson(tmp_filename, lines(), compression)
+        except BaseException:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            raise
+        if generations and not counts[CHANGED] and not counts[REMOVED]:
+            os.remove(tmp_filename)
+            return None
+        os.replace(tmp_filename, self.path(filename))
+
+        entry = {
+            GENERATION: number,
+            CREATED: created or utc_timestamp(),
+            KIND: kind,
+            FILE: filename,
+            RECORDS: len(hashes),
+            CHANGED: counts[CHANGED],
+            REMOVED: counts[REMOVED],
+            DIGEST: state_digest(hashes),
+            CHECKSUM: checksum,
+        }
+        write_json_atomic(self.path(MANIFEST_FILE), generations + [entry])
+        write_json_atomic(self.path(HASHES_FILE), hashes)
+        return entry
+
+    def verify(self, generation: int) -> bool:
+        """Return whether a generation's file matches its recorded checksum"""
+        entry = self.get(generation)
+        if CHECKSUM not in entry:
+            return True
+        return file_checksum(self.path(entry[FILE])) == entry[CHECKSUM]
+
+    def chain(self, generation: int) -> list:
+        """
+        Return the entries needed to rebuild a generation: the nearest full
+        checkpoint and the deltas after it.
+        """
+        generations = self.generations()
+        chain = [entry for entry in generations if entry[GENERATION] <= generation]
+        if not chain or chain[-1][GENERATION] != generation:
+            raise KeyError(f'Snapshot generation not found: {generation}')
+        start = max(i for i, entry in enumerate(chain) if entry[KIND] == FULL)
+        return chain[start:]
+
+    def layer(self, entry: dict):
+        """Yield (_id, document or None if removed) from a generation's file"""
+        for line in read_ndjson(self.path(entry[FILE])):
+            if entry[KIND] == FULL:
+                yield str(line[MONGO_ID]), line
+            elif PUT in line:
+                yield str(line[PUT][MONGO_ID]), line[PUT]
+            else:
+                yield str(line[DEL]), None
+
+    def documents(self, generation: int):
+        """
+        Yield a generation's documents sorted by _id, merging the sorted
+        checkpoint and deltas as they are read.
+        """
+        yield from replay(self.layer(entry) for entry in self.chain(generation))
+
+    def reconstruct(self, generation: int = None) -> dict:
+        """
+        Return the _id -> document map of a generation (default newest) by
+        loading the nearest full checkpoint and replaying later deltas.
+        """
+        generations = self.generations()
+        if not generations:
+            return {}
+        if generation is None:
+            generation = generations[-1][GENERATION]
+        return {doc[MONGO_ID]: doc for doc in self.documents(generation)}
+
+    def index_paths(self, generation: int) -> tuple:
+        name = f'gen-{generation:06d}'
+        return (self.path(os.path.join(INDEX_DIR, name + '.ndjson')),
+                self.path(os.path.join(INDEX_DIR, name + '.idx')))
+
+    def materialize(self, generation: int) -> tuple:
+        """
+        Write a generation's documents uncompressed, with an index of their
+        offsets, unless that was done before. Returns the two file names.
+        Generations never change once written, so the files never go stale.
+        Documents are streamed from the checkpoint and deltas straight to
+        the files, never all held in memory.
+        """
+        data_filename, index_filename = self.index_paths(generation)
+        if os.path.exists(index_filename):
+            return data_filename, index_filename
+        docs = self.documents(generation)
+        index_dir = os.path.dirname(index_filename)
+        os.makedirs(index_dir, exist_ok=True)
+        # Concurrent builders write separate temporary files; either result
+        # is the same, and the index is moved into place last
+        data_fd, data_tmp = tempfile.mkstemp(dir=index_dir, suffix='.tmp')
+        index_fd, index_tmp = tempfile.mkstemp(dir=index_dir, suffix='.tmp')
+        try:
+            with os.fdopen(data_fd, 'wb') as data_f, os.fdopen(index_fd, 'wb') as index_f:
+                offset = 0
+                for doc in docs:
+                    line = (canonical_json(doc) + '\n').encode('utf-8')
+                    data_f.write(line)
+                    index_f.write(INDEX_ENTRY.pack(index_key(str(doc[MONGO_ID])), offset,
+                                                   len(line) - 1))
+                    offset += len(line)
+            os.replace(data_tmp, data_filename)
+            os.replace(index_tmp, index_filename)
+        except BaseException:
+            for tmp in (data_tmp, index_tmp):
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            raise
+        return data_filename, index_filename
+
+    def reader(self, generation: int) -> GenerationReader:
+        """Return a GenerationReader for a generation, materializing it first"""
+        self.get(generation)
+        return GenerationReader(*self.materialize(generation))
+
+    def diff(self, old_generation: int, new_generation: int):
+        """
+        Yield the records added, removed and modified between two
+        generations, in _id order. Modified records list the changed fields.
+        """
+        with self.reader(old_generation) as old, self.reader(new_generation) as new:
+            yield from merge_diff(old.lines(), new.lines())
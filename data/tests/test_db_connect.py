@@ -138,3 +138,206 @@ class TestConvertMongoId:
         doc = {'name': 'test'}
         dbc.convert_mongo_id(doc)
         assert doc == {'name': 'test'}
+
+
+class TestUpsertMany:
+    """Test the upsert_many function."""
+
+    @patch('data.db_connect.pm.MongoClient')
+    @patch.dict('os.environ', {'CLOUD_MONGO': '0'}, clear=False)
+    def test_builds_upserts(self, mock_client):
+        """Test that each doc becomes an UpdateOne filtered on its keys."""
+        mock_mongo = MagicMock()
+        mock_client.return_value = mock_mongo
+        docs = [{'name': 'a', 'value': 1, 'show': True}]
+
+        dbc.upsert_many('test', docs, ('name',), insert_only=('show',))
+
+        collection = mock_mongo[dbc.SE_DB]['test']
+        operations = collection.bulk_write.call_args[0][0]
+        assert len(operations) == 1
+        assert operations[0]._filter == {'name': 'a'}
+        assert operations[0]._doc == {
+            '$set': {'name': 'a', 'value': 1},
+            '$setOnInsert': {'show': True},
+        }
+        assert operations[0]._upsert is True
+        assert collection.bulk_write.call_args[1]['ordered'] is False
+
+    @patch('data.db_connect.pm.MongoClient')
+    @patch.dict('os.environ', {'CLOUD_MONGO': '0'}, clear=False)
+    def test_empty(self, mock_client):
+        """Test that no write is issued for an empty list."""
+        mock_client.return_value = MagicMock()
+        assert dbc.upsert_many('test', [], ('name',)) is None
+
+
+class TestBulkUpdate:
+    """Test the bulk_update function."""
+
+    @patch('data.db_connect.pm.MongoClient')
+    @patch.dict('os.environ', {'CLOUD_MONGO': '0'}, clear=False)
+    def test_builds_updates(self, mock_client):
+        """Test that each pair becomes an unordered UpdateOne."""
+        mock_mongo = MagicMock()
+        mock_client.return_value = mock_mongo
+
+        dbc.bulk_update('test', [({'name': 'a'}, {'$set': {'value': 1}})])
+
+        collection = mock_mongo[dbc.SE_DB]['test']
+        operations = collection.bulk_write.call_args[0][0]
+        assert len(operations) == 1
+        assert operations[0]._filter == {'name': 'a'}
+        assert operations[0]._doc == {'$set': {'value': 1}}
+        assert collection.bulk_write.call_args[1]['ordered'] is False
+
+    @patch('data.db_connect.pm.MongoClient')
+    @patch.dict('os.environ', {'CLOUD_MONGO': '0'}, clear=False)
+    def test_empty(self, mock_client):
+        """Test that no write is issued for an empty list."""
+        mock_client.return_value = MagicMock()
+        assert dbc.bulk_update('test', []) is None
+
+
+class TestModify:
+    """Test the atomic partial update functions."""
+
+    @pytest.fixture
+    def collection(self):
+        mock_mongo = MagicMock()
+        with patch('data.db_connect.pm.MongoClient', return_value=mock_mongo), \
+                patch.dict('os.environ', {'CLOUD_MONGO': '0'}, clear=False):
+            yield mock_mongo[dbc.SE_DB]['test']
+
+    def test_add_to_set(self, collection):
+        """Test that add_to_set sends one $addToSet and returns the new doc."""
+        _id = ObjectId()
+        collection.find_one_and_update.return_value = {dbc.MONGO_ID: _id, 'tags': ['a']}
+
+        doc = dbc.add_to_set('test', {'name': 'x'}, 'tags', ['a'])
+
+        filt, update = collection.find_one_and_update.call_args[0]
+        assert filt == {'name': 'x'}
+        assert update == {'$addToSet': {'tags': {'$each': ['a']}}}
+        assert collection.find_one_and_update.call_args[1]['return_document'] \
+            == dbc.pm.ReturnDocument.AFTER
+        assert doc == {dbc.MONGO_ID: str(_id), 'tags': ['a']}
+
+    def test_pull(self, collection):
+        """Test that pull removes values with $in."""
+        dbc.pull('test', {'name': 'x'}, 'tags', ['a', 'b'])
+        update = collection.find_one_and_update.call_args[0][1]
+        assert update == {'$pull': {'tags': {'$in': ['a', 'b']}}}
+
+    def test_inc(self, collection):
+        """Test that inc sends an $inc."""
+        dbc.inc('test', {'name': 'x'}, 'count', 2)
+        update = collection.find_one_and_update.call_args[0][1]
+        assert update == {'$inc': {'count': 2}}
+
+    def test_not_found(self, collection):
+        """Test that None is returned when nothing matches."""
+        collection.find_one_and_update.return_value = None
+        assert dbc.inc('test', {'name': 'x'}, 'count') is None
+
+
+class TestStream:
+    """Test the stream function."""
+
+    @patch('data.db_connect.pm.MongoClient')
+    @patch.dict('os.environ', {'CLOUD_MONGO': '0'}, clear=False)
+    def test_sorted_batches(self, mock_client):
+        """Test that docs are read lazily from a sorted, batched cursor."""
+        mock_mongo = MagicMock()
+        mock_client.return_value = mock_mongo
+        _id = ObjectId()
+        collection = mock_mongo[dbc.SE_DB]['test']
+        cursor = collection.find.return_value.sort.return_value.batch_size.return_value
+        cursor.__iter__.return_value = iter([{dbc.MONGO_ID: _id, 'name': 'a'}])
+
+        docs = dbc.stream('test', batch_size=50)
+        collection.find.assert_not_called()
+        assert list(docs) == [{dbc.MONGO_ID: str(_id), 'name': 'a'}]
+        collection.find.return_value.sort.assert_called_once_with(dbc.MONGO_ID, pm.ASCENDING)
+        collection.find.return_value.sort.return_value.batch_size.assert_called_once_with(50)
+
+
+class TestCreateMany:
+    """Test the batched create_many function."""
+
+    @pytest.fixture
+    def collection(self):
+        mock_mongo = MagicMock()
+        with patch('data.db_connect.pm.MongoClient', return_value=mock_mongo), \
+                patch.dict('os.environ', {'CLOUD_MONGO': '0'}, clear=False):
+            yield mock_mongo[dbc.SE_DB]['test']
+
+    @staticmethod
+    def assign_ids(docs, ordered):
+        for doc in docs:
+            doc.setdefault(dbc.MONGO_ID, ObjectId())
+
+    def test_batches(self, collection):
+        """Test that docs are split into unordered batches."""
+        collection.insert_many.side_effect = self.assign_ids
+        docs = [{'n': i} for i in range(5)]
+
+        result = dbc.create_many('test', docs, batch_size=2)
+
+        assert collection.insert_many.call_count == 3
+        assert collection.insert_many.call_args[1]['ordered'] is False
+        assert result.inserted_ids == [doc[dbc.MONGO_ID] for doc in docs]
+        assert result.failed == []
+        assert [batch['size'] for batch in result.batches] == [2, 2, 1]
+
+    def test_concurrent(self, collection):
+        """Test that concurrent batches keep the input order."""
+        collection.insert_many.side_effect = self.assign_ids
+        docs = [{'n': i} for i in range(10)]
+
+        result = dbc.create_many('test', docs, batch_size=3, workers=3)
+
+        assert result.inserted_ids == [doc[dbc.MONGO_ID] for doc in docs]
+
+    def test_partial_failure(self, collection):
+        """Test that failed docs are reported by index across batches."""
+        def insert_many(docs, ordered):
+            self.assign_ids(docs, ordered)
+            if docs[0]['n'] == 2:
+                raise pm.errors.BulkWriteError({'writeErrors': [
+                    {'index': 1, 'errmsg': 'duplicate key'}]})
+        collection.insert_many.side_effect = insert_many
+        docs = [{'n': i} for i in range(5)]
+
+        result = dbc.create_many('test', docs, batch_size=2)
+
+        assert result.failed_indexes == [3]
+        assert result.failed[0][1] == 'duplicate key'
+        assert len(result.inserted_ids) == 4
+        assert result.batches[1] == {'start': 2, 'size': 2, 'inserted': 1, 'failed': [3]}
+
+    def test_ordered_stops(self, collection):
+        """Test that an ordered insert does not write past the first failure."""
+        def insert_many(docs, ordered):
+            self.assign_ids(docs, ordered)
+            if docs[0]['n'] == 0:
+                raise pm.errors.BulkWriteError({'writeErrors': [
+                    {'index': 0, 'errmsg': 'bad doc'}]})
+        collection.insert_many.side_effect = insert_many
+        docs = [{'n': i} for i in range(4)]
+
+        result = dbc.create_many('test', docs, batch_size=2, ordered=True)
+
+        assert collection.insert_many.call_count == 1
+        assert result.failed_indexes == [0, 1, 2, 3]
+        assert result.inserted_ids == []
+
+    def test_connection_failure(self, collection):
+        """Test that a failed batch marks all of its docs as failed."""
+        collection.insert_many.side_effect = pm.errors.AutoReconnect('down')
+        result = dbc.create_many('test', [{'n': 0}, {'n': 1}])
+        assert result.failed_indexes == [0, 1]
+
+    def test_bad_batch_size(self, collection):
+        with pytest.raises(ValueError):
+            dbc.create_many('test', [{'n': 0}], batch_size=0)
@@ -0,0 +1,220 @@
+import os
+import pytest
+from unittest.mock import patch
+import data.snapshots as snap
+
+
+def make_docs(n, **changes):
+    docs = [{'_id': f'{i:024x}', 'name': f'event {i}', 'value': i} for i in range(n)]
+    for doc in docs:
+        doc.update(changes.get(doc['_id'], {}))
+    return docs
+
+
+@pytest.fixture
+def store(tmp_path):
+    return snap.SnapshotStore(str(tmp_path / 'store'))
+
+
+class TestDocHash:
+    def test_key_order(self):
+        assert snap.doc_hash({'a': 1, 'b': 2}) == snap.doc_hash({'b': 2, 'a': 1})
+
+    def test_value_change(self):
+        assert snap.doc_hash({'a': 1}) != snap.doc_hash({'a': 2})
+
+
+class TestWrite:
+    def test_first_is_full(self, store):
+        entry = store.write(make_docs(3))
+        assert entry[snap.KIND] == snap.FULL
+        assert entry[snap.RECORDS] == 3
+        assert store.reconstruct() == {doc['_id']: doc for doc in make_docs(3)}
+
+    def test_unchanged_writes_nothing(self, store):
+        store.write(make_docs(3))
+        files = sorted(os.listdir(store.directory))
+        assert store.write(make_docs(3)) is None
+        assert sorted(os.listdir(store.directory)) == files
+        assert len(store.generations()) == 1
+
+    def test_unsorted(self, store):
+        with pytest.raises(ValueError):
+            store.write(list(reversed(make_docs(3))))
+        assert store.generations() == []
+        assert os.listdir(store.directory) == []
+
+    def test_streams_generator(self, store):
+        entry = store.write(doc for doc in make_docs(3))
+        assert entry[snap.RECORDS] == 3
+
+    def test_delta_stores_only_changes(self, store):
+        store.write(make_docs(3))
+        docs = make_docs(4, **{f'{1:024x}': {'value': 100}})
+        del docs[0]
+        entry = store.write(docs)
+        assert entry[snap.KIND] == snap.DELTA
+        assert entry[snap.CHANGED] == 2
+        assert entry[snap.REMOVED] == 1
+        lines = list(snap.read_ndjson(store.path(entry[snap.FILE])))
+        # Removed ids are merged into _id order with the changed docs
+        assert lines[0] == {snap.DEL: f'{0:024x}'}
+        assert [line[snap.PUT]['_id'] for line in lines[1:]] == [f'{1:024x}', f'{3:024x}']
+        assert store.reconstruct() == {doc['_id']: doc for doc in docs}
+
+    def test_checkpoints(self, store):
+        for i in range(snap.CHECKPOINT_EVERY + 1):
+            store.write(make_docs(2, **{f'{0:024x}': {'value': -i}}))
+        kinds = [entry[snap.KIND] for entry in store.generations()]
+        assert kinds[0] == snap.FULL
+        assert kinds[snap.CHECKPOINT_EVERY] == snap.FULL
+        assert kinds.count(snap.FULL) == 2
+
+    def test_stale_hashes(self, store):
+        store.write(make_docs(2))
+        snap.write_json_atomic(store.path(snap.HASHES_FILE), {})
+        assert store.write(make_docs(2)) is None
+
+
+class TestCompression:
+    @pytest.mark.parametrize('compression', sorted(snap.CODECS))
+    def test_round_trip(self, store, compression):
+        store.write(make_docs(3), compression=compression)
+        entry = store.write(make_docs(4), compression=compression)
+        assert entry[snap.FILE].endswith(snap.CODECS[compression][0])
+        assert store.reconstruct() == {doc['_id']: doc for doc in make_docs(4)}
+
+    def test_bad_compression(self, store):
+        with pytest.raises(ValueError):
+            store.write(make_docs(1), compression='zip')
+
+    def test_checksum(self, store):
+        entry = store.write(make_docs(3))
+        assert entry[snap.CHECKSUM] == snap.file_checksum(store.path(entry[snap.FILE]))
+        assert store.verify(entry[snap.GENERATION])
+        with open(store.path(entry[snap.FILE]), 'ab') as f:
+            f.write(b'corrupt')
+        assert not store.verify(entry[snap.GENERATION])
+
+    def test_write_ndjson(self, tmp_path):
+        filename = str(tmp_path / 'out.ndjson.gz')
+        checksum = snap.write_ndjson(filename, iter(make_docs(2)), 'gzip')
+        assert checksum == snap.file_checksum(filename)
+        assert list(snap.read_ndjson(filename)) == make_docs(2)
+
+
+class TestReconstruct:
+    def test_any_generation(self, store):
+        history = []
+        for i in range(snap.CHECKPOINT_EVERY + 3):
+            docs = make_docs(i % 4 + 1, **{f'{0:024x}': {'value': -i}})
+            store.write(docs)
+            history.append({doc['_id']: doc for doc in docs})
+        for generation, expected in enumerate(history, start=1):
+            assert store.reconstruct(generation) == expected
+
+    def test_replays_from_checkpoint(self, store):
+        for i in range(snap.CHECKPOINT_EVERY + 2):
+            store.write(make_docs(2, **{f'{0:024x}': {'value': -i}}))
+        with patch('data.snapshots.read_ndjson', wraps=snap.read_ndjson) as mock_read:
+            store.reconstruct()
+        assert mock_read.call_count == 2
+
+    def test_missing_generation(self, store):
+        store.write(make_docs(1))
+        with pytest.raises(KeyError):
+            store.reconstruct(5)
+
+    def test_empty_store(self, store):
+        assert store.reconstruct() == {}
+
+
+class TestFind:
+    def test_as_of(self, store):
+        store.write(make_docs(1), created='2026-05-01T07:00:00Z')
+        store.write(make_docs(2), created='2026-05-03T07:00:00Z')
+        assert store.find('2026-04-30') is None
+        assert store.find('2026-05-02')[snap.GENERATION] == 1
+        assert store.find('2026-05-03')[snap.GENERATION] == 2
+        assert store.find('2026-05-03T06:00:00Z')[snap.GENERATION] == 1
+
+    def test_bad_as_of(self, store):
+        with pytest.raises(ValueError):
+            store.find('May 3rd')
+
+
+class TestReader:
+    def test_get(self, store):
+        store.write(make_docs(5))
+        with store.reader(1) as reader:
+            assert len(reader) == 5
+            assert reader.get(f'{3:024x}') == make_docs(5)[3]
+            with pytest.raises(KeyError):
+                reader.get(f'{9:024x}')
+
+    def test_iter_older_generation(self, store):
+        store.write(make_docs(3))
+        store.write(make_docs(4, **{f'{0:024x}': {'value': -1}}))
+        with store.reader(1) as reader:
+            assert list(reader) == make_docs(3)
+        with store.reader(2) as reader:
+            assert reader.get(f'{0:024x}')['value'] == -1
+
+    def test_materialized_once(self, store):
+        store.write(make_docs(2))
+        store.reader(1).close()
+        with patch.object(store, 'documents') as mock_documents:
+            with store.reader(1) as reader:
+                assert list(reader) == make_docs(2)
+        mock_documents.assert_not_called()
+
+    def test_streams_checkpoint_and_deltas(self, store):
+        for i in range(snap.CHECKPOINT_EVERY + 3):
+            # Alternately drop and restore the last document
+            store.write(make_docs(3 + i % 2, **{f'{i % 3:024x}': {'value': -i}}))
+        for generation in (snap.CHECKPOINT_EVERY - 1, snap.CHECKPOINT_EVERY + 3):
+            expected = list(store.reconstruct(generation).values())
+            with patch.object(store, 'reconstruct') as mock_reconstruct:
+                with store.reader(generation) as reader:
+                    assert list(reader) == expected
+            mock_reconstruct.assert_not_called()
+
+    def test_empty_generation(self, store):
+        store.write([])
+        with store.reader(1) as reader:
+            assert list(reader) == []
+            with pytest.raises(KeyError):
+                reader.get(f'{0:024x}')
+
+    def test_missing_generation(self, store):
+        with pytest.raises(KeyError):
+            store.reader(1)
+
+
+class TestDiff:
+    def test_merge_join(self, store):
+        store.write(make_docs(4))
+        docs = make_docs(6, **{f'{1:024x}': {'value': 100, 'extra': True}})
+        del docs[2]
+        store.write(docs)
+        changes = list(store.diff(1, 2))
+        assert [(change[snap.ID], change[snap.CHANGE]) for change in changes] == [
+            (f'{1:024x}', snap.MODIFIED),
+            (f'{2:024x}', snap.REMOVED),
+            (f'{4:024x}', snap.ADDED),
+            (f'{5:024x}', snap.ADDED),
+        ]
+        assert changes[0][snap.FIELDS] == {
+            'extra': {snap.OLD: None, snap.NEW: True},
+            'value': {snap.OLD: 1, snap.NEW: 100},
+        }
+        assert changes[1][snap.FIELDS]['value'] == {snap.OLD: 2, snap.NEW: None}
+
+    def test_same_generation(self, store):
+        store.write(make_docs(3))
+        assert list(store.diff(1, 1)) == []
+
+    def test_reversed(self, store):
+        store.write(make_docs(1))
+        store.write(make_docs(2))
+        assert [change[snap.CHANGE] for change in store.diff(2, 1)] == [snap.REMOVED]
@@ -70,6 +70,7 @@ STATES = 'states'
 NATIONS = 'nations'
 DISASTERS = 'disasters'
 LOGS = 'logs'
+SNAPSHOTS = 'snapshots'
 
 security_recs = None
 crud_permissions = {
@@ -99,6 +100,13 @@ temp_recs = {
     STATES: crud_permissions,
     NATIONS: crud_permissions,
     DISASTERS: crud_permissions,
+    SNAPSHOTS: {
+        READ: {
+            CHECKS: {
+                LOGIN: False
+            },
+        }
+    },
     LOGS: {
         READ: {
             CHECKS: {
@@ -0,0 +1,69 @@
+"""
+Benchmark for encoding the disasters list response.
+
+Loads the newest local snapshot of natural_disasters, optionally repeated
+to simulate a larger collection, and times encoding the list response body
+with the standard library and with the fast encoder used by the Api.
+
+You can run this script with: `python -m server.benchmark_json`
+"""
+
+import argparse
+import time
+import server.representations as rep
+from data.snapshots import SnapshotStore
+from server.controllers.natural_disasters import DISASTERS_RESP, SNAPSHOT_DIR
+
+DEFAULT_REPEATS = 20
+
+
+def load_records(directory: str, scale: int) -> list:
+    """Return the newest snapshot's records, repeated scale times"""
+    records = list(SnapshotStore(directory).reconstruct().values())
+    if not records:
+        raise ValueError(f'No snapshot in {directory}')
+    return [dict(record, _id=f'{record["_id"]}-{i}') for i in range(scale) for record in records]
+
+
+def time_encoder(encode, body: dict, repeats: int) -> tuple:
+    """Return the best time in seconds over repeats and the encoded size"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        encoded = encode(body)
+        best = min(best, time.perf_counter() - start)
+    return best, len(encoded)
+
+
+def benchmark(records: list, repeats: int = DEFAULT_REPEATS) -> dict:
+    body = {DISASTERS_RESP: records}
+    encoders = {'stdlib': rep.dumps_stdlib}
+    if rep.orjson is not None:
+        encoders['orjson'] = rep.dumps_fast
+    results = {}
+    for name, encode in encoders.items():
+        results[name] = time_encoder(encode, body, repeats)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help='Snapshot store directory')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='Repeat the records this many times')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    args = parser.parse_args()
+
+    records = load_records(args.dir, args.scale)
+    print(f'{len(records)} records')
+    results = benchmark(records, args.repeats)
+    baseline = results['stdlib'][0]
+    for name, (seconds, size) in results.items():
+        print(f'{name:>7}: {seconds * 1000:8.2f} ms, {size} bytes, '
+              f'{baseline / seconds:.1f}x stdlib')
+    if rep.orjson is None:
+        print('orjson is not installed; responses use the standard library')
+
+
+if __name__ == '__main__':
+    main()
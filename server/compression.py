@@ -0,0 +1,125 @@
+"""
+Response compression for the app in endpoints.py.
+
+JSON, NDJSON and MessagePack responses of at least MIN_SIZE bytes are
+compressed with brotli when it is installed and the client accepts it, and
+with gzip otherwise, as negotiated by Accept-Encoding.
+Responses with an ETag (see controllers/http_cache.py) are only compressed
+once per cache generation: the compressed body is kept, keyed by the ETag,
+URL and type, and reused until a change to the data changes the ETag.
+Streamed responses are gzipped chunk by chunk as they are sent.
+"""
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP = 'gzip'
+BROTLI = 'br'
+MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Compressed bodies kept for reuse, least recently used dropped first
+MAX_CACHED = 128
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'application/msgpack')
+
+
+def choose_encoding(streamed: bool = False):
+    """
+    Return the best encoding the client accepts, or None. Streams are
+    only gzipped.
+    """
+    if brotli is not None and not streamed and request.accept_encodings[BROTLI] > 0:
+        return BROTLI
+    if request.accept_encodings[GZIP] > 0:
+        return GZIP
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == BROTLI:
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # A fixed mtime keeps the output the same for the same input
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def gzip_stream(chunks):
+    """Gzip an iterable of byte chunks, flushing after each one"""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CompressedCache:
+    """Thread-safe LRU map of response key -> compressed body"""
+
+    def __init__(self, max_entries: int = MAX_CACHED):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value: bytes):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+compressed_cache = CompressedCache()
+
+
+def compress_response(resp):
+    """after_request hook compressing resp in place when worthwhile"""
+    if (resp.mimetype not in COMPRESSIBLE_MIMETYPES or resp.direct_passthrough
+            or resp.status_code < 200 or resp.status_code in (204, 304)
+            or 'Content-Encoding' in resp.headers):
+        return resp
+    resp.vary.add('Accept-Encoding')
+
+    if resp.is_streamed:
+        if choose_encoding(streamed=True) == GZIP:
+            resp.response = gzip_stream(resp.response)
+            resp.headers.pop('Content-Length', None)
+            resp.headers['Content-Encoding'] = GZIP
+        return resp
+
+    encoding = choose_encoding()
+    data = resp.get_data()
+    if encoding is None or len(data) < MIN_SIZE:
+        return resp
+
+    etag = resp.headers.get('ETag')
+    # The length guards against reusing a body for different content that
+    # was somehow given the same tag
+    key = (etag, request.full_path, resp.mimetype, encoding, len(data)) if etag else None
+    body = compressed_cache.get(key) if key else None
+    if body is None:
+        body = compress(data, encoding)
+        if key:
+            compressed_cache.put(key, body)
+    resp.set_data(body)
+    resp.headers['Content-Encoding'] = encoding
+    return resp
+
+
+def install(app):
+    app.after_request(compress_response)
@@ -3,9 +3,12 @@ Caching for data controllers.
 """
 
 import data.db_connect as dbc
+import threading
 import time
 from typing import Optional
 
+RECONCILE_ATTEMPTS = 3
+
 
 class Cache:
     def __init__(self, collection: str):
@@ -19,15 +22,57 @@ class Cache:
         # Initialize members
         self.collection = collection
         self.data = None
+        # Incremented on every change to data
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def fetch(self) -> dict:
+        """
+        Read every record from MongoDB, keyed by _id.
+        """
+        records = dbc.read(self.collection, no_id=False) or []
+        return {record.get('_id'): record for record in records}
+
+    def replace(self, data: dict):
+        # Readers see either the old or the new dict, never a partial one
+        with self.lock:
+            self.data = data
+            self.generation += 1
 
     def reload(self):
         """
         Reload cache by reading from MongoDB.
         """
-        self.data = {}
-        records = dbc.read(self.collection, no_id=False) or []
-        for record in records:
-            self.data[record.get('_id')] = record
+        self.replace(self.fetch())
+
+    def prime(self, records):
+        """
+        Fill the cache from records read elsewhere, e.g. a local snapshot,
+        without touching MongoDB.
+        """
+        self.replace({record.get('_id'): record for record in records})
+
+    def reconcile(self) -> bool:
+        """
+        Replace the cached data with MongoDB's, unless the cache changes
+        while reading, in which case the read is retried so newer writes are
+        not overwritten. Returns whether the cache was reconciled.
+        """
+        for _ in range(RECONCILE_ATTEMPTS):
+            start = self.generation
+            data = self.fetch()
+            with self.lock:
+                if self.generation == start:
+                    self.data = data
+                    self.generation += 1
+                    return True
+        return False
+
+    def reconcile_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.reconcile, daemon=True,
+                                  name=f'reconcile-{self.collection}')
+        thread.start()
+        return thread
 
     def read(self) -> dict:
         """
@@ -36,3 +81,19 @@ class Cache:
         if self.data is None:
             self.reload()
         return self.data
+
+    def patch(self, updates: dict):
+        """
+        Apply a delta of {_id: fields} to cached records in place, rather
+        than reloading the whole collection. Records that are not cached are
+        skipped, and nothing is done if the cache is uninitialized since the
+        next read will load the current data.
+        """
+        if self.data is None:
+            return
+        with self.lock:
+            for _id, fields in updates.items():
+                record = self.data.get(_id)
+                if record is not None:
+                    record.update(fields)
+            self.generation += 1
@@ -7,10 +7,15 @@ from flask_restx import Resource, Namespace, fields
 from numbers import Real
 import server.controllers.crud as crud
 import security.security as security
+import server.controllers.http_cache as http_cache
+import server.streaming as streaming
 from server.controllers.nations import nations as nations_crud
 from server.controllers.states import states as states_crud
 
 SECURITY_FEATURE = security.CITIES
+# Cache-Control for read responses, in seconds
+CACHE_MAX_AGE = 300
+CACHE_STALE_WHILE_REVALIDATE = 3600
 CITIES_RESP = 'records'
 COLLECTION = 'cities'
 NAME = 'name'
@@ -58,10 +63,16 @@ class CityList(Resource):
     Supports listing all cities and creating new ones.
     """
     @security.require_auth(SECURITY_FEATURE, security.READ)
-    @api.doc('list_cities')
+    @http_cache.conditional(cities.cache, max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE)
+    @api.doc('list_cities', params={streaming.STREAM_ARG: streaming.STREAM_DOC})
     def get(self):
         """Return all cities."""
-        return {CITIES_RESP: cities.read()}
+        records = cities.read()
+        mimetype = streaming.requested_mimetype()
+        if mimetype:
+            return streaming.stream_records(mimetype, CITIES_RESP, list(records.values()), keyed=True)
+        return {CITIES_RESP: records}
 
     @security.require_auth(SECURITY_FEATURE, security.CREATE)
     @api.expect(city_model)
@@ -77,6 +88,8 @@ class CityList(Resource):
 @api.route('/fields')
 class CityFields(Resource):
     @security.require_auth(SECURITY_FEATURE, security.READ)
+    @http_cache.conditional(nations_crud.cache, states_crud.cache, max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE)
     @api.doc('get_fields')
     def get(self):
         """Get field information for cities."""
@@ -98,6 +111,8 @@ class City(Resource):
     Supports retrieval, update, and deletion.
     """
     @security.require_auth(SECURITY_FEATURE, security.READ)
+    @http_cache.conditional(cities.cache, max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE)
     @api.doc('get_city')
     def get(self, city_id):
         """Retrieve a single city by ID."""
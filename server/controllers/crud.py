@@ -66,6 +66,10 @@ class CRUD:
             if field is not None and not is_valid_type:
                 raise ValueError(f'Bad type for field {field}: {type(field)}')
 
+    def key(self, fields: dict) -> tuple:
+        """Return the tuple of key field values that identifies a record."""
+        return tuple(fields.get(key) for key in self.keys)
+
     def find_duplicate(self, fields: dict, search_list: list = None, excluded_id: str = ''):
         """
         Find a record with the same key fields as the provided record fields.
@@ -82,9 +86,10 @@ class CRUD:
         if not isinstance(excluded_id, str):
             raise ValueError(f'Bad type for fields: {type(excluded_id)}')
 
+        fields_key = self.key(fields)
         for record in search_list:
             # Check if all key fields from current record and query match
-            has_matching_keys = all(fields.get(key) == record.get(key) for key in self.keys)
+            has_matching_keys = self.key(record) == fields_key
             if record.get('_id') != excluded_id and has_matching_keys:
                 return record
         return None
@@ -95,38 +100,87 @@ class CRUD:
         """
         return self.create_many([fields])[0]
 
-    def create_many(self, fields_list: list) -> list:
+    def build_records(self, fields_list: list) -> list:
         """
-        Create a list of records from the provided fields list. Faster than
-        create() for multiple records because this batches the database
-        calls into a single network request.
+        Validate the provided fields list and build the records that would be
+        inserted, without writing them. Raises ValueError if any record
+        duplicates an existing record or an earlier record in the list.
         """
         # Validate parameters
         if not isinstance(fields_list, list):
             raise ValueError(f'Bad type for fields_list: {type(fields_list)}')
 
         new_records = []
-        dup_search_list = list(self.cache.read().values())
+        seen = {self.key(record) for record in self.cache.read().values()}
         for fields in fields_list:
             # Validate the fields
             self.validate(fields)
+            key = self.key(fields)
+            if key in seen:
+                raise ValueError('Duplicate detected.')
             # Build the record from the fields
             new_record = {}
             for attribute in self.attributes:
                 new_record[attribute] = fields.get(attribute)
-                if self.find_duplicate(fields, search_list=dup_search_list):
-                    raise ValueError('Duplicate detected.')
             # Add the record to the lists
             new_records.append(new_record)
-            dup_search_list.append(new_record)
+            seen.add(key)
+        return new_records
+
+    def create_many(self, fields_list: list, batch_size: int = dbc.DEFAULT_BATCH_SIZE,
+                    workers: int = 1) -> list:
+        """
+        Create a list of records from the provided fields list. Faster than
+        create() for multiple records because this batches the database
+        calls into a few bulk network requests, up to workers at a time.
+
+        Raises dbc.BulkInsertError if some records could not be written; its
+        result lists what was inserted and which indexes failed.
+        """
+        new_records = self.build_records(fields_list)
 
         # Create the records list
-        result = dbc.create_many(self.collection, new_records)
-        if not result or not getattr(result, 'inserted_ids', None):
-            raise RuntimeError('Create failed: no inserted_ids')
+        result = dbc.create_many(self.collection, new_records,
+                                 batch_size=batch_size, workers=workers)
         self.cache.reload()
+        if result.failed:
+            raise dbc.BulkInsertError(result, len(new_records))
         return [str(_id) for _id in result.inserted_ids]
 
+    def upsert_many(self, fields_list: list, insert_only: tuple = ()) -> dict:
+        """
+        Insert or update a list of records, matching existing records on the
+        key fields, so the same list can be written repeatedly without
+        creating duplicates. Fields in insert_only are only set on insert.
+        Returns the number of records inserted, modified, and left unchanged.
+        """
+        # Validate parameters
+        if not isinstance(fields_list, list):
+            raise ValueError(f'Bad type for fields_list: {type(fields_list)}')
+
+        new_records = []
+        seen = set()
+        for fields in fields_list:
+            self.validate(fields)
+            key = self.key(fields)
+            if key in seen:
+                raise ValueError('Duplicate detected.')
+            seen.add(key)
+            new_record = {}
+            for attribute in self.attributes:
+                new_record[attribute] = fields.get(attribute)
+            new_records.append(new_record)
+
+        result = dbc.upsert_many(self.collection, new_records, self.keys,
+                                 insert_only=insert_only)
+        counts = {'inserted': 0, 'modified': 0, 'unchanged': 0}
+        if result is not None:
+            counts['inserted'] = result.upserted_count
+            counts['modified'] = result.modified_count
+            counts['unchanged'] = result.matched_count - result.modified_count
+            self.cache.reload()
+        return counts
+
     def count(self) -> int:
         """
         Return the number of records in the collection
@@ -148,7 +202,7 @@ class CRUD:
         records = self.cache.read()
         if _id in records:
             return records[_id]
-        raise KeyError(f'Record not found: {query}')
+        raise KeyError(f'Record not found: {_id}')
 
     def update(self, _id: str, fields: dict):
         """
@@ -176,6 +230,95 @@ class CRUD:
             raise KeyError(f'Record not found: {_id}')
         self.cache.reload()
 
+    def _modify(self, _id: str, fields: tuple, write) -> dict:
+        """
+        Run an atomic partial update of fields through write, a function of
+        the record filter, and patch only those fields in the cache.
+        Returns the updated record.
+        """
+        if not is_valid_id(_id):
+            raise ValueError(f'Invalid id: {_id}')
+        for field in fields:
+            if field not in self.attributes:
+                raise ValueError(f'Bad field: {field}')
+
+        doc = write({'_id': ObjectId(_id)})
+        if doc is None:
+            raise KeyError(f'Record not found: {_id}')
+        self.cache.patch({_id: {field: doc.get(field) for field in fields}})
+        return doc
+
+    def _validate_array(self, field: str, values: list):
+        if self.attributes.get(field) is not list:
+            raise ValueError(f'Field {field} is not a list')
+        if not isinstance(values, list):
+            raise ValueError(f'Bad type for values: {type(values)}')
+
+    def append_to(self, _id: str, field: str, values: list) -> list:
+        """
+        Add values to a list field of the record, skipping values it already
+        contains, in one atomic operation. Returns the updated list.
+        """
+        self._validate_array(field, values)
+        doc = self._modify(_id, (field,), lambda filt: dbc.add_to_set(
+            self.collection, filt, field, values))
+        return doc.get(field)
+
+    def remove_from(self, _id: str, field: str, values: list) -> list:
+        """
+        Remove values from a list field of the record in one atomic
+        operation. Returns the updated list.
+        """
+        self._validate_array(field, values)
+        doc = self._modify(_id, (field,), lambda filt: dbc.pull(
+            self.collection, filt, field, values))
+        return doc.get(field)
+
+    def validate_partial(self, fields: dict):
+        """
+        Validate a partial update of non-key fields, which must all be
+        attributes of the correct type.
+        """
+        if not isinstance(fields, dict):
+            raise ValueError(f'Bad type for fields: {type(fields)}')
+        for attribute, field in fields.items():
+            if attribute not in self.attributes:
+                raise ValueError(f'Bad field: {attribute}')
+            if attribute in self.keys:
+                raise ValueError('Use update() to change key fields')
+            if field is not None and not isinstance(field, self.attributes[attribute]):
+                raise ValueError(f'Bad type for field {field}: {type(field)}')
+
+    def set_fields(self, _id: str, fields: dict) -> dict:
+        """
+        Set only the given fields of the record, without rewriting the rest
+        of it or reloading the cache. Returns the updated record.
+        """
+        self.validate_partial(fields)
+        return self._modify(_id, tuple(fields), lambda filt: dbc.modify(
+            self.collection, filt, {'$set': fields}))
+
+    def update_many(self, updates: dict) -> int:
+        """
+        Set the given non-key fields of many records, {_id: fields}, with a
+        single bulk write, then patch the cache with the same fields.
+        Returns the number of records matched.
+        """
+        if not isinstance(updates, dict):
+            raise ValueError(f'Bad type for updates: {type(updates)}')
+        for _id, fields in updates.items():
+            if not is_valid_id(_id):
+                raise ValueError(f'Invalid id: {_id}')
+            self.validate_partial(fields)
+
+        writes = [({'_id': ObjectId(_id)}, {'$set': fields})
+                  for _id, fields in updates.items() if fields]
+        result = dbc.bulk_update(self.collection, writes)
+        if result is None:
+            return 0
+        self.cache.patch(updates)
+        return result.matched_count
+
     def delete(self, _id: str):
         """
         Delete the record matching the query.
@@ -0,0 +1,84 @@
+"""
+HTTP caching headers for read endpoints.
+
+Every change to a Cache increments its generation, so the generations of
+the caches a response is built from identify its content. They are used
+as the response's ETag, letting a client or proxy revalidate with
+If-None-Match and get an empty 304 when nothing changed.
+Responses not built from the caches, such as reads of an older snapshot,
+are tagged through the tag hook of conditional instead.
+"""
+import hashlib
+import os
+from functools import wraps
+from flask import Response, request
+from werkzeug.http import quote_etag
+
+DEFAULT_MAX_AGE = 60
+DEFAULT_STALE_WHILE_REVALIDATE = 300
+# Generations restart at zero in every server process, so tags from
+# different processes (or before a restart) must never match
+PROCESS_TOKEN = os.urandom(8).hex()
+# Returned by a tag hook for requests that should get no caching headers
+UNCACHED = object()
+
+
+def cache_control(max_age: int, stale_while_revalidate: int) -> str:
+    return f'public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}'
+
+
+def digest_tag(*parts) -> str:
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def generation_tag(caches) -> str:
+    """
+    Return a tag for the current contents of caches, loading any that have
+    not been read yet so the tag matches the data the response will use.
+    """
+    parts = [PROCESS_TOKEN]
+    for cache in caches:
+        cache.read()
+        parts.append(f'{cache.collection}:{cache.generation}')
+    return digest_tag(*parts)
+
+
+def conditional(*caches, max_age: int = DEFAULT_MAX_AGE,
+                stale_while_revalidate: int = DEFAULT_STALE_WHILE_REVALIDATE, tag=None):
+    """
+    Decorate a Resource's get method to set ETag and Cache-Control from the
+    given caches, and answer 304 Not Modified when If-None-Match matches.
+    Tags are weak since the same content may be sent in other encodings.
+
+    tag, if given, is called for each request. It can return a tag for
+    requests not answered from the caches, UNCACHED to send no caching
+    headers, or None to use the caches' tag.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            # Tag before building the response: if the data changes in
+            # between, the tag is older than the body and only costs a
+            # full response on the next request
+            request_tag = tag() if tag else None
+            if request_tag is UNCACHED:
+                return f(*args, **kwargs)
+            request_tag = request_tag or generation_tag(caches)
+            headers = {
+                'ETag': quote_etag(request_tag, weak=True),
+                'Cache-Control': cache_control(max_age, stale_while_revalidate),
+                # The same URL may be sent as JSON or NDJSON
+                'Vary': 'Accept',
+            }
+            if request.if_none_match.contains_weak(request_tag):
+                return '', 304, headers
+            result = f(*args, **kwargs)
+            if isinstance(result, Response):
+                result.headers.extend(headers)
+                return result
+            if not isinstance(result, tuple):
+                return result, 200, headers
+            data, status, *rest = result
+            return data, status, {**headers, **(rest[0] if rest else {})}
+        return decorated
+    return decorator
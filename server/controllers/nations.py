@@ -7,8 +7,13 @@ from flask_restx import Resource, Namespace, fields
 import server.controllers.crud as crud
 import pycountry
 import security.security as security
+import server.controllers.http_cache as http_cache
+import server.streaming as streaming
 
 SECURITY_FEATURE = security.NATIONS
+# Cache-Control for read responses, in seconds
+CACHE_MAX_AGE = 300
+CACHE_STALE_WHILE_REVALIDATE = 3600
 NATIONS_RESP = 'records'
 COLLECTION = 'nations'
 NAME = 'name'
@@ -41,10 +46,16 @@ class NationList(Resource):
     Provides list and create functionality.
     """
     @security.require_auth(SECURITY_FEATURE, security.READ)
-    @api.doc('list_nations')
+    @http_cache.conditional(nations.cache, max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE)
+    @api.doc('list_nations', params={streaming.STREAM_ARG: streaming.STREAM_DOC})
     def get(self):
         """Return all nations."""
-        return {NATIONS_RESP: nations.read()}
+        records = nations.read()
+        mimetype = streaming.requested_mimetype()
+        if mimetype:
+            return streaming.stream_records(mimetype, NATIONS_RESP, list(records.values()), keyed=True)
+        return {NATIONS_RESP: records}
 
     @security.require_auth(SECURITY_FEATURE, security.CREATE)
     @api.expect(nation_model)
@@ -70,6 +81,8 @@ class NationList(Resource):
 @api.route('/fields')
 class NationFields(Resource):
     @security.require_auth(SECURITY_FEATURE, security.READ)
+    @http_cache.conditional(max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE)
     @api.doc('get_fields')
     def get(self):
         """Get field information for nations."""
@@ -86,6 +99,8 @@ class Nation(Resource):
     Provides retrieve, update, and delete functionality.
     """
     @security.require_auth(SECURITY_FEATURE, security.READ)
+    @http_cache.conditional(nations.cache, max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE)
     @api.doc('get_nation')
     def get(self, nation_id):
         """Retrieve a single nation by ID."""
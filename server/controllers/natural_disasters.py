@@ -5,15 +5,27 @@ This file implements CRUD operations for natural disasters.
 from flask import request
 from flask_restx import Resource, Namespace, fields
 from datetime import datetime
-from math import radians, sin, cos, sqrt, atan2
 from numbers import Real
+from bson.objectid import ObjectId
 import server.controllers.crud as crud
+import data.db_connect as dbc
+from data.snapshots import SnapshotStore, SNAPSHOT_ROOT, GENERATION, CREATED, DIGEST
+import os
 import re
-from ai.utilities.dedupe import consolidate_new_event
+# haversine calculates great circle distance to help us consolidate
+# nearby events time and space wise
+from ai.utilities.dedupe import consolidate_new_event, haversine
 import security.security as security
+import server.controllers.http_cache as http_cache
+import server.representations as rep
+import server.streaming as streaming
 
 SECURITY_FEATURE = security.DISASTERS
+# Cache-Control for read responses, in seconds
+CACHE_MAX_AGE = 60
+CACHE_STALE_WHILE_REVALIDATE = 300
 DISASTERS_RESP = 'records'
+SNAPSHOT_RESP = 'snapshot'
 COLLECTION = 'natural_disasters'
 NAME = 'name'
 DISASTER_TYPE = 'type'
@@ -32,9 +44,11 @@ EARTHQUAKE = 'earthquake'
 LANDSLIDE = 'landslide'
 TSUNAMI = 'tsunami'
 HURRICANE = 'hurricane'
+WILDFIRE = 'wildfire'
 OTHER = 'other'
-DISASTER_TYPES = [EARTHQUAKE, LANDSLIDE, TSUNAMI, HURRICANE, OTHER]
+DISASTER_TYPES = [EARTHQUAKE, LANDSLIDE, TSUNAMI, HURRICANE, WILDFIRE, OTHER]
 KEY = (NAME, DATE, LATITUDE, LONGITUDE)
+SNAPSHOT_DIR = os.path.join(SNAPSHOT_ROOT, COLLECTION)
 
 
 class NaturalDisasters(crud.CRUD):
@@ -64,6 +78,54 @@ class NaturalDisasters(crud.CRUD):
         except ValueError as e:
             raise ValueError(f'Invalid date: {date_string} - {str(e)}')
 
+    def link_reports(self, plan: dict) -> int:
+        """
+        Link each list of report ids in plan to the parent event it is keyed
+        by, hiding the reports, with a single bulk write.
+        Returns the number of reports linked.
+        """
+        if not isinstance(plan, dict):
+            raise ValueError(f'Bad type for links: {type(plan)}')
+
+        records = self.cache.read()
+        parents = {}
+        for parent_id, report_ids in plan.items():
+            if parent_id not in records:
+                raise KeyError(f'Record not found: {parent_id}')
+            if not isinstance(report_ids, list):
+                raise ValueError(f'Bad type for reports of {parent_id}: {type(report_ids)}')
+            for report_id in report_ids:
+                if not crud.is_valid_id(report_id):
+                    raise ValueError(f'Invalid id: {report_id}')
+                if report_id not in records:
+                    raise KeyError(f'Record not found: {report_id}')
+                if report_id in plan or report_id == parent_id:
+                    raise ValueError(f'Report {report_id} is also a parent event')
+                if parents.setdefault(report_id, parent_id) != parent_id:
+                    raise ValueError(f'Report {report_id} listed under two parents')
+
+        updates = []
+        delta = {}
+        for parent_id, report_ids in plan.items():
+            if report_ids:
+                updates.append(({'_id': ObjectId(parent_id)},
+                                {'$addToSet': {REPORTS: {'$each': report_ids}}}))
+                reports = list(records[parent_id].get(REPORTS) or [])
+                reports.extend(rid for rid in dict.fromkeys(report_ids)
+                               if rid not in reports)
+                delta[parent_id] = {REPORTS: reports}
+        for report_id, parent_id in parents.items():
+            fields = {SHOW: False, PARENT_EVENT: parent_id}
+            updates.append(({'_id': ObjectId(report_id)}, {'$set': fields}))
+            delta[report_id] = fields
+
+        if updates:
+            dbc.bulk_update(self.collection, updates)
+            # Patch the affected records instead of reloading the collection
+            self.cache.patch(delta)
+        return len(parents)
+
+
 disasters = NaturalDisasters(
     COLLECTION,
     KEY,
@@ -81,6 +143,80 @@ disasters = NaturalDisasters(
     }
 )
 
+
+def prime_cache_from_snapshot(directory: str = SNAPSHOT_DIR, reconcile: bool = True) -> bool:
+    """
+    Fill the disasters cache from the newest local snapshot so the first
+    requests do not wait on MongoDB, then reconcile the cache with MongoDB
+    in a background thread. Returns whether a snapshot was found.
+    """
+    records = SnapshotStore(directory).reconstruct()
+    if not records:
+        return False
+    disasters.cache.prime(records.values())
+    if reconcile:
+        disasters.cache.reconcile_in_background()
+    return True
+
+
+def open_snapshot(as_of: str) -> tuple:
+    """
+    Return the info and a reader for the snapshot generation in effect at
+    as_of, or raise KeyError if there is none that old.
+    """
+    store = SnapshotStore(SNAPSHOT_DIR)
+    entry = store.find(as_of)
+    if entry is None:
+        raise KeyError(f'No snapshot as of {as_of}')
+    info = {GENERATION: entry[GENERATION], CREATED: entry[CREATED]}
+    return info, store.reader(entry[GENERATION])
+
+
+def snapshot_tag():
+    """
+    ETag hook for reads that may be answered from a snapshot: as_of reads
+    are tagged by the generation they use rather than by the live cache,
+    and get no tag if as_of does not resolve to one.
+    """
+    as_of = request.args.get('as_of')
+    if not as_of:
+        return None
+    try:
+        entry = SnapshotStore(SNAPSHOT_DIR).find(as_of)
+    except ValueError:
+        return http_cache.UNCACHED
+    if entry is None:
+        return http_cache.UNCACHED
+    return http_cache.digest_tag('snapshot', entry[GENERATION], entry[DIGEST])
+
+
+def snapshot_records(reader):
+    """Yield a snapshot reader's records, closing it once they are read"""
+    with reader:
+        yield from reader
+
+
+def validate_dates(*dates):
+    for value in dates:
+        if value:
+            disasters.validate_date(value)
+
+
+def filter_disasters(records, date: str = None, start_date: str = None,
+                     end_date: str = None):
+    """Yield the shown records, optionally filtered by date"""
+    for r in records:
+        if not r.get(SHOW, True):
+            continue
+        if date and r.get(DATE) != date:
+            continue
+        if start_date and (not r.get(DATE) or r.get(DATE) < start_date):
+            continue
+        if end_date and (not r.get(DATE) or r.get(DATE) > end_date):
+            continue
+        yield r
+
+
 api = Namespace('natural_disasters', description='Natural Disasters CRUD operations')
 disaster_model = api.model('NaturalDisaster', {
   NAME: fields.String(required=True),
@@ -99,35 +235,45 @@ disaster_model = api.model('NaturalDisaster', {
 @api.route('/', strict_slashes=False)
 class DisasterList(Resource):
     @security.require_auth(SECURITY_FEATURE, security.READ)
+    @http_cache.conditional(disasters.cache, max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE,
+                            tag=snapshot_tag)
     @api.doc('list_disasters',
              params={
                  'date': 'Return disasters occurring on this date (YYYY-MM-DD)',
                  'start_date': 'Return disasters after this date (YYYY-MM-DD)',
-                 'end_date': 'Return disasters before this date (YYYY-MM-DD)'
+                 'end_date': 'Return disasters before this date (YYYY-MM-DD)',
+                 'as_of': 'Answer from the snapshot in effect at this date or time',
+                 streaming.STREAM_ARG: streaming.STREAM_DOC,
+                 rep.FORMAT_ARG: rep.FORMAT_DOC,
+                 rep.FIELDS_ARG: rep.FIELDS_DOC,
              })
     def get(self):
         """Get natural disasters optionally filtered by date."""
-
         date = request.args.get('date')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
-
-        records = disasters.read()
-
-        filtered = [r for r in records.values() if r.get(SHOW, True)]
-
-        if date:
-            disasters.validate_date(date)
-            filtered = [r for r in filtered if r.get(DATE) == date]
-
-        if start_date:
-            disasters.validate_date(start_date)
-            filtered = [r for r in filtered if r.get(DATE) and r.get(DATE) >= start_date]
-
-        if end_date:
-            disasters.validate_date(end_date)
-            filtered = [r for r in filtered if r.get(DATE) and r.get(DATE) <= end_date]
-        return {DISASTERS_RESP: filtered}
+        as_of = request.args.get('as_of')
+        validate_dates(date, start_date, end_date)
+        mimetype = streaming.requested_mimetype()
+
+        extra = {}
+        if as_of:
+            info, reader = open_snapshot(as_of)
+            records = snapshot_records(reader)
+            extra[SNAPSHOT_RESP] = info
+        else:
+            # A list of the current records, so a reload during a stream
+            # does not change what is being sent
+            records = list(disasters.read().values())
+        filtered = filter_disasters(records, date, start_date, end_date)
+
+        columns = rep.requested_columns()
+        if columns is not None:
+            return {DISASTERS_RESP: rep.columnar(filtered, columns or None), **extra}
+        if mimetype:
+            return streaming.stream_records(mimetype, DISASTERS_RESP, filtered, extra=extra)
+        return {DISASTERS_RESP: list(filtered), **extra}
 
     @security.require_auth(SECURITY_FEATURE, security.CREATE)
     @api.expect(disaster_model)
@@ -140,12 +286,9 @@ class DisasterList(Resource):
         data.setdefault(PARENT_EVENT, None)
         data.setdefault(REPORTS, [])
         data.setdefault(SEVERITY, None)
-        server_base = request.host_url.rstrip("/")
 
-        consolidation = consolidate_new_event(
-            data,
-            server=server_base
-        )
+        # Search the cache directly rather than calling our own search endpoint
+        consolidation = consolidate_new_event(data, search=search_disasters)
 
         if consolidation["action"] == "link":
             parent = consolidation["parent"]
@@ -157,11 +300,7 @@ class DisasterList(Resource):
             child_id = disasters.create(data)
             created = disasters.select(child_id)
 
-            parent_reports = parent.get(REPORTS, [])
-            if child_id not in parent_reports:
-                parent_reports.append(child_id)
-
-            disasters.update(parent["_id"], {REPORTS: parent_reports})
+            disasters.append_to(parent["_id"], REPORTS, [child_id])
 
             return {
                 DISASTERS_RESP: created,
@@ -176,6 +315,8 @@ class DisasterList(Resource):
 @api.route('/fields')
 class DisasterFields(Resource):
     @security.require_auth(SECURITY_FEATURE, security.READ)
+    @http_cache.conditional(max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE)
     @api.doc('get_fields')
     def get(self):
         """Get field information for natural disasters."""
@@ -185,7 +326,7 @@ class DisasterFields(Resource):
                 crud.ATTRIBUTE: DISASTER_TYPE,
                 crud.DISPLAY: "Type",
                 crud.TYPE: "select",
-                crud.OPTIONS: [EARTHQUAKE, TSUNAMI, LANDSLIDE, HURRICANE, OTHER],
+                crud.OPTIONS: [EARTHQUAKE, TSUNAMI, LANDSLIDE, HURRICANE, WILDFIRE, OTHER],
             },
             { crud.ATTRIBUTE: DATE, crud.DISPLAY: "Date", crud.TYPE: "date" },
             { crud.ATTRIBUTE: LATITUDE, crud.DISPLAY: "Latitude", crud.TYPE: "number" },
@@ -197,9 +338,19 @@ class DisasterFields(Resource):
 @api.route('/<string:disaster_id>')
 class Disaster(Resource):
     @security.require_auth(SECURITY_FEATURE, security.READ)
-    @api.doc('get_disaster')
+    @http_cache.conditional(disasters.cache, max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE,
+                            tag=snapshot_tag)
+    @api.doc('get_disaster',
+             params={'as_of': 'Answer from the snapshot in effect at this date or time'})
     def get(self, disaster_id):
         """Get a specific disaster by ID."""
+        as_of = request.args.get('as_of')
+        if as_of:
+            info, reader = open_snapshot(as_of)
+            with reader:
+                record = reader.get(disaster_id)
+            return {DISASTERS_RESP: record, SNAPSHOT_RESP: info}
         record = disasters.select(disaster_id)
         return {DISASTERS_RESP: record}
 
@@ -224,6 +375,8 @@ class Disaster(Resource):
 @api.route('/<string:event_id>/reports')
 class DisasterReports(Resource):
     @security.require_auth(SECURITY_FEATURE, security.READ)
+    @http_cache.conditional(disasters.cache, max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE)
     def get(self, event_id):
         event = disasters.select(event_id)
 
@@ -237,45 +390,111 @@ class DisasterReports(Resource):
                 continue
 
         return {"reports": results}
-        
+
+    @security.require_auth(SECURITY_FEATURE, security.UPDATE)
+    @api.doc('link_reports', params={'reports': 'List of report ids to link (JSON body)'})
+    def post(self, event_id):
+        """Link a list of reports to this event in one bulk write."""
+        data = request.json or {}
+        report_ids = data.get(REPORTS, [])
+        num_linked = disasters.link_reports({event_id: report_ids})
+        return {"message": "linked", "linked": num_linked}
+
 @api.route('/<string:event_id>/reports/<string:report_id>')
 class LinkReport(Resource):
     @security.require_auth(SECURITY_FEATURE, security.UPDATE)
     def post(self, event_id, report_id):
 
-        event = disasters.select(event_id)
-        report = disasters.select(report_id)
-
-        reports = event.get(REPORTS, [])
-        if report_id not in reports:
-            reports.append(report_id)
-
-        disasters.update(event_id, {REPORTS: reports})
+        # Check that both exist before writing either
+        disasters.select(event_id)
+        disasters.select(report_id)
 
-        disasters.update(report_id, {
+        disasters.append_to(event_id, REPORTS, [report_id])
+        disasters.set_fields(report_id, {
             SHOW: False,
             PARENT_EVENT: event_id
         })
 
         return {"message": "linked"}
         
-# for search by radius
-# this calculates great circle distance to help us consolidate
-# nearby events time and space wise
+@api.route('/links')
+class DisasterLinks(Resource):
+    @security.require_auth(SECURITY_FEATURE, security.UPDATE)
+    @api.doc('link_disasters')
+    def post(self):
+        """Link many reports to their parent events in one request."""
+        data = request.json or {}
+        num_linked = disasters.link_reports(data.get('links', {}))
+        return {"linked": num_linked}
 
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
 
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
+@api.route('/bulk')
+class DisasterBulk(Resource):
+    @security.require_auth(SECURITY_FEATURE, security.CREATE)
+    @api.doc('bulk_create_disasters')
+    def post(self):
+        """Create many disasters in one request, without consolidation."""
+        data = request.json or {}
+        records = data.get(DISASTERS_RESP, [])
+        if not isinstance(records, list):
+            raise ValueError(f'Bad type for records: {type(records)}')
+        for record in records:
+            if isinstance(record, dict):
+                record.setdefault(SHOW, True)
+                record.setdefault(PARENT_EVENT, None)
+                record.setdefault(REPORTS, [])
+        ids = disasters.create_many(records)
+        return {"ids": ids}, 201
+
+    @security.require_auth(SECURITY_FEATURE, security.UPDATE)
+    @api.doc('bulk_update_disasters')
+    def patch(self):
+        """Set fields on many disasters in one request."""
+        data = request.json or {}
+        num_matched = disasters.update_many(data.get('updates', {}))
+        return {"updated": num_matched}
+
+
+def search_disasters(lat: float = None, lon: float = None, radius_km: float = 100,
+                     date_start: str = None, date_end: str = None,
+                     disaster_type: str = None) -> list:
+    """
+    Return cached disasters matching every given filter, including hidden
+    reports so they can be considered for dedupe. Used both by the search
+    endpoint and in-process by consolidation.
+    """
+    if date_start:
+        disasters.validate_date(date_start)
+    if date_end:
+        disasters.validate_date(date_end)
+
+    results = []
+    for r in disasters.read().values():
+        if disaster_type and r.get(DISASTER_TYPE) != disaster_type:
+            continue
+
+        if date_start and (not r.get(DATE) or r.get(DATE) < date_start):
+            continue
+
+        if date_end and (not r.get(DATE) or r.get(DATE) > date_end):
+            continue
+
+        if lat is not None and lon is not None:
+            if r.get(LATITUDE) is None or r.get(LONGITUDE) is None:
+                continue
+
+            if haversine(lat, lon, r.get(LATITUDE), r.get(LONGITUDE)) > radius_km:
+                continue
+
+        results.append(r)
+    return results
+
 
-    return R * c
-    
 @api.route('/search')
 class DisasterSearch(Resource):
     @security.require_auth(SECURITY_FEATURE, security.READ)
+    @http_cache.conditional(disasters.cache, max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE)
     @api.doc('search_disasters',
              params={
                  'lat': 'Latitude',
@@ -283,56 +502,25 @@ class DisasterSearch(Resource):
                  'radius_km': 'Search radius in km (default 100)',
                  'date_start': 'Start date (YYYY-MM-DD)',
                  'date_end': 'End date (YYYY-MM-DD)',
-                 'type': 'Disaster type'
+                 'type': 'Disaster type',
+                 streaming.STREAM_ARG: streaming.STREAM_DOC,
+                 rep.FORMAT_ARG: rep.FORMAT_DOC,
+                 rep.FIELDS_ARG: rep.FIELDS_DOC,
              })
     def get(self):
         """Search for nearby disasters (used for duplicate detection)."""
-
-        lat = request.args.get('lat', type=float)
-        lon = request.args.get('lon', type=float)
-        radius = request.args.get('radius_km', type=float, default=100)
-
-        date_start = request.args.get('date_start')
-        date_end = request.args.get('date_end')
-        disaster_type = request.args.get('type')
-
-        records = disasters.read().values()
-
-        results = []
-
-        for r in records:
-
-            # Optional: include hidden reports too for dedupe
-            # (remove SHOW filter intentionally)
-
-            if disaster_type and r.get(DISASTER_TYPE) != disaster_type:
-                continue
-
-            if date_start:
-                disasters.validate_date(date_start)
-                if not r.get(DATE) or r.get(DATE) < date_start:
-                    continue
-
-            if date_end:
-                disasters.validate_date(date_end)
-                if not r.get(DATE) or r.get(DATE) > date_end:
-                    continue
-
-            if lat is not None and lon is not None:
-
-                if r.get(LATITUDE) is None or r.get(LONGITUDE) is None:
-                    continue
-
-                dist = haversine(
-                    lat,
-                    lon,
-                    r.get(LATITUDE),
-                    r.get(LONGITUDE)
-                )
-
-                if dist > radius:
-                    continue
-
-            results.append(r)
-
-        return {DISASTERS_RESP: results}
\ No newline at end of file
+        results = search_disasters(
+            lat=request.args.get('lat', type=float),
+            lon=request.args.get('lon', type=float),
+            radius_km=request.args.get('radius_km', type=float, default=100),
+            date_start=request.args.get('date_start'),
+            date_end=request.args.get('date_end'),
+            disaster_type=request.args.get('type'),
+        )
+        columns = rep.requested_columns()
+        if columns is not None:
+            return {DISASTERS_RESP: rep.columnar(results, columns or None)}
+        mimetype = streaming.requested_mimetype()
+        if mimetype:
+            return streaming.stream_records(mimetype, DISASTERS_RESP, results)
+        return {DISASTERS_RESP: results}
@@ -0,0 +1,51 @@
+"""
+Endpoints for comparing snapshot generations of a collection.
+"""
+import os
+from flask import request
+from flask_restx import Resource, Namespace
+import data.snapshots as snap
+import security.security as security
+
+SECURITY_FEATURE = security.SNAPSHOTS
+CHANGES_RESP = 'changes'
+SUMMARY_RESP = 'summary'
+# Only these collections have snapshot stores the API may read
+COLLECTIONS = ('natural_disasters',)
+DEFAULT_COLLECTION = 'natural_disasters'
+
+api = Namespace('snapshots', description='Snapshot history')
+
+
+def get_store(collection: str) -> snap.SnapshotStore:
+    if collection not in COLLECTIONS:
+        raise ValueError(f'No snapshots for collection: {collection}')
+    return snap.SnapshotStore(os.path.join(snap.SNAPSHOT_ROOT, collection))
+
+
+def diff_generations(store: snap.SnapshotStore, old: int, new: int) -> dict:
+    """Return the changes between two generations and a count of each kind"""
+    changes = list(store.diff(old, new))
+    summary = {kind: 0 for kind in (snap.ADDED, snap.REMOVED, snap.MODIFIED)}
+    for change in changes:
+        summary[change[snap.CHANGE]] += 1
+    return {CHANGES_RESP: changes, SUMMARY_RESP: summary}
+
+
+@api.route('/diff')
+class SnapshotDiff(Resource):
+    @security.require_auth(SECURITY_FEATURE, security.READ)
+    @api.doc('diff_snapshots',
+             params={
+                 'from': 'Older generation number',
+                 'to': 'Newer generation number',
+                 'collection': f'Collection (default {DEFAULT_COLLECTION})',
+             })
+    def get(self):
+        """Return the records added, removed and modified between two generations."""
+        old = request.args.get('from', type=int)
+        new = request.args.get('to', type=int)
+        if old is None or new is None:
+            raise ValueError('from and to generation numbers are required')
+        store = get_store(request.args.get('collection', DEFAULT_COLLECTION))
+        return diff_generations(store, old, new)
@@ -7,9 +7,14 @@ from flask_restx import Resource, Namespace, fields
 import server.controllers.crud as crud
 import pycountry
 import security.security as security
+import server.controllers.http_cache as http_cache
+import server.streaming as streaming
 from server.controllers.nations import nations as nations_crud
 
 SECURITY_FEATURE = security.STATES
+# Cache-Control for read responses, in seconds
+CACHE_MAX_AGE = 300
+CACHE_STALE_WHILE_REVALIDATE = 3600
 STATES_RESP = 'records'
 COLLECTION = 'states'
 NAME = 'name'
@@ -39,10 +44,16 @@ class StateList(Resource):
     Provides list and create functionality.
     """
     @security.require_auth(SECURITY_FEATURE, security.READ)
-    @api.doc('list_states')
+    @http_cache.conditional(states.cache, max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE)
+    @api.doc('list_states', params={streaming.STREAM_ARG: streaming.STREAM_DOC})
     def get(self):
         """Return all states."""
-        return {STATES_RESP: states.read()}
+        records = states.read()
+        mimetype = streaming.requested_mimetype()
+        if mimetype:
+            return streaming.stream_records(mimetype, STATES_RESP, list(records.values()), keyed=True)
+        return {STATES_RESP: records}
 
     @security.require_auth(SECURITY_FEATURE, security.CREATE)
     @api.expect(state_model)
@@ -68,6 +79,8 @@ class StateList(Resource):
 @api.route('/fields')
 class StateFields(Resource):
     @security.require_auth(SECURITY_FEATURE, security.READ)
+    @http_cache.conditional(nations_crud.cache, max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE)
     @api.doc('get_fields')
     def get(self):
         """Get field information for states."""
@@ -85,6 +98,8 @@ class State(Resource):
     Provides retrieve, update, and delete functionality.
     """
     @security.require_auth(SECURITY_FEATURE, security.READ)
+    @http_cache.conditional(states.cache, max_age=CACHE_MAX_AGE,
+                            stale_while_revalidate=CACHE_STALE_WHILE_REVALIDATE)
     @api.doc('get_state')
     def get(self, state_id):
         """Retrieve a single state by ID."""
@@ -125,6 +125,80 @@ class TestCacheRead:
         assert mock_read.call_count == 2  # No additional call
 
 
+class TestCachePatch:
+    """Test Cache patch functionality."""
+
+    @patch('server.controllers.cache.dbc.read')
+    def test_patch_updates_in_place(self, mock_read):
+        """Test that patch updates cached records without reloading."""
+        mock_read.return_value = [
+            {'_id': '1', 'name': 'test1', 'value': 100}
+        ]
+        cache = Cache('test_collection')
+        cache.read()
+
+        cache.patch({'1': {'value': 200}, 'missing': {'value': 300}})
+
+        assert cache.read()['1'] == {'_id': '1', 'name': 'test1', 'value': 200}
+        assert 'missing' not in cache.data
+        assert mock_read.call_count == 1
+
+    def test_patch_uninitialized(self):
+        """Test that patching an unloaded cache leaves it unloaded."""
+        cache = Cache('test_collection')
+        cache.patch({'1': {'value': 200}})
+        assert cache.data is None
+
+
+class TestCachePrime:
+    """Test warm starting the cache and reconciling it with MongoDB."""
+
+    @patch('server.controllers.cache.dbc.read')
+    def test_prime_skips_db(self, mock_read):
+        """Test that a primed cache is read without touching MongoDB."""
+        cache = Cache('test_collection')
+        cache.prime([{'_id': '1', 'value': 100}])
+        assert cache.read() == {'1': {'_id': '1', 'value': 100}}
+        mock_read.assert_not_called()
+
+    @patch('server.controllers.cache.dbc.read')
+    def test_reconcile_replaces_primed_data(self, mock_read):
+        """Test that reconcile swaps in MongoDB's records."""
+        mock_read.return_value = [{'_id': '2', 'value': 200}]
+        cache = Cache('test_collection')
+        cache.prime([{'_id': '1', 'value': 100}])
+        assert cache.reconcile()
+        assert cache.read() == {'2': {'_id': '2', 'value': 200}}
+
+    @patch('server.controllers.cache.dbc.read')
+    def test_reconcile_retries_after_concurrent_write(self, mock_read):
+        """Test that a write during the fetch makes reconcile read again."""
+        cache = Cache('test_collection')
+        cache.prime([{'_id': '1', 'value': 100}])
+        stale = [{'_id': '1', 'value': 100}]
+        fresh = [{'_id': '1', 'value': 200}]
+
+        def read_during_write(*args, **kwargs):
+            if mock_read.call_count == 1:
+                cache.patch({'1': {'value': 200}})
+                return stale
+            return fresh
+
+        mock_read.side_effect = read_during_write
+        assert cache.reconcile()
+        assert mock_read.call_count == 2
+        assert cache.read()['1']['value'] == 200
+
+    @patch('server.controllers.cache.dbc.read')
+    def test_reconcile_in_background(self, mock_read):
+        """Test that reconcile can run on a separate thread."""
+        mock_read.return_value = [{'_id': '2', 'value': 200}]
+        cache = Cache('test_collection')
+        cache.prime([])
+        cache.reconcile_in_background().join()
+        assert '2' in cache.read()
+
+
 class TestCacheIntegration:
     """Integration tests for Cache class."""
     
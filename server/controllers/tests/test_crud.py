@@ -40,6 +40,14 @@ class TestIsValidId:
         assert is_valid == False
 
 
+class TestKey:
+    def test_basic(self):
+        assert crud.key(SAMPLE_RECORD) == (SAMPLE_FIELD1, SAMPLE_FIELD2)
+
+    def test_missing_field(self):
+        assert crud.key({FIELD1: SAMPLE_FIELD1}) == (SAMPLE_FIELD1, None)
+
+
 class TestFindDuplicate:
     def test_duplicate(self, temp_record):
         duplicate = crud.find_duplicate(SAMPLE_RECORD)
@@ -124,6 +132,32 @@ class TestCreateMany:
             crud.create_many([SAMPLE_RECORD, SAMPLE_RECORD])
 
 
+class TestUpsertMany:
+    def test_insert_then_update(self):
+        counts = crud.upsert_many([SAMPLE_RECORD])
+        assert counts == {'inserted': 1, 'modified': 0, 'unchanged': 0}
+        _id = crud.find_duplicate(SAMPLE_RECORD)['_id']
+
+        counts = crud.upsert_many([SAMPLE_RECORD])
+        assert counts == {'inserted': 0, 'modified': 0, 'unchanged': 1}
+
+        counts = crud.upsert_many([{**SAMPLE_RECORD, FIELD3: 'changed'}])
+        assert counts == {'inserted': 0, 'modified': 1, 'unchanged': 0}
+        assert crud.select(_id)[FIELD3] == 'changed'
+        crud.delete(_id)
+
+    def test_insert_only(self):
+        crud.upsert_many([SAMPLE_RECORD], insert_only=(FIELD3,))
+        crud.upsert_many([{**SAMPLE_RECORD, FIELD3: 'changed'}], insert_only=(FIELD3,))
+        record = crud.find_duplicate(SAMPLE_RECORD)
+        assert record[FIELD3] == SAMPLE_FIELD3
+        crud.delete(record['_id'])
+
+    def test_new_duplicate(self):
+        with pytest.raises(ValueError):
+            crud.upsert_many([SAMPLE_RECORD, SAMPLE_RECORD])
+
+
 class TestCount:
     def test_basic(self):
         old_count = crud.count()
@@ -0,0 +1,72 @@
+import pytest
+from unittest.mock import patch
+from server.controllers.cache import Cache
+import server.controllers.http_cache as http_cache
+import server.controllers.nations as nations
+
+NATION_ID = '0' * 24
+
+
+@pytest.fixture
+def client():
+    from server.endpoints import app
+    app.testing = True
+    return app.test_client()
+
+
+@pytest.fixture
+def nation_records():
+    records = {NATION_ID: {'_id': NATION_ID, nations.NAME: 'Japan', nations.CODE: 'JP'}}
+    with patch.object(nations.nations.cache, 'data', records):
+        yield records
+
+
+class TestGenerationTag:
+    @patch('server.controllers.cache.dbc.read')
+    def test_changes_with_generation(self, mock_read):
+        mock_read.return_value = []
+        cache = Cache('test_collection')
+        tag = http_cache.generation_tag([cache])
+        assert http_cache.generation_tag([cache]) == tag
+        cache.patch({})
+        assert http_cache.generation_tag([cache]) != tag
+
+    @patch('server.controllers.cache.dbc.read')
+    def test_loads_cache(self, mock_read):
+        mock_read.return_value = []
+        cache = Cache('test_collection')
+        http_cache.generation_tag([cache])
+        assert cache.data == {}
+
+
+class TestConditional:
+    def test_headers(self, client, nation_records):
+        resp = client.get('/nations/')
+        assert resp.status_code == 200
+        assert resp.headers['ETag'].startswith('W/"')
+        assert resp.headers['Cache-Control'] == http_cache.cache_control(
+            nations.CACHE_MAX_AGE, nations.CACHE_STALE_WHILE_REVALIDATE)
+
+    def test_not_modified(self, client, nation_records):
+        etag = client.get(f'/nations/{NATION_ID}').headers['ETag']
+        resp = client.get(f'/nations/{NATION_ID}', headers={'If-None-Match': etag})
+        assert resp.status_code == 304
+        assert resp.data == b''
+        assert resp.headers['ETag'] == etag
+
+    def test_modified(self, client, nation_records):
+        etag = client.get('/nations/').headers['ETag']
+        nations.nations.cache.patch({NATION_ID: {nations.NAME: 'Nippon'}})
+        resp = client.get('/nations/', headers={'If-None-Match': etag})
+        assert resp.status_code == 200
+        assert resp.get_json()[nations.NATIONS_RESP][NATION_ID][nations.NAME] == 'Nippon'
+
+    def test_fields(self, client):
+        etag = client.get('/natural_disasters/fields').headers['ETag']
+        resp = client.get('/natural_disasters/fields', headers={'If-None-Match': etag})
+        assert resp.status_code == 304
+
+    def test_keeps_status(self, client, nation_records):
+        resp = client.get('/nations/' + '1' * 24)
+        assert resp.status_code == 404
+        assert 'ETag' not in resp.headers
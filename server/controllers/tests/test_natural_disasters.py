@@ -1,4 +1,7 @@
 import pytest
+from unittest.mock import patch
+from data.snapshots import SnapshotStore
+from ai.utilities.dedupe import consolidate_new_event, cluster_events
 import server.controllers.natural_disasters as nd
 
 SAMPLE_NAME = 'test'
@@ -91,3 +94,310 @@ class TestValidate:
                 nd.LONGITUDE: 1.0,
                 nd.DESCRIPTION: SAMPLE_DESCRIPTION,
             })
+
+
+SEARCH_RECORDS = {
+    '1': {'_id': '1', nd.NAME: 'a', nd.DISASTER_TYPE: nd.EARTHQUAKE, nd.DATE: '2026-01-02',
+          nd.LATITUDE: 10.0, nd.LONGITUDE: 10.0, nd.SHOW: True, nd.PARENT_EVENT: None},
+    '2': {'_id': '2', nd.NAME: 'b', nd.DISASTER_TYPE: nd.EARTHQUAKE, nd.DATE: '2026-01-10',
+          nd.LATITUDE: 10.0, nd.LONGITUDE: 10.0, nd.SHOW: True, nd.PARENT_EVENT: None},
+    '3': {'_id': '3', nd.NAME: 'c', nd.DISASTER_TYPE: nd.TSUNAMI, nd.DATE: '2026-01-02',
+          nd.LATITUDE: 10.0, nd.LONGITUDE: 10.0, nd.SHOW: True, nd.PARENT_EVENT: None},
+    '4': {'_id': '4', nd.NAME: 'd', nd.DISASTER_TYPE: nd.EARTHQUAKE, nd.DATE: '2026-01-02',
+          nd.LATITUDE: 50.0, nd.LONGITUDE: 50.0, nd.SHOW: True, nd.PARENT_EVENT: None},
+}
+
+
+@pytest.fixture
+def search_records():
+    with patch.object(nd.disasters, 'read', return_value=SEARCH_RECORDS):
+        yield SEARCH_RECORDS
+
+
+class TestSearchDisasters:
+    def test_all_filters(self, search_records):
+        results = nd.search_disasters(lat=10.0, lon=10.0, radius_km=50,
+                                      date_start='2026-01-01', date_end='2026-01-05',
+                                      disaster_type=nd.EARTHQUAKE)
+        assert [r['_id'] for r in results] == ['1']
+
+    def test_no_filters(self, search_records):
+        assert len(nd.search_disasters()) == len(SEARCH_RECORDS)
+
+    def test_invalid_date(self, search_records):
+        with pytest.raises(ValueError):
+            nd.search_disasters(date_start='bad-date')
+
+
+class TestConsolidateInProcess:
+    @patch('ai.utilities.api_client.get')
+    def test_links_without_http(self, mock_get, search_records):
+        new_event = {nd.NAME: 'new', nd.DISASTER_TYPE: nd.EARTHQUAKE, nd.DATE: '2026-01-03',
+                     nd.LATITUDE: 10.1, nd.LONGITUDE: 10.1}
+        result = consolidate_new_event(new_event, search=nd.search_disasters)
+        assert result['action'] == 'link'
+        assert result['parent']['_id'] == '1'
+        mock_get.assert_not_called()
+
+    def test_standalone(self, search_records):
+        new_event = {nd.NAME: 'new', nd.DISASTER_TYPE: nd.HURRICANE, nd.DATE: '2026-01-03',
+                     nd.LATITUDE: 10.1, nd.LONGITUDE: 10.1}
+        result = consolidate_new_event(new_event, search=nd.search_disasters)
+        assert result == {'action': 'standalone', 'parent': None}
+
+
+PARENT_ID = '0' * 23 + '1'
+REPORT_ID = '0' * 23 + '2'
+OTHER_ID = '0' * 23 + '3'
+MISSING_ID = '0' * 23 + '9'
+
+
+class TestClusterEvents:
+    def test_groups_nearby_events(self):
+        plan = cluster_events(list(SEARCH_RECORDS.values()) + [
+            {'_id': '5', nd.DISASTER_TYPE: nd.EARTHQUAKE, nd.DATE: '2026-01-03',
+             nd.LATITUDE: 10.1, nd.LONGITUDE: 10.1},
+        ])
+        assert plan == {'1': ['5']}
+
+    def test_chains_transitively(self):
+        events = [
+            {'_id': str(i), nd.DISASTER_TYPE: nd.EARTHQUAKE, nd.DATE: f'2026-01-0{i + 1}',
+             nd.LATITUDE: 10.0, nd.LONGITUDE: 10.0 + 0.5 * i}
+            for i in range(3)
+        ]
+        assert cluster_events(events) == {'0': ['1', '2']}
+
+    def test_wraps_antimeridian(self):
+        events = [
+            {'_id': 'a', nd.DISASTER_TYPE: nd.EARTHQUAKE, nd.DATE: '2026-01-01',
+             nd.LATITUDE: 0.0, nd.LONGITUDE: 179.9},
+            {'_id': 'b', nd.DISASTER_TYPE: nd.EARTHQUAKE, nd.DATE: '2026-01-01',
+             nd.LATITUDE: 0.0, nd.LONGITUDE: -179.9},
+        ]
+        assert cluster_events(events) == {'a': ['b']}
+
+    def test_skips_hidden_and_undated(self):
+        events = [
+            {'_id': 'a', nd.DISASTER_TYPE: nd.EARTHQUAKE, nd.DATE: '2026-01-01',
+             nd.LATITUDE: 0.0, nd.LONGITUDE: 0.0},
+            {'_id': 'b', nd.DISASTER_TYPE: nd.EARTHQUAKE, nd.DATE: '2026-01-01',
+             nd.LATITUDE: 0.0, nd.LONGITUDE: 0.0, nd.SHOW: False},
+            {'_id': 'c', nd.DISASTER_TYPE: nd.EARTHQUAKE, nd.DATE: 'bad',
+             nd.LATITUDE: 0.0, nd.LONGITUDE: 0.0},
+        ]
+        assert cluster_events(events) == {}
+
+
+@pytest.fixture
+def link_records():
+    records = {_id: {'_id': _id} for _id in (PARENT_ID, REPORT_ID, OTHER_ID)}
+    with patch.object(nd.disasters.cache, 'data', records), \
+            patch.object(nd.disasters.cache, 'reload') as mock_reload:
+        yield records
+    mock_reload.assert_not_called()
+
+
+class TestLinkReports:
+    @patch('data.db_connect.bulk_update')
+    def test_single_bulk_write(self, mock_bulk_update, link_records):
+        assert nd.disasters.link_reports({PARENT_ID: [REPORT_ID, OTHER_ID]}) == 2
+        mock_bulk_update.assert_called_once()
+        collection, updates = mock_bulk_update.call_args[0]
+        assert collection == nd.COLLECTION
+        assert updates[0][1] == {'$addToSet': {nd.REPORTS: {'$each': [REPORT_ID, OTHER_ID]}}}
+        assert updates[1][1] == {'$set': {nd.SHOW: False, nd.PARENT_EVENT: PARENT_ID}}
+        assert len(updates) == 3
+        assert link_records[PARENT_ID][nd.REPORTS] == [REPORT_ID, OTHER_ID]
+        assert link_records[REPORT_ID][nd.PARENT_EVENT] == PARENT_ID
+        assert link_records[OTHER_ID][nd.SHOW] is False
+
+    @patch('data.db_connect.bulk_update')
+    def test_keeps_existing_reports(self, mock_bulk_update, link_records):
+        link_records[PARENT_ID][nd.REPORTS] = [REPORT_ID]
+        nd.disasters.link_reports({PARENT_ID: [REPORT_ID, OTHER_ID, OTHER_ID]})
+        assert link_records[PARENT_ID][nd.REPORTS] == [REPORT_ID, OTHER_ID]
+
+    @patch('data.db_connect.bulk_update')
+    def test_missing_parent(self, mock_bulk_update, link_records):
+        with pytest.raises(KeyError):
+            nd.disasters.link_reports({'0' * 24: [REPORT_ID]})
+        mock_bulk_update.assert_not_called()
+
+    @patch('data.db_connect.bulk_update')
+    def test_report_is_parent(self, mock_bulk_update, link_records):
+        with pytest.raises(ValueError):
+            nd.disasters.link_reports({PARENT_ID: [REPORT_ID], REPORT_ID: [OTHER_ID]})
+        mock_bulk_update.assert_not_called()
+
+    @patch('data.db_connect.bulk_update')
+    def test_invalid_report_id(self, mock_bulk_update, link_records):
+        with pytest.raises(ValueError):
+            nd.disasters.link_reports({PARENT_ID: ['bad-id']})
+        mock_bulk_update.assert_not_called()
+
+    @patch('data.db_connect.bulk_update')
+    def test_missing_report(self, mock_bulk_update, link_records):
+        with pytest.raises(KeyError):
+            nd.disasters.link_reports({PARENT_ID: [REPORT_ID, MISSING_ID]})
+        mock_bulk_update.assert_not_called()
+
+    @pytest.mark.parametrize('url, body', [
+        (f'/natural_disasters/{PARENT_ID}/reports', {'reports': [MISSING_ID]}),
+        ('/natural_disasters/links', {'links': {PARENT_ID: [MISSING_ID]}}),
+    ])
+    @patch('data.db_connect.bulk_update')
+    def test_missing_report_endpoints(self, mock_bulk_update, link_records, url, body):
+        import server.endpoints as ep
+        import security.security as security
+        ep.app.testing = True
+        resp = ep.app.test_client().post(url, json=body,
+                                         headers={'Authorization': security.AUTH_BYPASS_KEY})
+        assert resp.status_code == 404
+        mock_bulk_update.assert_not_called()
+        assert link_records[PARENT_ID].get(nd.REPORTS) is None
+
+
+class TestAppendTo:
+    @patch('data.db_connect.modify')
+    def test_patches_cache(self, mock_modify, link_records):
+        mock_modify.return_value = {'_id': PARENT_ID, nd.REPORTS: [REPORT_ID]}
+        assert nd.disasters.append_to(PARENT_ID, nd.REPORTS, [REPORT_ID]) == [REPORT_ID]
+        update = mock_modify.call_args[0][2]
+        assert update == {'$addToSet': {nd.REPORTS: {'$each': [REPORT_ID]}}}
+        assert link_records[PARENT_ID][nd.REPORTS] == [REPORT_ID]
+
+    @patch('data.db_connect.modify')
+    def test_remove_from(self, mock_modify, link_records):
+        mock_modify.return_value = {'_id': PARENT_ID, nd.REPORTS: []}
+        assert nd.disasters.remove_from(PARENT_ID, nd.REPORTS, [REPORT_ID]) == []
+        assert mock_modify.call_args[0][2] == {'$pull': {nd.REPORTS: {'$in': [REPORT_ID]}}}
+
+    @patch('data.db_connect.modify', return_value=None)
+    def test_missing_record(self, mock_modify, link_records):
+        with pytest.raises(KeyError):
+            nd.disasters.append_to(PARENT_ID, nd.REPORTS, [REPORT_ID])
+
+    def test_not_a_list_field(self, link_records):
+        with pytest.raises(ValueError):
+            nd.disasters.append_to(PARENT_ID, nd.NAME, [REPORT_ID])
+
+    @patch('data.db_connect.modify')
+    def test_set_fields(self, mock_modify, link_records):
+        mock_modify.return_value = {'_id': REPORT_ID, nd.SHOW: False,
+                                    nd.PARENT_EVENT: PARENT_ID}
+        nd.disasters.set_fields(REPORT_ID, {nd.SHOW: False, nd.PARENT_EVENT: PARENT_ID})
+        assert mock_modify.call_args[0][2] == {
+            '$set': {nd.SHOW: False, nd.PARENT_EVENT: PARENT_ID}}
+        assert link_records[REPORT_ID][nd.PARENT_EVENT] == PARENT_ID
+
+    def test_set_fields_key(self, link_records):
+        with pytest.raises(ValueError):
+            nd.disasters.set_fields(REPORT_ID, {nd.NAME: 'new'})
+
+
+class TestUpdateMany:
+    @patch('data.db_connect.bulk_update')
+    def test_single_bulk_write(self, mock_bulk_update, link_records):
+        mock_bulk_update.return_value.matched_count = 2
+        updates = {PARENT_ID: {nd.SEVERITY: 5.0}, REPORT_ID: {nd.DESCRIPTION: 'new'}}
+        assert nd.disasters.update_many(updates) == 2
+        mock_bulk_update.assert_called_once()
+        writes = mock_bulk_update.call_args[0][1]
+        assert [update for _, update in writes] == [
+            {'$set': {nd.SEVERITY: 5.0}}, {'$set': {nd.DESCRIPTION: 'new'}}]
+        assert link_records[PARENT_ID][nd.SEVERITY] == 5.0
+
+    @patch('data.db_connect.bulk_update')
+    def test_rejects_bad_fields(self, mock_bulk_update, link_records):
+        with pytest.raises(ValueError):
+            nd.disasters.update_many({PARENT_ID: {nd.SEVERITY: 'high'}})
+        with pytest.raises(ValueError):
+            nd.disasters.update_many({PARENT_ID: {'unknown': 1}})
+        mock_bulk_update.assert_not_called()
+
+
+class TestPrimeCacheFromSnapshot:
+    def test_primes_and_reconciles(self, tmp_path):
+        SnapshotStore(str(tmp_path)).write([{'_id': PARENT_ID, nd.NAME: 'quake'}])
+        with patch.object(nd.disasters.cache, 'data', None), \
+                patch.object(nd.disasters.cache, 'reconcile_in_background') as mock_reconcile, \
+                patch('data.db_connect.read') as mock_read:
+            assert nd.prime_cache_from_snapshot(str(tmp_path))
+            assert nd.disasters.cache.read() == {PARENT_ID: {'_id': PARENT_ID, nd.NAME: 'quake'}}
+            mock_reconcile.assert_called_once()
+            mock_read.assert_not_called()
+
+    def test_no_snapshot(self, tmp_path):
+        with patch.object(nd.disasters.cache, 'data', None):
+            assert not nd.prime_cache_from_snapshot(str(tmp_path))
+            assert nd.disasters.cache.data is None
+
+
+@pytest.fixture
+def history(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    old = {'_id': PARENT_ID, nd.NAME: 'quake', nd.DATE: '2026-05-01', nd.SHOW: True}
+    hidden = {'_id': REPORT_ID, nd.NAME: 'report', nd.DATE: '2026-05-01', nd.SHOW: False}
+    store.write([old, hidden], created='2026-05-01T00:00:00Z')
+    store.write([dict(old, **{nd.NAME: 'renamed'})], created='2026-05-04T00:00:00Z')
+    with patch.object(nd, 'SNAPSHOT_DIR', str(tmp_path)):
+        yield store
+
+
+class TestAsOf:
+    @pytest.fixture
+    def client(self, history):
+        import server.endpoints as ep
+        ep.app.testing = True
+        # Neither the body nor the ETag may come from the live cache
+        with patch.object(nd.disasters.cache, 'read') as mock_cache_read, \
+                patch.object(nd.disasters, 'read') as mock_read:
+            yield ep.app.test_client()
+        mock_cache_read.assert_not_called()
+        mock_read.assert_not_called()
+
+    def test_list(self, client):
+        resp = client.get('/natural_disasters/?as_of=2026-05-03')
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert [r[nd.NAME] for r in body[nd.DISASTERS_RESP]] == ['quake']
+        assert body[nd.SNAPSHOT_RESP]['generation'] == 1
+
+    def test_list_filtered(self, client):
+        resp = client.get('/natural_disasters/?as_of=2026-05-04&date=2026-05-02')
+        assert resp.get_json()[nd.DISASTERS_RESP] == []
+
+    def test_record(self, client):
+        resp = client.get(f'/natural_disasters/{PARENT_ID}?as_of=2026-05-04')
+        assert resp.get_json()[nd.DISASTERS_RESP][nd.NAME] == 'renamed'
+
+    def test_removed_record(self, client):
+        resp = client.get(f'/natural_disasters/{REPORT_ID}?as_of=2026-05-04')
+        assert resp.status_code == 404
+
+    def test_before_history(self, client):
+        resp = client.get('/natural_disasters/?as_of=2026-04-01')
+        assert resp.status_code == 404
+
+    def test_not_modified(self, client):
+        resp = client.get('/natural_disasters/?as_of=2026-05-04')
+        assert resp.headers['ETag']
+        resp = client.get('/natural_disasters/?as_of=2026-05-04',
+                          headers={'If-None-Match': resp.headers['ETag']})
+        assert resp.status_code == 304
+
+    def test_tag_follows_generation(self, client, history):
+        old = client.get('/natural_disasters/?as_of=2026-05-10').headers['ETag']
+        history.write([{'_id': OTHER_ID, nd.NAME: 'flood', nd.DATE: '2026-05-05', nd.SHOW: True}],
+                      created='2026-05-06T00:00:00Z')
+        resp = client.get('/natural_disasters/?as_of=2026-05-10', headers={'If-None-Match': old})
+        assert resp.status_code == 200
+        assert resp.headers['ETag'] != old
+        assert [r[nd.NAME] for r in resp.get_json()[nd.DISASTERS_RESP]] == ['flood']
+
+    @pytest.mark.parametrize('as_of', ['2026-04-01', 'yesterday'])
+    def test_unresolved_untagged(self, client, as_of):
+        resp = client.get(f'/natural_disasters/?as_of={as_of}')
+        assert resp.status_code in (400, 404)
+        assert 'ETag' not in resp.headers
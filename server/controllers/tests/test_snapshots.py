@@ -0,0 +1,40 @@
+import pytest
+from unittest.mock import patch
+import data.snapshots as snap
+import server.controllers.snapshots as snapshots
+
+OLD_ID = f'{1:024x}'
+NEW_ID = f'{2:024x}'
+
+
+@pytest.fixture
+def client(tmp_path):
+    from server.endpoints import app
+    app.testing = True
+    store = snap.SnapshotStore(str(tmp_path))
+    store.write([{'_id': OLD_ID, 'name': 'quake'}])
+    store.write([{'_id': OLD_ID, 'name': 'renamed'}, {'_id': NEW_ID, 'name': 'flood'}])
+    with patch.object(snapshots, 'get_store', return_value=store):
+        yield app.test_client()
+
+
+class TestGetStore:
+    def test_unknown_collection(self):
+        with pytest.raises(ValueError):
+            snapshots.get_store('../users')
+
+
+class TestDiffEndpoint:
+    def test_diff(self, client):
+        resp = client.get('/snapshots/diff?from=1&to=2')
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert body[snapshots.SUMMARY_RESP] == {snap.ADDED: 1, snap.REMOVED: 0, snap.MODIFIED: 1}
+        modified = body[snapshots.CHANGES_RESP][0]
+        assert modified[snap.FIELDS] == {'name': {snap.OLD: 'quake', snap.NEW: 'renamed'}}
+
+    def test_missing_generation(self, client):
+        assert client.get('/snapshots/diff?from=1&to=9').status_code == 404
+
+    def test_requires_generations(self, client):
+        assert client.get('/snapshots/diff?from=1').status_code == 404
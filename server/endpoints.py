@@ -14,10 +14,14 @@ from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 from server.controllers.cities import api as cities_ns
 from server.controllers.states import api as states_ns
 from server.controllers.nations import api as nations_ns
-from server.controllers.natural_disasters import api as disasters_ns
+from server.controllers.natural_disasters import api as disasters_ns, prime_cache_from_snapshot
 from server.controllers.users import api as users_ns
 from server.controllers.logs import api as logs_ns, LOG_FILE
+from server.controllers.snapshots import api as snapshots_ns
 from server.controllers.geocoding import reverse_geocode
+from server.env import get_env
+import server.representations as rep
+import server.compression as compression
 
 # import werkzeug.exceptions as wz
 
@@ -31,7 +35,11 @@ authorizations = {
 
 app = Flask(__name__)
 CORS(app)
+compression.install(app)
 api = Api(app, authorizations=authorizations, security='apikey')
+api.representation(rep.JSON_MIMETYPE)(rep.output_json)
+if rep.msgpack is not None:
+    api.representation(rep.MSGPACK_MIMETYPE)(rep.output_msgpack)
 
 _file_handler = RotatingFileHandler(
     LOG_FILE,
@@ -52,6 +60,11 @@ api.add_namespace(nations_ns, path='/nations')
 api.add_namespace(disasters_ns, path='/natural_disasters')
 api.add_namespace(users_ns, path='/users')
 api.add_namespace(logs_ns, path='/logs')
+api.add_namespace(snapshots_ns, path='/snapshots')
+
+# Serve disasters from the local snapshot until MongoDB has been read
+if get_env('PRIME_CACHE_FROM_SNAPSHOT', '0') == '1':
+    prime_cache_from_snapshot()
 
 ENDPOINT_EP = '/endpoints'
 ENDPOINT_RESP = 'Available endpoints'
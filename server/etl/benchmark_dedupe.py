@@ -0,0 +1,81 @@
+"""
+Benchmark for the ETL transform and dedup stages.
+
+Writes a synthetic earthquake CSV, then times extracting, transforming, and
+deduplicating increasing prefixes of it. Rows per second should stay roughly
+constant as the row count doubles, showing that dedup scales linearly.
+
+You can run this script with: `python -m server.etl.benchmark_dedupe`
+"""
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+import server.etl.common as common
+import server.controllers.natural_disasters as nd
+from server.etl.seed_disasters import transform_rows
+
+FIELDS = ['title', 'magnitude', 'date_time', 'depth', 'latitude', 'longitude']
+# Fraction of rows that repeat an earlier row
+DUPLICATE_RATE = 0.1
+
+
+def write_synthetic_csv(filename: str, num_rows: int, seed: int = 0):
+    """Write num_rows synthetic earthquake rows, some of them duplicates"""
+    rng = random.Random(seed)
+    written = []
+    with open(filename, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for i in range(num_rows):
+            if written and rng.random() < DUPLICATE_RATE:
+                row = rng.choice(written)
+            else:
+                row = {
+                    'title': f'M {rng.uniform(4, 9):.1f} - Synthetic {i}',
+                    'magnitude': f'{rng.uniform(4, 9):.1f}',
+                    'date_time': f'{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}'
+                                 f'-{rng.randint(1950, 2025)} 00:00',
+                    'depth': f'{rng.uniform(0, 700):.1f}',
+                    'latitude': f'{rng.uniform(-90, 90):.4f}',
+                    'longitude': f'{rng.uniform(-180, 180):.4f}',
+                }
+                if len(written) < 10000:
+                    written.append(row)
+            writer.writerow(row)
+
+
+def benchmark(rows: list, num_rows: int) -> float:
+    """Time transforming and deduplicating the first num_rows rows"""
+    rows = rows[:num_rows]
+    start = time.perf_counter()
+    unique = common.dedupe(nd.disasters, transform_rows(rows, nd.EARTHQUAKE))
+    elapsed = common.report_stage(f'{num_rows} rows', num_rows, start)
+    print(f"  {len(unique)} unique records")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500000,
+                        help="Number of rows in the largest run")
+    parser.add_argument("--steps", type=int, default=4,
+                        help="Number of runs, halving the row count each time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, 'synthetic_earthquakes.csv')
+        print(f"Writing {args.rows} synthetic rows...")
+        write_synthetic_csv(filename, args.rows)
+        rows = common.extract_csv(filename)
+
+        sizes = [args.rows // 2 ** i for i in reversed(range(args.steps))]
+        for num_rows in sizes:
+            benchmark(rows, num_rows)
+
+
+if __name__ == '__main__':
+    main()
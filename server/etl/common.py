@@ -5,7 +5,9 @@ Common functions and constants for ETL scripts
 import json
 import csv
 import os
+import time
 from server.controllers.crud import CRUD
+import data.db_connect as dbc
 
 
 # Initialize constants
@@ -23,9 +25,14 @@ COORDS_CONFIG = [
     (HURRICANES_FILE, 'latitude', 'longitude'),
 ]
 
-# Potential datasets to work on
+# Parallel seeding settings
+TRANSFORM_CHUNK_SIZE = 5000
+LOAD_BATCH_SIZE = 1000
+
 WILDFIRES_DATASET = 'rtatman/188-million-us-wildfires'
-WILDFIRES_FILE = 'FPA_FOD_20170508.sqlite'
+WILDFIRES_FILE = ETL_PATH + 'FPA_FOD_20170508.sqlite'
+
+# Potential datasets to work on
 VOLCANO_DATASET = 'smithsonian/volcanic-eruptions'
 VOLCANO_FILE = 'eruptions.csv'
 
@@ -62,9 +69,94 @@ def extract_csv(filename: str, **kwargs) -> list:
         return list(csv.DictReader(f, **kwargs))
 
 
-def load(crud: CRUD, transformed: list):
-    """Load transformed data into database using CRUD operations"""
+def load(crud: CRUD, transformed: list, upsert: bool = False,
+         insert_only: tuple = ()):
+    """
+    Load transformed data into database using CRUD operations.
+
+    With upsert, records matching an existing record on the CRUD's keys are
+    updated in place instead of inserted, and fields in insert_only are only
+    written for new records. Returns the created ids, or the
+    inserted/modified/unchanged counts when upserting, or None on failure.
+    """
+    try:
+        if upsert:
+            counts = crud.upsert_many(transformed, insert_only=insert_only)
+            print(f"Upserted {crud.collection}: {counts['inserted']} inserted, "
+                  f"{counts['modified']} modified, "
+                  f"{counts['unchanged']} unchanged")
+            return counts
+        return crud.create_many(transformed)
+    except dbc.BulkInsertError as e:
+        report_insert_failures(crud, e.result)
+    except Exception as e:
+        print(f"Failed to create {crud.collection}: {e}")
+
+
+def dedupe(crud: CRUD, records, seen: set = None) -> list:
+    """
+    Return records without duplicates, keeping the first record for each
+    combination of the CRUD's key fields. Runs in linear time by tracking
+    key tuples in a set. Pass seen to also skip keys from earlier calls;
+    it is updated in place.
+    """
+    if seen is None:
+        seen = set()
+    unique = []
+    for record in records:
+        key = crud.key(record)
+        if key not in seen:
+            seen.add(key)
+            unique.append(record)
+    return unique
+
+
+def chunk(rows: list, size: int) -> list:
+    """Split rows into consecutive lists of at most size rows"""
+    if not isinstance(size, int) or size <= 0:
+        raise ValueError(f'Bad chunk size: {size}')
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+
+def report_stage(stage: str, num_rows: int, start: float) -> float:
+    """
+    Print the wall-clock time and throughput of an ETL stage that began at
+    start (a time.perf_counter() value). Returns the elapsed seconds.
+    """
+    elapsed = time.perf_counter() - start
+    rate = num_rows / elapsed if elapsed > 0 else float('inf')
+    print(f"{stage}: {num_rows} rows in {elapsed:.2f}s ({rate:.0f} rows/s)")
+    return elapsed
+
+
+def report_insert_failures(crud: CRUD, result: dbc.BulkInsertResult):
+    """Print how much of a partially failed bulk insert was written"""
+    total = len(result.inserted_ids) + len(result.failed)
+    print(f"Failed to create some {crud.collection}: inserted "
+          f"{len(result.inserted_ids)} of {total}")
+    for batch in result.batches:
+        if batch['failed']:
+            print(f"  batch at {batch['start']}: {batch['inserted']} of "
+                  f"{batch['size']} inserted, failed indexes {batch['failed']}")
+    for index, error in result.failed[:10]:
+        print(f"  {index}: {error}")
+
+
+def load_concurrent(crud: CRUD, transformed: list, workers: int = None,
+                    batch_size: int = LOAD_BATCH_SIZE) -> int:
+    """
+    Load transformed data with several bulk writers running concurrently.
+    Records are validated and checked for duplicates once up front, then
+    written in unordered batches of batch_size. Returns the number of
+    records inserted.
+    """
+    workers = workers or os.cpu_count() or 1
     try:
-        crud.create_many(transformed)
+        return len(crud.create_many(transformed, batch_size=batch_size,
+                                    workers=workers))
+    except dbc.BulkInsertError as e:
+        report_insert_failures(crud, e.result)
+        return len(e.result.inserted_ids)
     except Exception as e:
         print(f"Failed to create {crud.collection}: {e}")
+        return 0
@@ -0,0 +1,103 @@
+"""
+Fingerprint manifest for incremental ETL runs.
+
+The manifest records the size, mtime, and content hash of every source file
+the last time it was seeded, along with a hash of each row. A later run can
+skip sources that have not changed and only process the rows that are new
+or changed in the ones that have.
+"""
+
+import hashlib
+import json
+import os
+import server.etl.common as common
+
+MANIFEST_FILE = common.ETL_PATH + 'manifest.json'
+SIZE = 'size'
+MTIME = 'mtime'
+SHA256 = 'sha256'
+ROWS = 'rows'
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def load_manifest(filename: str = MANIFEST_FILE) -> dict:
+    """Read the manifest, returning an empty one if it does not exist"""
+    try:
+        return common.extract_json(filename)
+    except (json.JSONDecodeError, IOError):
+        return {}
+
+
+def save_manifest(manifest: dict, filename: str = MANIFEST_FILE):
+    """Write the manifest atomically so an interrupted run cannot corrupt it"""
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_filename, filename)
+
+
+def content_hash(filename: str) -> str:
+    """Return the SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(filename: str) -> dict:
+    """Return the size, mtime, and content hash of a file"""
+    stat = os.stat(filename)
+    return {
+        SIZE: stat.st_size,
+        MTIME: stat.st_mtime,
+        SHA256: content_hash(filename),
+    }
+
+
+def row_hash(row) -> str:
+    """Return a stable hash of a single extracted row"""
+    encoded = json.dumps(row, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def is_unchanged(manifest: dict, source: str, filename: str) -> bool:
+    """
+    Return whether filename is unchanged since source was last recorded.
+    Size and mtime are checked first so unchanged files are not re-read;
+    the content hash settles it when only the mtime differs.
+    """
+    entry = manifest.get(source)
+    if not entry or not os.path.exists(filename):
+        return False
+    stat = os.stat(filename)
+    if stat.st_size != entry.get(SIZE):
+        return False
+    if stat.st_mtime == entry.get(MTIME):
+        return True
+    if content_hash(filename) == entry.get(SHA256):
+        entry[MTIME] = stat.st_mtime
+        return True
+    return False
+
+
+def new_rows(manifest: dict, source: str, raw):
+    """
+    Return the rows of raw that were not present when source was last
+    recorded. raw may be a list of rows or a dict of rows, and the result
+    has the same type.
+    """
+    seen = set(manifest.get(source, {}).get(ROWS, []))
+    if isinstance(raw, dict):
+        return {key: row for key, row in raw.items() if row_hash(row) not in seen}
+    if isinstance(raw, list):
+        return [row for row in raw if row_hash(row) not in seen]
+    raise ValueError(f'Bad type for raw: {type(raw)}')
+
+
+def record(manifest: dict, source: str, filename: str, raw):
+    """Record the fingerprint and row hashes of a successfully seeded source"""
+    rows = raw.values() if isinstance(raw, dict) else raw
+    entry = fingerprint(filename)
+    entry[ROWS] = [row_hash(row) for row in rows]
+    manifest[source] = entry
@@ -2,32 +2,148 @@
 This script seeds our data with data from various APIs.
 
 You can run this script with: `python -m server.etl.seed`
+
+Pass `--parallel` to transform and load the disaster files on a process pool
+(optionally with `--workers N`).
+
+Pass `--upsert` to update a live database in place instead of clearing and
+reseeding it. Records are matched on each collection's key fields, so the
+script can be run repeatedly and only touches records that changed.
+
+Pass `--incremental` to also skip source files that have not changed since
+the last run, and only process the new or changed rows of those that have
+(see server/etl/manifest.py). Implies `--upsert`.
+
+Transformed records are cached on disk (see server/etl/transform_cache.py)
+so reseeding unchanged files skips parsing and transforming them. Pass
+`--no-cache` to always transform from scratch.
 """
 
+import argparse
 import os
 import json
+import time
 import server.controllers.cities as ct
 import server.controllers.states as st
 import server.controllers.nations as nt
-import server.controllers.natural_disasters as nd
 import server.etl.common as common
+import server.etl.manifest as manifest
 from server.etl.clear_db import clear_db
-from server.etl.seed_disasters import seed_disasters
+from server.etl.seed_disasters import (
+    DISASTER_FILES, seed_disasters, seed_disasters_parallel
+)
 from server.etl.seed_coords import seed_coords
 from server.etl.seed_nations import seed_nations
 from server.etl.seed_cities import seed_cities
 from server.etl.seed_states import seed_states
+from server.etl.seed_wildfires import seed_wildfires
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="Transform and load disaster files on a process pool"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (defaults to the number of CPUs)"
+    )
+    parser.add_argument(
+        "--upsert",
+        action="store_true",
+        help="Update existing records in place instead of clearing the database"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not reuse or save cached transformed records"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only process sources and rows that changed since the last run"
+    )
+    return parser.parse_args()
+
 
+def seed_changed(fingerprints: dict, source: str, filename: str, extract, seed):
+    """
+    Seed only the rows of filename that changed since source was last
+    recorded in the manifest, then record it if seeding succeeded.
+
+    Args:
+        fingerprints: the loaded manifest
+        source: manifest key for this seeding stage
+        filename: the source file
+        extract: function that extracts the raw rows from filename
+        seed: function that seeds a subset of the raw rows
+    """
+    if manifest.is_unchanged(fingerprints, source, filename):
+        print(f"Skipping {source}: {filename} is unchanged")
+        return
+    raw = extract(filename)
+    changed = manifest.new_rows(fingerprints, source, raw)
+    print(f"{source}: {len(changed)} new or changed rows")
+    if changed and seed(changed) is None:
+        print(f"Not recording {source} because seeding failed")
+        return
+    manifest.record(fingerprints, source, filename, raw)
+    manifest.save_manifest(fingerprints)
+
+
+def main_incremental():
+    """Seed only the sources and rows that changed since the last run"""
+    start = time.perf_counter()
+    fingerprints = manifest.load_manifest()
+
+    print("Seeding nations...")
+    seed_changed(fingerprints, 'nations', common.NATIONS_FILE,
+                 lambda f: common.extract_csv(f, delimiter='\t'),
+                 lambda raw: seed_nations(common.NATIONS_FILE, upsert=True, raw=raw))
+
+    print("Seeding coordinates...")
+    for filename, lat_col, lon_col in common.COORDS_CONFIG:
+        seed_changed(fingerprints, f'coords:{filename}', filename, common.extract_csv,
+                     lambda rows, f=filename, lat=lat_col, lon=lon_col:
+                         seed_coords(f, lat, lon, rows=rows))
+
+    if common.is_json_populated(common.COORDS_FILE):
+        print("Seeding cities...")
+        seed_changed(fingerprints, 'cities', common.COORDS_FILE, common.extract_json,
+                     lambda raw: seed_cities(common.COORDS_FILE, upsert=True, raw=raw))
+
+        print("Seeding states...")
+        seed_changed(fingerprints, 'states', common.COORDS_FILE, common.extract_json,
+                     lambda raw: seed_states(common.COORDS_FILE, upsert=True, raw=raw))
+
+        print("Seeding disasters...")
+        for filename, disaster_type in DISASTER_FILES:
+            seed_changed(fingerprints, f'disasters:{filename}', filename, common.extract_csv,
+                         lambda rows, f=filename, t=disaster_type:
+                             seed_disasters(f, t, upsert=True, rows=rows))
+
+    print(f"Seeding complete in {time.perf_counter() - start:.2f}s")
+
+
+def main(parallel: bool = False, workers: int = None, upsert: bool = False,
+         use_cache: bool = True):
+    start = time.perf_counter()
 
-def main():
     # Clear database
-    print("Clearing database...")
-    num_deleted = clear_db(False)
-    print(f"Deleted: {num_deleted}")
+    if not upsert:
+        print("Clearing database...")
+        num_deleted = clear_db(False)
+        print(f"Deleted: {num_deleted}")
+        # Incremental runs must reseed everything after the database is cleared
+        manifest.save_manifest({})
 
     # Seed nations
     print("Seeding nations...")
-    seed_nations(common.NATIONS_FILE)
+    seed_nations(common.NATIONS_FILE, upsert=upsert, use_cache=use_cache)
 
     # Seed coordinates
     print("Seeding coordinates...")
@@ -38,19 +154,32 @@ def main():
     # Seed records from coordinates
     if common.is_json_populated(common.COORDS_FILE):
         print("Seeding cities...")
-        seed_cities(common.COORDS_FILE)
+        seed_cities(common.COORDS_FILE, upsert=upsert, use_cache=use_cache)
 
         print("Seeding states...")
-        seed_states(common.COORDS_FILE)
+        seed_states(common.COORDS_FILE, upsert=upsert, use_cache=use_cache)
 
         print("Seeding disasters...")
-        seed_disasters(common.EARTHQUAKES_FILE, nd.EARTHQUAKE)
-        seed_disasters(common.LANDSLIDE_FILE, nd.LANDSLIDE)
-        seed_disasters(common.TSUNAMI_FILE, nd.TSUNAMI)
-        seed_disasters(common.HURRICANES_FILE, nd.HURRICANE)
+        if parallel:
+            seed_disasters_parallel(DISASTER_FILES, workers=workers,
+                                    upsert=upsert, use_cache=use_cache)
+        else:
+            for disaster_file, disaster_type in DISASTER_FILES:
+                seed_disasters(disaster_file, disaster_type, upsert=upsert,
+                               use_cache=use_cache)
+
+        # The wildfires dataset is large, so it is only seeded once downloaded
+        if os.path.exists(common.WILDFIRES_FILE):
+            print("Seeding wildfires...")
+            seed_wildfires(common.WILDFIRES_FILE, upsert=upsert)
 
-    print("Seeding complete")
+    print(f"Seeding complete in {time.perf_counter() - start:.2f}s")
 
 
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    if args.incremental:
+        main_incremental()
+    else:
+        main(parallel=args.parallel, workers=args.workers, upsert=args.upsert,
+             use_cache=not args.no_cache)
@@ -4,15 +4,15 @@ ETL script for seeding city data
 
 import sys
 import server.etl.common as common
+import server.etl.transform_cache as transform_cache
 import server.controllers.cities as ct
 
 
 def transform(raw: dict) -> list:
     """Transform city data into format CRUD API can understand"""
     transformed = []
-    seen = []
     for city in raw.values():
-        # Add city if it is not a duplicate
+        # Build the city record; duplicates are dropped below
         new_record = {
             ct.NAME: city['name'],
             ct.STATE_NAME: city['state_name'],
@@ -20,17 +20,25 @@ def transform(raw: dict) -> list:
             ct.LATITUDE: city['latitude'],
             ct.LONGITUDE: city['longitude'],
         }
-        if not ct.cities.find_duplicate(new_record, search_list=seen):
-            seen.append(new_record)
-            transformed.append(new_record)
-    return transformed
+        transformed.append(new_record)
+    return common.dedupe(ct.cities, transformed)
 
 
-def seed_cities(filename: str):
-    """Main seed function to be exported"""
-    raw = common.extract_json(filename)
-    transformed = transform(raw)
-    common.load(ct.cities, transformed)
+def seed_cities(filename: str, upsert: bool = False, raw: dict = None,
+                use_cache: bool = False):
+    """
+    Main seed function to be exported. Pass raw to seed already extracted
+    data instead of reading filename. With use_cache, the transformed records
+    are reused from the transform cache while filename is unchanged.
+    """
+    if raw is not None:
+        transformed = transform(raw)
+    elif use_cache:
+        transformed = transform_cache.cached(
+            filename, transform, lambda: transform(common.extract_json(filename)))
+    else:
+        transformed = transform(common.extract_json(filename))
+    return common.load(ct.cities, transformed, upsert=upsert)
 
 
 if __name__ == '__main__':
@@ -75,21 +75,43 @@ def load_coords(transformed: dict):
         json.dump(data, f, indent=2)
 
 
-def seed_coords(filename: str, lat_col: str, lon_col:str):
+def known_coords() -> set:
+    """Return the coordinate keys that already have a location mapping"""
+    try:
+        return set(common.extract_json(common.COORDS_FILE))
+    except:
+        return set()
+
+
+def is_known(row: dict, lat_col: str, lon_col: str, known: set) -> bool:
+    """Return whether the row's coordinates are already mapped"""
+    try:
+        key = f"{float(row[lat_col]):06f},{float(row[lon_col]):06f}"
+    except (KeyError, TypeError, ValueError):
+        return False
+    return key in known
+
+
+def seed_coords(filename: str, lat_col: str, lon_col:str, rows: list = None):
     """
-    Map coordinates to locations and save the mappings to a JSON file
+    Map coordinates to locations and save the mappings to a JSON file.
+    Coordinates that are already mapped are not geocoded again.
 
     Args:
         filename: name of disaster CSV file
         lat_col: name of latitude column in CSV file
         lon_col: name of longitude column in CSV file
+        rows: already extracted rows to map instead of reading filename
     """
     if not (isinstance(filename, str) and isinstance(lat_col, str) and isinstance(lon_col, str)):
         raise ValueError("Error seeding coordinates: filename, lat_col, and lon_col must be strings")
 
-    raw = common.extract_csv(filename)
+    raw = common.extract_csv(filename) if rows is None else rows
+    known = known_coords()
+    raw = [row for row in raw if not is_known(row, lat_col, lon_col, known)]
     transformed = transform(raw, lat_col, lon_col)
     load_coords(transformed)
+    return transformed
 
 
 if __name__ == '__main__':
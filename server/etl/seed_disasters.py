@@ -2,7 +2,10 @@
 ETL script for seeding natural disaster data
 """
 
+import time
+from concurrent.futures import ProcessPoolExecutor
 import server.etl.common as common
+import server.etl.transform_cache as transform_cache
 import server.controllers.natural_disasters as nd
 from server.controllers.geocoding import reverse_geocode
 from datetime import datetime
@@ -134,21 +137,36 @@ def transform_hurricane(row: dict) -> dict:
         print(e)
 
 
-def seed_disasters(disaster_file: str, disaster_type: str):
-    """Seed disasters for the given disaster type"""
-    transforms = {
-        nd.EARTHQUAKE: transform_earthquake,
-        nd.LANDSLIDE: transform_landslide,
-        nd.TSUNAMI: transform_tsunami,
-        nd.HURRICANE: transform_hurricane,
-    }
-    if disaster_type not in transforms:
+TRANSFORMS = {
+    nd.EARTHQUAKE: transform_earthquake,
+    nd.LANDSLIDE: transform_landslide,
+    nd.TSUNAMI: transform_tsunami,
+    nd.HURRICANE: transform_hurricane,
+}
+
+# Fields managed by report linking that reseeding must not overwrite
+LINK_FIELDS = (nd.SHOW, nd.REPORTS, nd.PARENT_EVENT)
+
+# Disaster files and their disaster types, in seeding order
+DISASTER_FILES = [
+    (common.EARTHQUAKES_FILE, nd.EARTHQUAKE),
+    (common.LANDSLIDE_FILE, nd.LANDSLIDE),
+    (common.TSUNAMI_FILE, nd.TSUNAMI),
+    (common.HURRICANES_FILE, nd.HURRICANE),
+]
+
+
+def transform_rows(rows: list, disaster_type: str) -> list:
+    """
+    Transform rows of the given disaster type, skipping rows that fail to
+    transform. This is a pure function of its arguments so that it can run
+    in a worker process.
+    """
+    if disaster_type not in TRANSFORMS:
         raise ValueError(f'Unrecognized disaster_type: {disaster_type}')
 
-    rows = common.extract_csv(disaster_file)
-    transform_func = transforms[disaster_type]
+    transform_func = TRANSFORMS[disaster_type]
     transformed = []
-    seen = []
     for row in rows:
         new_record = transform_func(row)
         if new_record is not None:
@@ -158,15 +176,114 @@ def seed_disasters(disaster_file: str, disaster_type: str):
                 'reports': [],
                 'parent_event': None,
             })
-            # Add transformed disaster to list if it is not a duplicate
-            if not nd.disasters.find_duplicate(new_record, search_list=seen):
-                seen.append(new_record)
-                transformed.append(new_record)
-    common.load(nd.disasters, transformed)
+            transformed.append(new_record)
+    return transformed
+
+
+def merge_by_key(chunks: list) -> list:
+    """
+    Merge transformed chunks in order, keeping the first record for each
+    disaster key.
+    """
+    seen = set()
+    merged = []
+    for records in chunks:
+        merged.extend(common.dedupe(nd.disasters, records, seen=seen))
+    return merged
+
+
+def transform_file(disaster_file: str, disaster_type: str) -> list:
+    """Extract, transform, and deduplicate a whole disaster file"""
+    rows = common.extract_csv(disaster_file)
+    return common.dedupe(nd.disasters, transform_rows(rows, disaster_type))
+
+
+def seed_disasters(disaster_file: str, disaster_type: str, upsert: bool = False,
+                   rows: list = None, use_cache: bool = False):
+    """
+    Seed disasters for the given disaster type. Pass rows to seed already
+    extracted rows instead of reading disaster_file. With use_cache, the
+    transformed records are reused from the transform cache while
+    disaster_file is unchanged.
+    """
+    if disaster_type not in TRANSFORMS:
+        raise ValueError(f'Unrecognized disaster_type: {disaster_type}')
+
+    if rows is not None:
+        transformed = common.dedupe(nd.disasters, transform_rows(rows, disaster_type))
+    elif use_cache:
+        transformed = transform_cache.cached(
+            disaster_file, transform_rows,
+            lambda: transform_file(disaster_file, disaster_type))
+    else:
+        transformed = transform_file(disaster_file, disaster_type)
+    return common.load(nd.disasters, transformed, upsert=upsert,
+                       insert_only=LINK_FIELDS)
+
+
+def seed_disasters_parallel(disaster_files: list = DISASTER_FILES,
+                            workers: int = None,
+                            chunk_size: int = common.TRANSFORM_CHUNK_SIZE,
+                            upsert: bool = False, use_cache: bool = False):
+    """
+    Seed several disaster files at once. Each file is split into chunks that
+    are transformed on a process pool, the results are merged by key, and the
+    merged records are written by concurrent bulk writers. Prints the
+    wall-clock time and throughput of each stage.
+
+    Args:
+        disaster_files: list of (disaster_file, disaster_type) tuples
+        workers: number of worker processes and writer threads
+        chunk_size: number of rows transformed per task
+        upsert: update existing records in place instead of inserting
+        use_cache: reuse transformed records of unchanged files
+    """
+    for _, disaster_type in disaster_files:
+        if disaster_type not in TRANSFORMS:
+            raise ValueError(f'Unrecognized disaster_type: {disaster_type}')
+
+    # Extract every file that is not in the transform cache
+    start = time.perf_counter()
+    per_file = {}
+    extracted = []
+    for disaster_file, disaster_type in disaster_files:
+        records = transform_cache.read(disaster_file, transform_rows) if use_cache else None
+        if records is not None:
+            print(f"Using cached records for {disaster_file}")
+            per_file[disaster_file] = records
+        else:
+            extracted.append((disaster_file, disaster_type,
+                              common.extract_csv(disaster_file)))
+    num_rows = sum(len(rows) for _, _, rows in extracted)
+    common.report_stage('Extract', num_rows, start)
+
+    # Transform chunks of every extracted file on the process pool
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [(disaster_file, executor.submit(transform_rows, rows_chunk, disaster_type))
+                   for disaster_file, disaster_type, rows in extracted
+                   for rows_chunk in common.chunk(rows, chunk_size)]
+        for disaster_file, future in futures:
+            per_file.setdefault(disaster_file, []).extend(future.result())
+    for disaster_file, _, _ in extracted:
+        per_file[disaster_file] = common.dedupe(nd.disasters, per_file[disaster_file])
+        if use_cache:
+            transform_cache.write(disaster_file, transform_rows, per_file[disaster_file])
+    transformed = merge_by_key([per_file[disaster_file]
+                                for disaster_file, _ in disaster_files
+                                if disaster_file in per_file])
+    common.report_stage('Transform', num_rows, start)
+
+    # Load with concurrent bulk writers, or one bulk upsert
+    start = time.perf_counter()
+    if upsert:
+        common.load(nd.disasters, transformed, upsert=True, insert_only=LINK_FIELDS)
+        common.report_stage('Load', len(transformed), start)
+    else:
+        inserted = common.load_concurrent(nd.disasters, transformed, workers=workers)
+        common.report_stage('Load', inserted, start)
 
 
 if __name__ == '__main__':
-    seed_disasters(common.EARTHQUAKES_FILE, nd.EARTHQUAKE)
-    seed_disasters(common.LANDSLIDE_FILE, nd.LANDSLIDE)
-    seed_disasters(common.TSUNAMI_FILE, nd.TSUNAMI)
-    seed_disasters(common.HURRICANES_FILE, nd.HURRICANE)
+    for disaster_file, disaster_type in DISASTER_FILES:
+        seed_disasters(disaster_file, disaster_type)
@@ -4,6 +4,7 @@ ETL script for seeding nation data
 
 import sys
 import server.etl.common as common
+import server.etl.transform_cache as transform_cache
 import server.controllers.nations as nt
 
 
@@ -18,11 +19,22 @@ def transform(raw: list) -> list:
     return transformed
 
 
-def seed_nations(filename: str):
-    """Main seed function to be exported"""
-    raw = common.extract_csv(filename, delimiter='\t')
-    transformed = transform(raw)
-    common.load(nt.nations, transformed)
+def seed_nations(filename: str, upsert: bool = False, raw: list = None,
+                 use_cache: bool = False):
+    """
+    Main seed function to be exported. Pass raw to seed already extracted
+    data instead of reading filename. With use_cache, the transformed records
+    are reused from the transform cache while filename is unchanged.
+    """
+    if raw is not None:
+        transformed = transform(raw)
+    elif use_cache:
+        transformed = transform_cache.cached(
+            filename, transform,
+            lambda: transform(common.extract_csv(filename, delimiter='\t')))
+    else:
+        transformed = transform(common.extract_csv(filename, delimiter='\t'))
+    return common.load(nt.nations, transformed, upsert=upsert)
 
 
 if __name__ == '__main__':
@@ -4,30 +4,35 @@ ETL script for seeding state data
 
 import sys
 import server.etl.common as common
+import server.etl.transform_cache as transform_cache
 import server.controllers.states as st
 
 
 def transform(raw: dict) -> list:
     """Transform state data into format CRUD API can understand"""
-    transformed = []
-    seen = []
-    for state in raw.values():
-        # Add state if it is not a duplicate
-        new_record = {
-            st.NAME: state['name'],
-            st.NATION_NAME: state['nation_name'],
-        }
-        if not st.states.find_duplicate(new_record, search_list=seen):
-            seen.append(new_record)
-            transformed.append(new_record)
-    return transformed
+    # Many coordinates share a state, so duplicates are dropped as we go
+    states = ({
+        st.NAME: state['name'],
+        st.NATION_NAME: state['nation_name'],
+    } for state in raw.values())
+    return common.dedupe(st.states, states)
 
 
-def seed_states(filename: str):
-    """Main seed function to be exported"""
-    raw = common.extract_json(filename)
-    transformed = transform(raw)
-    common.load(st.states, transformed)
+def seed_states(filename: str, upsert: bool = False, raw: dict = None,
+                use_cache: bool = False):
+    """
+    Main seed function to be exported. Pass raw to seed already extracted
+    data instead of reading filename. With use_cache, the transformed records
+    are reused from the transform cache while filename is unchanged.
+    """
+    if raw is not None:
+        transformed = transform(raw)
+    elif use_cache:
+        transformed = transform_cache.cached(
+            filename, transform, lambda: transform(common.extract_json(filename)))
+    else:
+        transformed = transform(common.extract_json(filename))
+    return common.load(st.states, transformed, upsert=upsert)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,139 @@
+"""
+ETL script for seeding US wildfire data
+
+The 1.88 million row FPA FOD dataset is too large to load into memory, so
+it is streamed from SQLite in chunks. Date conversion, severity mapping, and
+coordinate filtering are done by SQLite in the query itself, leaving only
+record construction to Python, and each chunk is written with an unordered
+bulk insert before the next one is read.
+
+The dataset can be downloaded from Kaggle (see common.WILDFIRES_DATASET)
+into server/etl/.
+"""
+
+import sqlite3
+import time
+import server.etl.common as common
+import server.controllers.natural_disasters as nd
+import data.db_connect as dbc
+from server.etl.seed_disasters import LINK_FIELDS
+
+WILDFIRES_TABLE = 'Fires'
+WILDFIRES_CHUNK_SIZE = 10000
+# Number of insert batches of each chunk written concurrently
+WILDFIRES_WRITERS = 4
+
+# Fire size classes range from A (under 0.25 acres) to G (5000+ acres)
+SEVERITY_MAP = {
+    'A': 1.0,
+    'B': 2.0,
+    'C': 3.0,
+    'D': 4.0,
+    'E': 5.0,
+    'F': 6.0,
+    'G': 7.0,
+}
+_SEVERITY_CASE = ' '.join(
+    f"WHEN '{size_class}' THEN {severity}"
+    for size_class, severity in SEVERITY_MAP.items()
+)
+
+# DISCOVERY_DATE is a Julian day number, which SQLite's date() understands
+WILDFIRES_QUERY = f"""
+SELECT
+    FOD_ID,
+    NULLIF(TRIM(FIRE_NAME), ''),
+    date(DISCOVERY_DATE),
+    LATITUDE,
+    LONGITUDE,
+    CASE FIRE_SIZE_CLASS {_SEVERITY_CASE} ELSE 0.0 END,
+    FIRE_SIZE,
+    STAT_CAUSE_DESCR
+FROM {WILDFIRES_TABLE}
+WHERE DISCOVERY_DATE IS NOT NULL
+    AND LATITUDE BETWEEN -90 AND 90
+    AND LONGITUDE BETWEEN -180 AND 180
+"""
+
+
+def extract_chunks(filename: str, chunk_size: int = WILDFIRES_CHUNK_SIZE):
+    """
+    Yield lists of at most chunk_size rows from the wildfires table without
+    reading the whole table into memory.
+    """
+    if not isinstance(chunk_size, int) or chunk_size <= 0:
+        raise ValueError(f'Bad chunk size: {chunk_size}')
+
+    # Open read-only so a missing file raises instead of creating a database
+    conn = sqlite3.connect(f'file:{filename}?mode=ro', uri=True)
+    try:
+        cursor = conn.execute(WILDFIRES_QUERY)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def transform_chunk(rows: list) -> list:
+    """Transform a chunk of query rows into format CRUD API can understand"""
+    return [{
+        nd.NAME: f"Wildfire {fire_name or fod_id}",
+        nd.DISASTER_TYPE: nd.WILDFIRE,
+        nd.DATE: date,
+        nd.LATITUDE: lat,
+        nd.LONGITUDE: lon,
+        nd.SEVERITY: severity,
+        nd.DESCRIPTION: f"FOD ID: {fod_id}, Size: {fire_size} acres, "
+                        f"Cause: {cause or 'N/A'}",
+        nd.SHOW: True,
+        nd.REPORTS: [],
+        nd.PARENT_EVENT: None,
+    } for fod_id, fire_name, date, lat, lon, severity, fire_size, cause in rows]
+
+
+def load_chunk(records: list, upsert: bool = False) -> int:
+    """
+    Write a chunk of records with unordered bulk writes, several batches at
+    a time. Returns the number of records written.
+    """
+    if upsert:
+        result = dbc.upsert_many(nd.disasters.collection, records,
+                                 nd.disasters.keys, insert_only=LINK_FIELDS)
+        return result.upserted_count + result.modified_count if result else 0
+    result = dbc.create_many(nd.disasters.collection, records,
+                             workers=WILDFIRES_WRITERS)
+    if result.failed:
+        common.report_insert_failures(nd.disasters, result)
+    return len(result.inserted_ids)
+
+
+def seed_wildfires(filename: str = common.WILDFIRES_FILE,
+                   chunk_size: int = WILDFIRES_CHUNK_SIZE,
+                   upsert: bool = False) -> int:
+    """
+    Stream wildfires from the SQLite dataset into the database, printing
+    throughput as it goes. Returns the number of records written.
+
+    Wildfire names include the FOD ID when the fire is unnamed, so records
+    are not deduplicated against each other.
+    """
+    start = time.perf_counter()
+    num_rows = 0
+    num_written = 0
+    for rows in extract_chunks(filename, chunk_size):
+        records = transform_chunk(rows)
+        try:
+            num_written += load_chunk(records, upsert=upsert)
+        except Exception as e:
+            print(f"Failed to write wildfires chunk: {e}")
+        num_rows += len(rows)
+        common.report_stage('Wildfires', num_rows, start)
+    print(f"Wrote {num_written} of {num_rows} wildfires")
+    return num_written
+
+
+if __name__ == '__main__':
+    seed_wildfires(common.WILDFIRES_FILE)
@@ -75,3 +75,86 @@ class TestIsJsonPopulated:
             json.dump(data, f)
         
         assert common.is_json_populated(str(filename)) is True
+
+
+class TestChunk:
+    def test_basic(self):
+        assert common.chunk([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+
+    def test_empty(self):
+        assert common.chunk([], 3) == []
+
+    def test_bad_size(self):
+        with pytest.raises(ValueError):
+            common.chunk([1, 2], 0)
+
+
+class TestReportStage:
+    def test_prints_throughput(self, capsys):
+        start = time.perf_counter()
+        elapsed = common.report_stage('Transform', 10, start)
+        assert elapsed >= 0
+        assert 'Transform: 10 rows' in capsys.readouterr().out
+
+
+class TestLoadConcurrent:
+    def test_batches(self):
+        """Test that records are written in concurrent batches"""
+        crud = MagicMock(collection='test')
+        crud.create_many.return_value = ['id'] * 5
+
+        inserted = common.load_concurrent(crud, [{}] * 5, workers=2, batch_size=2)
+
+        assert inserted == 5
+        crud.create_many.assert_called_once_with([{}] * 5, batch_size=2, workers=2)
+
+    def test_partial_failure(self):
+        """Test that a partial failure reports how much was written"""
+        result = dbc.BulkInsertResult()
+        result.inserted_ids = ['a', 'b']
+        result.failed = [(2, 'bad doc')]
+        crud = MagicMock(collection='test')
+        crud.create_many.side_effect = dbc.BulkInsertError(result, 3)
+        assert common.load_concurrent(crud, [{}] * 3) == 2
+
+    def test_failure(self):
+        """Test that a failed load is reported instead of raised"""
+        crud = MagicMock(collection='test')
+        crud.create_many.side_effect = ValueError('Duplicate detected.')
+        assert common.load_concurrent(crud, []) == 0
+
+
+class TestLoad:
+    def test_upsert(self, capsys):
+        """Test that upsert mode reports inserted/modified/unchanged counts"""
+        crud = MagicMock(collection='test')
+        crud.upsert_many.return_value = {'inserted': 1, 'modified': 2, 'unchanged': 3}
+
+        counts = common.load(crud, [{}], upsert=True, insert_only=('show',))
+
+        assert counts == {'inserted': 1, 'modified': 2, 'unchanged': 3}
+        crud.upsert_many.assert_called_once_with([{}], insert_only=('show',))
+        crud.create_many.assert_not_called()
+        assert '1 inserted, 2 modified, 3 unchanged' in capsys.readouterr().out
+
+    def test_insert(self):
+        crud = MagicMock(collection='test')
+        common.load(crud, [{}])
+        crud.create_many.assert_called_once_with([{}])
+        crud.upsert_many.assert_not_called()
+
+
+class TestDedupe:
+    def test_keeps_first(self):
+        crud = MagicMock()
+        crud.key.side_effect = lambda record: (record['k'],)
+        records = [{'k': 1, 'v': 'a'}, {'k': 2, 'v': 'b'}, {'k': 1, 'v': 'c'}]
+        assert common.dedupe(crud, records) == records[:2]
+
+    def test_shared_seen(self):
+        crud = MagicMock()
+        crud.key.side_effect = lambda record: (record['k'],)
+        seen = set()
+        assert common.dedupe(crud, [{'k': 1}], seen=seen) == [{'k': 1}]
+        assert common.dedupe(crud, [{'k': 1}, {'k': 2}], seen=seen) == [{'k': 2}]
+        assert seen == {(1,), (2,)}
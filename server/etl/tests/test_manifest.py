@@ -0,0 +1,68 @@
+import os
+import pytest
+import server.etl.manifest as manifest
+
+SOURCE = 'disasters:test.csv'
+ROWS = [{'a': '1'}, {'a': '2'}]
+
+
+@pytest.fixture
+def source_file(tmp_path):
+    filename = tmp_path / 'test.csv'
+    filename.write_text('a\n1\n2\n')
+    return str(filename)
+
+
+class TestLoadSaveManifest:
+    def test_missing(self, tmp_path):
+        assert manifest.load_manifest(str(tmp_path / 'missing.json')) == {}
+
+    def test_round_trip(self, tmp_path):
+        filename = str(tmp_path / 'manifest.json')
+        manifest.save_manifest({SOURCE: {manifest.SIZE: 1}}, filename)
+        assert manifest.load_manifest(filename) == {SOURCE: {manifest.SIZE: 1}}
+
+
+class TestIsUnchanged:
+    def test_unrecorded(self, source_file):
+        assert manifest.is_unchanged({}, SOURCE, source_file) is False
+
+    def test_recorded(self, source_file):
+        fingerprints = {}
+        manifest.record(fingerprints, SOURCE, source_file, ROWS)
+        assert manifest.is_unchanged(fingerprints, SOURCE, source_file) is True
+
+    def test_touched_but_same_content(self, source_file):
+        fingerprints = {}
+        manifest.record(fingerprints, SOURCE, source_file, ROWS)
+        os.utime(source_file, (1, 1))
+        assert manifest.is_unchanged(fingerprints, SOURCE, source_file) is True
+        assert fingerprints[SOURCE][manifest.MTIME] == 1
+
+    def test_appended(self, source_file):
+        fingerprints = {}
+        manifest.record(fingerprints, SOURCE, source_file, ROWS)
+        with open(source_file, 'a') as f:
+            f.write('3\n')
+        assert manifest.is_unchanged(fingerprints, SOURCE, source_file) is False
+
+
+class TestNewRows:
+    def test_list(self, source_file):
+        fingerprints = {}
+        manifest.record(fingerprints, SOURCE, source_file, ROWS)
+        new = manifest.new_rows(fingerprints, SOURCE, ROWS + [{'a': '3'}])
+        assert new == [{'a': '3'}]
+
+    def test_dict(self, source_file):
+        fingerprints = {}
+        manifest.record(fingerprints, SOURCE, source_file, {'x': ROWS[0]})
+        new = manifest.new_rows(fingerprints, SOURCE, {'x': ROWS[0], 'y': ROWS[1]})
+        assert new == {'y': ROWS[1]}
+
+    def test_unrecorded_source(self):
+        assert manifest.new_rows({}, SOURCE, ROWS) == ROWS
+
+    def test_bad_type(self):
+        with pytest.raises(ValueError):
+            manifest.new_rows({}, SOURCE, 123)
@@ -0,0 +1,43 @@
+from unittest.mock import patch, MagicMock
+import server.etl.seed as seed
+
+SOURCE = 'disasters:test.csv'
+
+
+@patch('server.etl.seed.manifest.save_manifest')
+class TestSeedChanged:
+    def write_source(self, tmp_path, text):
+        filename = tmp_path / 'test.csv'
+        filename.write_text(text)
+        return str(filename)
+
+    def test_only_new_rows_seeded(self, mock_save, tmp_path):
+        filename = self.write_source(tmp_path, 'a\n1\n')
+        fingerprints = {}
+        seed_func = MagicMock(return_value=[])
+        seed.seed_changed(fingerprints, SOURCE, filename, seed.common.extract_csv, seed_func)
+        seed_func.assert_called_once_with([{'a': '1'}])
+
+        with open(filename, 'a') as f:
+            f.write('2\n')
+        seed.seed_changed(fingerprints, SOURCE, filename, seed.common.extract_csv, seed_func)
+        seed_func.assert_called_with([{'a': '2'}])
+        assert mock_save.call_count == 2
+
+    def test_unchanged_skipped(self, mock_save, tmp_path):
+        filename = self.write_source(tmp_path, 'a\n1\n')
+        fingerprints = {}
+        seed_func = MagicMock(return_value=[])
+        seed.seed_changed(fingerprints, SOURCE, filename, seed.common.extract_csv, seed_func)
+        extract = MagicMock()
+        seed.seed_changed(fingerprints, SOURCE, filename, extract, seed_func)
+        extract.assert_not_called()
+        assert seed_func.call_count == 1
+
+    def test_failure_not_recorded(self, mock_save, tmp_path):
+        filename = self.write_source(tmp_path, 'a\n1\n')
+        fingerprints = {}
+        seed.seed_changed(fingerprints, SOURCE, filename, seed.common.extract_csv,
+                          MagicMock(return_value=None))
+        assert SOURCE not in fingerprints
+        mock_save.assert_not_called()
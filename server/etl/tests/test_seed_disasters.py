@@ -0,0 +1,84 @@
+import pytest
+from unittest.mock import patch
+import server.controllers.natural_disasters as nd
+import server.etl.seed_disasters as sd
+
+EARTHQUAKE_ROW = {
+    'title': 'M 7.0 - Test',
+    'magnitude': '7',
+    'date_time': '22-11-2022 02:03',
+    'depth': '14',
+    'latitude': '-9.7963',
+    'longitude': '159.596',
+}
+
+
+class TestTransformRows:
+    def test_basic(self):
+        records = sd.transform_rows([EARTHQUAKE_ROW], nd.EARTHQUAKE)
+        assert len(records) == 1
+        assert records[0][nd.DATE] == '2022-11-22'
+        assert records[0]['show'] is True
+        assert records[0]['reports'] == []
+        assert records[0]['parent_event'] is None
+
+    def test_skips_bad_rows(self):
+        records = sd.transform_rows([{'latitude': 'bad'}], nd.EARTHQUAKE)
+        assert records == []
+
+    def test_bad_disaster_type(self):
+        with pytest.raises(ValueError):
+            sd.transform_rows([EARTHQUAKE_ROW], 'invalid')
+
+
+class TestMergeByKey:
+    def test_keeps_first(self):
+        first = sd.transform_rows([EARTHQUAKE_ROW], nd.EARTHQUAKE)
+        second = sd.transform_rows([EARTHQUAKE_ROW], nd.EARTHQUAKE)
+        second[0][nd.SEVERITY] = 1.0
+        merged = sd.merge_by_key([first, second])
+        assert len(merged) == 1
+        assert merged[0][nd.SEVERITY] == 7.0
+
+
+@pytest.fixture
+def disaster_files(tmp_path):
+    """Write a small earthquake CSV with a duplicate row"""
+    filename = tmp_path / 'earthquakes.csv'
+    header = ','.join(EARTHQUAKE_ROW)
+    rows = []
+    for i in range(10):
+        row = dict(EARTHQUAKE_ROW, title=f'Test {i % 7}')
+        rows.append(','.join(row.values()))
+    filename.write_text('\n'.join([header] + rows) + '\n')
+    return [(str(filename), nd.EARTHQUAKE)]
+
+
+class TestSeedDisastersParallel:
+    @patch('server.etl.seed_disasters.common.load_concurrent')
+    def test_matches_serial_transform(self, mock_load, disaster_files):
+        """Test that parallel chunks produce the same records as one pass"""
+        mock_load.return_value = 0
+        sd.seed_disasters_parallel(disaster_files, workers=2, chunk_size=3)
+        transformed = mock_load.call_args[0][1]
+
+        rows = sd.common.extract_csv(disaster_files[0][0])
+        expected = sd.merge_by_key([sd.transform_rows(rows, nd.EARTHQUAKE)])
+        assert transformed == expected
+        assert len(transformed) == 7
+
+    def test_bad_disaster_type(self):
+        with pytest.raises(ValueError):
+            sd.seed_disasters_parallel([(sd.common.EARTHQUAKES_FILE, 'invalid')])
+
+    @patch('server.etl.seed_disasters.common.extract_csv')
+    @patch('server.etl.seed_disasters.transform_cache.read')
+    @patch('server.etl.seed_disasters.common.load_concurrent')
+    def test_cached_file_not_extracted(self, mock_load, mock_read, mock_extract,
+                                       disaster_files):
+        cached = sd.transform_rows([EARTHQUAKE_ROW], nd.EARTHQUAKE)
+        mock_read.return_value = cached
+        mock_load.return_value = 0
+        sd.seed_disasters_parallel(disaster_files, workers=1, use_cache=True)
+        mock_extract.assert_not_called()
+        assert mock_load.call_args[0][1] == cached
@@ -0,0 +1,105 @@
+import sqlite3
+import pytest
+from unittest.mock import patch, MagicMock
+import server.controllers.natural_disasters as nd
+import server.etl.seed_wildfires as sw
+import data.db_connect as dbc
+
+# Julian day numbers for 2005-02-02 and 2010-07-15
+JULIAN_2005_02_02 = 2453403.5
+JULIAN_2010_07_15 = 2455392.5
+
+
+@pytest.fixture
+def wildfires_file(tmp_path):
+    """Write a synthetic SQLite file with the FPA FOD Fires schema"""
+    filename = str(tmp_path / 'fires.sqlite')
+    conn = sqlite3.connect(filename)
+    conn.execute('''
+        CREATE TABLE Fires (
+            OBJECTID INTEGER PRIMARY KEY,
+            FOD_ID INTEGER,
+            FIRE_NAME TEXT,
+            FIRE_YEAR INTEGER,
+            DISCOVERY_DATE REAL,
+            STAT_CAUSE_DESCR TEXT,
+            FIRE_SIZE REAL,
+            FIRE_SIZE_CLASS TEXT,
+            LATITUDE REAL,
+            LONGITUDE REAL,
+            STATE TEXT
+        )
+    ''')
+    rows = [
+        (1, 'FOUNTAIN', 2005, JULIAN_2005_02_02, 'Miscellaneous', 0.1, 'A', 40.03, -121.0, 'CA'),
+        (2, None, 2010, JULIAN_2010_07_15, 'Lightning', 6000.0, 'G', 38.9, -120.4, 'CA'),
+        (3, '', 2010, JULIAN_2010_07_15, None, 12.0, 'C', 38.5, -120.1, 'CA'),
+        (4, 'BAD', 2010, JULIAN_2010_07_15, 'Arson', 1.0, 'B', 95.0, -120.0, 'CA'),
+        (5, 'NODATE', 2010, None, 'Arson', 1.0, 'B', 38.0, -120.0, 'CA'),
+    ]
+    conn.executemany('''
+        INSERT INTO Fires (FOD_ID, FIRE_NAME, FIRE_YEAR, DISCOVERY_DATE,
+            STAT_CAUSE_DESCR, FIRE_SIZE, FIRE_SIZE_CLASS, LATITUDE, LONGITUDE, STATE)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+    return filename
+
+
+class TestExtractChunks:
+    def test_chunks(self, wildfires_file):
+        chunks = list(sw.extract_chunks(wildfires_file, chunk_size=2))
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+
+    def test_filters_bad_rows(self, wildfires_file):
+        rows = [row for chunk in sw.extract_chunks(wildfires_file) for row in chunk]
+        assert [row[0] for row in rows] == [1, 2, 3]
+
+    def test_missing_file(self, tmp_path):
+        with pytest.raises(sqlite3.OperationalError):
+            list(sw.extract_chunks(str(tmp_path / 'missing.sqlite')))
+
+    def test_bad_chunk_size(self, wildfires_file):
+        with pytest.raises(ValueError):
+            list(sw.extract_chunks(wildfires_file, chunk_size=0))
+
+
+class TestTransformChunk:
+    def test_basic(self, wildfires_file):
+        rows = next(sw.extract_chunks(wildfires_file))
+        records = sw.transform_chunk(rows)
+        assert records[0][nd.NAME] == 'Wildfire FOUNTAIN'
+        assert records[0][nd.DATE] == '2005-02-02'
+        assert records[0][nd.SEVERITY] == 1.0
+        assert records[0][nd.DISASTER_TYPE] == nd.WILDFIRE
+        assert records[1][nd.NAME] == 'Wildfire 2'
+        assert records[1][nd.SEVERITY] == 7.0
+        assert 'Cause: N/A' in records[2][nd.DESCRIPTION]
+        for record in records:
+            nd.disasters.validate(record)
+
+
+class TestSeedWildfires:
+    @patch('server.etl.seed_wildfires.dbc.create_many')
+    def test_chunks(self, mock_create_many, wildfires_file):
+        mock_create_many.side_effect = lambda collection, docs, workers: MagicMock(
+            inserted_ids=list(range(len(docs))), failed=[])
+        num_written = sw.seed_wildfires(wildfires_file, chunk_size=2)
+        assert num_written == 3
+        assert mock_create_many.call_count == 2
+
+    @patch('server.etl.seed_wildfires.dbc.create_many')
+    def test_partial_failure(self, mock_create_many, wildfires_file, capsys):
+        result = dbc.BulkInsertResult()
+        result.inserted_ids = ['a']
+        result.failed = [(1, 'bad doc')]
+        result.batches = [{'start': 0, 'size': 2, 'inserted': 1, 'failed': [1]}]
+        mock_create_many.return_value = result
+        assert sw.seed_wildfires(wildfires_file, chunk_size=2) == 2
+        assert 'failed indexes [1]' in capsys.readouterr().out
+
+    @patch('server.etl.seed_wildfires.dbc.create_many')
+    def test_failed_chunk(self, mock_create_many, wildfires_file):
+        mock_create_many.side_effect = Exception('write failed')
+        assert sw.seed_wildfires(wildfires_file, chunk_size=2) == 0
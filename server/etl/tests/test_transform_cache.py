@@ -0,0 +1,51 @@
+import os
+import pytest
+from unittest.mock import MagicMock
+import server.etl.transform_cache as transform_cache
+from server.etl.seed_disasters import transform_rows
+
+RECORDS = [{'name': 'test', 'latitude': 1.0}]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache') + os.sep
+    monkeypatch.setattr(transform_cache, 'CACHE_DIR', cache_dir)
+    return cache_dir
+
+
+@pytest.fixture
+def source_file(tmp_path):
+    filename = tmp_path / 'test.csv'
+    filename.write_text('a\n1\n')
+    return str(filename)
+
+
+class TestReadWrite:
+    def test_miss(self, source_file):
+        assert transform_cache.read(source_file, transform_rows) is None
+
+    def test_round_trip(self, source_file):
+        transform_cache.write(source_file, transform_rows, RECORDS)
+        assert transform_cache.read(source_file, transform_rows) == RECORDS
+
+    def test_changed_source_misses(self, source_file):
+        transform_cache.write(source_file, transform_rows, RECORDS)
+        with open(source_file, 'a') as f:
+            f.write('2\n')
+        assert transform_cache.read(source_file, transform_rows) is None
+
+    def test_stale_entries_removed(self, source_file, cache_dir):
+        transform_cache.write(source_file, transform_rows, RECORDS)
+        with open(source_file, 'a') as f:
+            f.write('2\n')
+        transform_cache.write(source_file, transform_rows, [])
+        assert len(os.listdir(cache_dir)) == 1
+
+
+class TestCached:
+    def test_computes_once(self, source_file):
+        compute = MagicMock(return_value=RECORDS)
+        assert transform_cache.cached(source_file, transform_rows, compute) == RECORDS
+        assert transform_cache.cached(source_file, transform_rows, compute) == RECORDS
+        compute.assert_called_once()
@@ -0,0 +1,75 @@
+"""
+On-disk cache of transformed ETL records.
+
+The transformed and deduplicated records for a source file are pickled
+(protocol 5) into CACHE_DIR. The cache key covers the file's path and
+content hash, plus the source code of the module that transforms it, so
+editing either the data or the transform invalidates the entry. A repeat
+seed can then skip CSV parsing and transforming entirely.
+"""
+
+import glob
+import hashlib
+import inspect
+import os
+import pickle
+import server.etl.common as common
+from server.etl.manifest import content_hash
+
+CACHE_DIR = common.ETL_PATH + 'cache/'
+PICKLE_PROTOCOL = 5
+
+
+def cache_key(filename: str, code) -> str:
+    """
+    Return the cache key for the records transformed from filename by code,
+    which is any function defined in the transforming module.
+    """
+    digest = hashlib.sha256()
+    digest.update(filename.encode('utf-8'))
+    digest.update(content_hash(filename).encode('utf-8'))
+    digest.update(content_hash(inspect.getsourcefile(code)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cache_prefix(filename: str, code) -> str:
+    """Return the path prefix shared by every cache entry of one source"""
+    return os.path.join(CACHE_DIR, f"{os.path.basename(filename)}.{code.__module__}.")
+
+
+def read(filename: str, code):
+    """Return the cached records for filename, or None on a cache miss"""
+    path = cache_prefix(filename, code) + cache_key(filename, code) + '.pkl'
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def write(filename: str, code, records: list):
+    """Cache the records for filename, replacing any stale entries"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    prefix = cache_prefix(filename, code)
+    path = prefix + cache_key(filename, code) + '.pkl'
+    for stale in glob.glob(glob.escape(prefix) + '*.pkl'):
+        if stale != path:
+            os.remove(stale)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(records, f, protocol=PICKLE_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def cached(filename: str, code, compute) -> list:
+    """
+    Return the cached records for filename, or call compute() to build them
+    and cache the result.
+    """
+    records = read(filename, code)
+    if records is None:
+        records = compute()
+        write(filename, code, records)
+    else:
+        print(f"Using cached records for {filename}")
+    return records
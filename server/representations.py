@@ -0,0 +1,98 @@
+"""
+Response representations registered on the Api in endpoints.py.
+
+JSON is encoded with orjson when it is installed, which is several times
+faster than the standard library for large lists such as the disasters
+list, and with the standard library otherwise.
+Clients sending Accept: application/msgpack get MessagePack instead when
+msgpack is installed.
+
+List endpoints can also send ?format=columnar, which turns a list of
+records into {field: [values...]} so each field name is sent once.
+"""
+import json
+from flask import current_app, make_response, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+FORMAT_ARG = 'format'
+COLUMNAR = 'columnar'
+FIELDS_ARG = 'fields'
+FORMAT_DOC = f'Set to {COLUMNAR} to get {{field: [values...]}} instead of a list of records'
+FIELDS_DOC = f'Comma separated fields to include with format={COLUMNAR} (default all)'
+
+
+def dumps_stdlib(data, newline: bool = True, **settings) -> bytes:
+    return (json.dumps(data, **settings) + ('\n' if newline else '')).encode('utf-8')
+
+
+def dumps_fast(data, newline: bool = True) -> bytes:
+    """
+    Encode data with orjson, falling back to the standard library for
+    anything orjson cannot encode or if it is not installed.
+    """
+    if orjson is None:
+        return dumps_stdlib(data, newline)
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_APPEND_NEWLINE if newline else 0)
+    try:
+        return orjson.dumps(data, option=option)
+    except TypeError:
+        return dumps_stdlib(data, newline)
+
+
+def encode_json(data) -> bytes:
+    """
+    Encode a response body. Explicit RESTX_JSON settings and debug mode,
+    which pretty prints, keep using the standard library as flask-restx does.
+    """
+    settings = dict(current_app.config.get('RESTX_JSON') or {})
+    if current_app.debug:
+        settings.setdefault('indent', 4)
+    if settings:
+        return dumps_stdlib(data, **settings)
+    return dumps_fast(data)
+
+
+def output_json(data, code, headers=None):
+    resp = make_response(encode_json(data), code)
+    resp.headers.extend(headers or {})
+    return resp
+
+
+def output_msgpack(data, code, headers=None):
+    resp = make_response(msgpack.packb(data, use_bin_type=True), code)
+    resp.headers.extend(headers or {})
+    return resp
+
+
+def columnar(records, fields: list = None) -> dict:
+    """
+    Return records as {field: [values...]}, one value per record in order.
+    Without fields every field any record has is included, and records
+    missing a field get None.
+    """
+    records = list(records)
+    if fields is None:
+        fields = list(dict.fromkeys(field for record in records for field in record))
+    return {field: [record.get(field) for record in records] for field in fields}
+
+
+def requested_columns():
+    """
+    Return None if the request did not ask for the columnar format, or the
+    list of fields it asked for, empty meaning all of them.
+    """
+    if request.args.get(FORMAT_ARG) != COLUMNAR:
+        return None
+    fields = request.args.get(FIELDS_ARG, '')
+    return [field for field in fields.split(',') if field]
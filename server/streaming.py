@@ -0,0 +1,85 @@
+"""
+Streaming responses for list endpoints.
+
+A list endpoint normally builds its whole body before encoding it, so a
+large collection is held in memory several times over. When a client asks
+for a stream, with ?stream=1 or Accept: application/x-ndjson, the records
+are instead encoded one at a time from an iterator, e.g. over the cache or
+a Mongo cursor, and sent in chunks as they are produced:
+- application/json keeps the usual {"records": [...]} shape
+- application/x-ndjson sends one record per line
+"""
+from flask import Response, request
+from server.representations import JSON_MIMETYPE, dumps_fast
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_ARG = 'stream'
+STREAM_DOC = f'Send the records as they are encoded (also with Accept: {NDJSON_MIMETYPE})'
+# Encoded records are sent in chunks of about this many bytes
+CHUNK_SIZE = 1 << 16
+
+
+def requested_mimetype():
+    """
+    Return the mimetype to stream the response as, or None if the client
+    did not ask for a stream.
+    """
+    best = request.accept_mimetypes.best_match([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    if best == NDJSON_MIMETYPE:
+        return NDJSON_MIMETYPE
+    if request.args.get(STREAM_ARG, '').lower() in ('1', 'true'):
+        return JSON_MIMETYPE
+    return None
+
+
+def chunked(pieces, chunk_size: int = CHUNK_SIZE):
+    """Join small byte strings into chunks of at least chunk_size bytes"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def json_pieces(key: str, records, keyed: bool = False, extra: dict = None):
+    """
+    Yield the encoding of {key: [records...], **extra} a record at a time.
+    With keyed the records are sent as an object keyed by _id, the shape the
+    cities, states and nations lists use.
+    """
+    yield b'{' + dumps_fast(key, newline=False) + (b':{' if keyed else b':[')
+    for i, record in enumerate(records):
+        if i:
+            yield b','
+        if keyed:
+            yield dumps_fast(str(record.get('_id')), newline=False) + b':'
+        yield dumps_fast(record, newline=False)
+    yield b'}' if keyed else b']'
+    for name, value in (extra or {}).items():
+        yield b',' + dumps_fast(name, newline=False) + b':' + dumps_fast(value, newline=False)
+    yield b'}\n'
+
+
+def ndjson_pieces(records):
+    for record in records:
+        yield dumps_fast(record)
+
+
+def stream_records(mimetype: str, key: str, records, keyed: bool = False,
+                   extra: dict = None) -> Response:
+    """
+    Return a streamed response of records in mimetype. Anything that can
+    fail, such as validating the request, must happen before this is called,
+    since errors cannot change the status once the stream has started.
+    """
+    if mimetype == NDJSON_MIMETYPE:
+        pieces = ndjson_pieces(records)
+    else:
+        pieces = json_pieces(key, records, keyed, extra)
+    return Response(chunked(pieces), mimetype=mimetype)
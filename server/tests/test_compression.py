@@ -0,0 +1,73 @@
+import gzip
+import json
+import pytest
+from unittest.mock import patch
+import server.compression as compression
+import server.controllers.natural_disasters as nd
+import server.endpoints as ep
+
+RECORDS = {f'{i:024x}': {'_id': f'{i:024x}', nd.NAME: f'event {i}', nd.SHOW: True}
+           for i in range(100)}
+GZIP_HEADERS = {'Accept-Encoding': 'gzip'}
+
+
+@pytest.fixture
+def client():
+    ep.app.testing = True
+    with patch.object(nd.disasters.cache, 'data', RECORDS), \
+            patch.object(compression, 'compressed_cache', compression.CompressedCache()):
+        yield ep.app.test_client()
+
+
+def test_gzip(client):
+    resp = client.get('/natural_disasters/', headers=GZIP_HEADERS)
+    assert resp.headers['Content-Encoding'] == compression.GZIP
+    assert 'Accept-Encoding' in resp.headers['Vary']
+    body = json.loads(gzip.decompress(resp.data))
+    assert body[nd.DISASTERS_RESP] == list(RECORDS.values())
+
+
+def test_not_accepted(client):
+    resp = client.get('/natural_disasters/', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in resp.headers
+    assert 'Accept-Encoding' in resp.headers['Vary']
+
+
+def test_below_threshold(client):
+    resp = client.get('/natural_disasters/fields', headers=GZIP_HEADERS)
+    assert 'Content-Encoding' not in resp.headers
+
+
+def test_compressed_once_per_generation(client):
+    with patch.object(compression, 'compress', wraps=compression.compress) as mock_compress:
+        first = client.get('/natural_disasters/', headers=GZIP_HEADERS)
+        second = client.get('/natural_disasters/', headers=GZIP_HEADERS)
+        assert mock_compress.call_count == 1
+        assert first.data == second.data
+        nd.disasters.cache.patch({})
+        client.get('/natural_disasters/', headers=GZIP_HEADERS)
+        assert mock_compress.call_count == 2
+
+
+def test_streamed(client):
+    headers = {**GZIP_HEADERS, 'Accept': 'application/x-ndjson'}
+    resp = client.get('/natural_disasters/', headers=headers)
+    assert resp.headers['Content-Encoding'] == compression.GZIP
+    lines = gzip.decompress(resp.data).splitlines()
+    assert [json.loads(line) for line in lines] == list(RECORDS.values())
+
+
+@pytest.mark.skipif(compression.brotli is None, reason='brotli is not installed')
+def test_brotli_preferred(client):
+    resp = client.get('/natural_disasters/', headers={'Accept-Encoding': 'gzip, br'})
+    assert resp.headers['Content-Encoding'] == compression.BROTLI
+
+
+def test_cache_evicts_oldest():
+    cache = compression.CompressedCache(max_entries=2)
+    cache.put('a', b'1')
+    cache.put('b', b'2')
+    cache.get('a')
+    cache.put('c', b'3')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1'
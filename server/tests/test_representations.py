@@ -0,0 +1,68 @@
+import json
+import pytest
+from unittest.mock import patch
+import server.representations as rep
+import server.endpoints as ep
+
+BODY = {'records': {'1': {'name': 'Café', 'latitude': 1.5, 'show': True, 'reports': []}}}
+
+
+def test_fast_matches_stdlib():
+    assert json.loads(rep.dumps_fast(BODY)) == json.loads(rep.dumps_stdlib(BODY))
+    assert rep.dumps_fast(BODY).endswith(b'\n')
+
+
+def test_without_orjson():
+    with patch.object(rep, 'orjson', None):
+        assert rep.dumps_fast(BODY) == rep.dumps_stdlib(BODY)
+
+
+@pytest.mark.skipif(rep.orjson is None, reason='orjson is not installed')
+def test_unsupported_type_falls_back():
+    # orjson rejects integers wider than 64 bits; the standard library does not
+    assert json.loads(rep.dumps_fast({'n': 2 ** 70})) == {'n': 2 ** 70}
+
+
+def test_response():
+    resp = ep.app.test_client().get(ep.HELLO_EP)
+    assert resp.headers['Content-Type'] == rep.JSON_MIMETYPE
+    assert resp.get_json() == {ep.HELLO_RESP: 'world'}
+
+
+def test_restx_settings():
+    with ep.app.app_context(), \
+            patch.dict(ep.app.config, {'RESTX_JSON': {'sort_keys': True, 'indent': 2}}):
+        assert rep.encode_json({'b': 1, 'a': 2}) == b'{\n  "a": 2,\n  "b": 1\n}\n'
+
+
+RECORDS = [{'_id': 'a', 'latitude': 1.0, 'type': 'earthquake'},
+           {'_id': 'b', 'latitude': 2.0, 'severity': 3.0}]
+
+
+def test_columnar():
+    assert rep.columnar(RECORDS) == {
+        '_id': ['a', 'b'],
+        'latitude': [1.0, 2.0],
+        'type': ['earthquake', None],
+        'severity': [None, 3.0],
+    }
+
+
+def test_columnar_fields():
+    assert rep.columnar(iter(RECORDS), ['latitude', 'missing']) == {
+        'latitude': [1.0, 2.0], 'missing': [None, None]}
+
+
+def test_columnar_endpoint():
+    import server.controllers.natural_disasters as nd
+    records = {record['_id']: record for record in RECORDS}
+    with patch.object(nd.disasters.cache, 'data', records):
+        resp = ep.app.test_client().get('/natural_disasters/?format=columnar&fields=_id,type')
+    assert resp.get_json() == {'records': {'_id': ['a', 'b'], 'type': ['earthquake', None]}}
+
+
+@pytest.mark.skipif(rep.msgpack is None, reason='msgpack is not installed')
+def test_msgpack_negotiation():
+    resp = ep.app.test_client().get(ep.HELLO_EP, headers={'Accept': rep.MSGPACK_MIMETYPE})
+    assert resp.headers['Content-Type'] == rep.MSGPACK_MIMETYPE
+    assert rep.msgpack.unpackb(resp.data) == {ep.HELLO_RESP: 'world'}
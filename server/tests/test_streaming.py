@@ -0,0 +1,67 @@
+import json
+import pytest
+from unittest.mock import patch
+import server.streaming as streaming
+import server.controllers.natural_disasters as nd
+import server.controllers.nations as nations
+import server.endpoints as ep
+
+RECORDS = [{'_id': f'{i:024x}', nd.NAME: f'event {i}', nd.DATE: '2026-05-01', nd.SHOW: True}
+           for i in range(5)]
+
+
+@pytest.fixture
+def client():
+    ep.app.testing = True
+    records = {record['_id']: record for record in RECORDS}
+    with patch.object(nd.disasters.cache, 'data', records), \
+            patch.object(nations.nations.cache, 'data', records):
+        yield ep.app.test_client()
+
+
+class TestChunked:
+    def test_joins_small_pieces(self):
+        assert list(streaming.chunked([b'ab', b'cd', b'e'], chunk_size=3)) == [b'abcd', b'e']
+
+    def test_empty(self):
+        assert list(streaming.chunked([])) == []
+
+
+class TestJsonPieces:
+    def test_list(self):
+        body = b''.join(streaming.json_pieces('records', iter(RECORDS), extra={'n': 1}))
+        assert json.loads(body) == {'records': RECORDS, 'n': 1}
+
+    def test_keyed(self):
+        body = b''.join(streaming.json_pieces('records', iter(RECORDS), keyed=True))
+        assert json.loads(body) == {'records': {record['_id']: record for record in RECORDS}}
+
+    def test_empty(self):
+        assert json.loads(b''.join(streaming.json_pieces('records', iter([])))) == {'records': []}
+
+
+class TestStreamedEndpoints:
+    def test_json_stream(self, client):
+        resp = client.get('/natural_disasters/?stream=1')
+        assert 'Content-Length' not in resp.headers
+        assert resp.mimetype == 'application/json'
+        assert resp.get_json() == client.get('/natural_disasters/').get_json()
+
+    def test_ndjson(self, client):
+        resp = client.get('/natural_disasters/?date=2026-05-01',
+                          headers={'Accept': streaming.NDJSON_MIMETYPE})
+        assert resp.mimetype == streaming.NDJSON_MIMETYPE
+        assert [json.loads(line) for line in resp.data.splitlines()] == RECORDS
+        assert 'ETag' in resp.headers
+
+    def test_bad_date_before_stream(self, client):
+        resp = client.get('/natural_disasters/?stream=1&date=May')
+        assert resp.status_code == 404
+
+    def test_keyed_list(self, client):
+        resp = client.get('/nations/?stream=true')
+        assert resp.get_json() == client.get('/nations/').get_json()
+
+    def test_not_requested(self, client):
+        resp = client.get('/nations/', headers={'Accept': 'application/json'})
+        assert 'Content-Length' in resp.headers